@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class GymCardsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'App'
+
+    def ready(self):
+        # Register model signal handlers
+        from . import signals  # noqa: F401
+        # Register system checks
+        from . import checks  # noqa: F401
@@ -0,0 +1,368 @@
+import asyncio
+import atexit
+import contextlib
+import itertools
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+
+from asgiref.sync import SyncToAsync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from App.serializers import dumps
+from App.shared import RedisLock, redis_client
+from App.subscriptions import subscriptions
+
+logger = logging.getLogger(__name__)
+
+GROUP_NAME = "gym_cards"
+# One member per process; routes every batch to its filtered groups
+ROUTER_GROUP = "gym_cards.routers"
+# Seconds between group_add renewals, before the channel layer expires them
+ROUTER_RENEW = 3600
+
+# Actions that carry a card (or its id) and replace each other per card
+CARD_ACTIONS = {'card_update', 'delete'}
+
+DEFAULT_WINDOW = 0.05
+DEFAULT_SYNC_BUFFER = 1024
+
+
+def _merge(previous, action_type, data):
+    """Coalesces a card change into the pending change for the same card"""
+    if previous is None or action_type == 'delete' or previous['type'] == 'delete':
+        return {'type': action_type, 'data': data}
+    # Both are (possibly partial) card updates: newer fields win
+    return {'type': action_type, 'data': {**previous['data'], **data}}
+
+
+class ChangeLog:
+    """
+    Bounded history of broadcast card changes for WebSocket resume
+
+    Every change sent by BroadcastQueue is stamped with the next sequence
+    number, and the last GYM_CARD_SYNC_BUFFER changes are kept in a ring
+    buffer so reconnecting clients can replay only what they missed. The
+    epoch is new for every process start, so sequence numbers from an
+    earlier run are never taken for current ones.
+
+    The methods are coroutines so RedisChangeLog can share one history
+    between workers.
+    """
+
+    def __init__(self, size=None):
+        self.epoch = uuid.uuid4().hex[:12]
+        self.seq = 0
+        self.size = size or getattr(settings, 'GYM_CARD_SYNC_BUFFER', DEFAULT_SYNC_BUFFER)
+        self._lock = threading.Lock()
+        self._changes = deque(maxlen=self.size)
+
+    def lock(self):
+        """Held around append() and the sends, keeping frames in seq order"""
+        return contextlib.nullcontext()
+
+    async def current(self):
+        """Returns (epoch, seq) of the last change"""
+        return self.epoch, self.seq
+
+    async def append(self, changes):
+        """Stamps changes in place and returns (previous seq, last seq)"""
+        with self._lock:
+            prev_seq = self.seq
+            for change in changes:
+                self.seq += 1
+                change['seq'] = self.seq
+                self._changes.append(change)
+            return prev_seq, self.seq
+
+    async def since(self, seq):
+        """
+        Returns the changes after seq, oldest first
+
+        Returns None when seq is unknown or older than the buffer; the
+        client then needs a full snapshot.
+        """
+        with self._lock:
+            if seq > self.seq:
+                return None
+            oldest = self._changes[0]['seq'] if self._changes else self.seq + 1
+            if seq < oldest - 1:
+                return None
+            return list(itertools.islice(self._changes, seq - oldest + 1, None))
+
+
+class RedisChangeLog(ChangeLog):
+    """
+    ChangeLog kept in Redis so every worker numbers changes the same way
+
+    The epoch lives in Redis as well; it only changes when the Redis data
+    is lost, which makes clients reload. Flushes from different workers are
+    serialized by a RedisLock, so frames leave in seq order.
+    """
+
+    KEY = 'gym_cards:sync'
+
+    def lock(self):
+        return RedisLock(f'{self.KEY}:lock')
+
+    async def current(self):
+        client = redis_client()
+        epoch, seq = await client.mget(f'{self.KEY}:epoch', f'{self.KEY}:seq')
+        if epoch is None:
+            await client.set(f'{self.KEY}:epoch', uuid.uuid4().hex[:12], nx=True)
+            epoch = await client.get(f'{self.KEY}:epoch')
+        self.epoch, self.seq = epoch.decode(), int(seq or 0)
+        return self.epoch, self.seq
+
+    async def append(self, changes):
+        client = redis_client()
+        await self.current()
+        seq = await client.incrby(f'{self.KEY}:seq', len(changes))
+        prev_seq = seq - len(changes)
+        for change_seq, change in enumerate(changes, prev_seq + 1):
+            change['seq'] = change_seq
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.rpush(f'{self.KEY}:changes', *(dumps(change) for change in changes))
+            pipe.ltrim(f'{self.KEY}:changes', -self.size, -1)
+            await pipe.execute()
+        self.seq = seq
+        return prev_seq, seq
+
+    async def since(self, seq):
+        await self.current()
+        if seq > self.seq:
+            return None
+        changes = [json.loads(entry) for entry in await redis_client().lrange(f'{self.KEY}:changes', 0, -1)]
+        oldest = changes[0]['seq'] if changes else self.seq + 1
+        if seq < oldest - 1:
+            return None
+        return [change for change in changes if change['seq'] > seq]
+
+
+change_log = import_string(getattr(settings, 'GYM_CARD_CHANGE_LOG', 'App.broadcast.ChangeLog'))()
+
+
+def changes_frame(changes, prev_seq, seq, epoch=None):
+    """
+    Encodes a cards_changed frame
+
+    prev_seq is the seq of the frame the receiver got before this one; a
+    client whose last applied seq is lower has missed changes.
+    """
+    return dumps({
+        'type': 'cards_changed',
+        'epoch': epoch or change_log.epoch,
+        'prev_seq': prev_seq,
+        'seq': seq,
+        'changes': changes
+    }).decode()
+
+
+class BroadcastQueue:
+    """
+    Batches WebSocket notifications into 'cards_changed' frames
+
+    put() only records the change under a lock, so HTTP writes never wait on
+    the channel layer. Changes to the same card within one window (50ms by
+    default) collapse into one delta; a background task on an event loop
+    then sends every pending change as a single frame:
+
+        {'type': 'cards_changed', 'epoch': ..., 'prev_seq': ..., 'seq': ...,
+         'changes': [{'seq': ..., 'type': ..., 'data': ...}]}
+
+    Changes are numbered through change_log at send time. Sockets with a
+    filtered subscription (App.subscriptions) get their own, smaller frame:
+    each batch also goes once to every process's router task, which sends
+    it on to the filter groups of that process.
+
+    The flusher runs on the ASGI event loop: started by the lifespan, the
+    first WebSocket connection or the first put() from a view. Callers
+    outside any ASGI loop (management commands, WSGI) get a private loop
+    thread that is drained at interpreter exit.
+    """
+
+    def __init__(self, window=None):
+        self._window = window
+        self._lock = threading.Lock()
+        self._pending = {}  # coalescing key -> change
+        self._order = itertools.count()
+        self._loop = None
+        self._wakeup = None
+        self._tasks = []
+
+    @property
+    def window(self):
+        if self._window is None:
+            return getattr(settings, 'GYM_CARD_BROADCAST_WINDOW', DEFAULT_WINDOW)
+        return self._window
+
+    def put(self, action_type, data):
+        if action_type in CARD_ACTIONS and 'id' in data:
+            key = ('card', data['id'])
+        elif action_type.startswith('rfid_') and 'id' in data:
+            key = (action_type, data['id'])
+        elif action_type == 'occupancy':
+            # Only the latest count matters
+            key = (action_type,)
+        else:
+            # Bulk events such as 'cards_expired' are never merged
+            key = (action_type, next(self._order))
+
+        with self._lock:
+            if key[0] == 'card':
+                self._pending[key] = _merge(self._pending.get(key), action_type, data)
+            else:
+                self._pending[key] = {'type': action_type, 'data': data}
+            first = len(self._pending) == 1
+
+        if self._loop is None:
+            self._start_for_caller()
+        if first:
+            self._loop.call_soon_threadsafe(self._signal)
+
+    async def start(self):
+        """Runs the flusher on the running event loop (ASGI lifespan or consumer)"""
+        self._bind(asyncio.get_running_loop())
+
+    async def stop(self):
+        """Stops the flusher after sending whatever is still pending"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self._flush()
+        self._loop = None
+
+    def _bind(self, loop):
+        # Must run on the loop's own thread
+        with self._lock:
+            if self._loop is not None:
+                return False
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._tasks = [
+                loop.create_task(self._run(), name='broadcast_flush'),
+                loop.create_task(self._route(), name='broadcast_route'),
+            ]
+            if self._pending:
+                self._wakeup.set()
+        return True
+
+    def _signal(self):
+        self._wakeup.set()
+
+    def _start_for_caller(self):
+        try:
+            self._bind(asyncio.get_running_loop())
+            return
+        except RuntimeError:
+            pass
+        # Sync code run through sync_to_async: use the ASGI loop awaiting it
+        loop = getattr(SyncToAsync.threadlocal, 'main_event_loop', None)
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(self.start(), loop).result()
+        else:
+            self._start_thread()
+
+    def _start_thread(self):
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(loop)
+            bound = self._bind(loop)
+            ready.set()
+            if bound:
+                loop.run_forever()
+            else:
+                loop.close()
+
+        threading.Thread(target=run, name='broadcast-flush', daemon=True).start()
+        ready.wait()
+        if self._loop is loop:
+            atexit.register(self._drain, loop)
+
+    def _drain(self, loop):
+        try:
+            asyncio.run_coroutine_threadsafe(self._flush(), loop).result(timeout=5)
+        except Exception as e:
+            logger.error(f"Broadcast drain failed: {e}")
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            # Let more changes for the same cards arrive before sending
+            await asyncio.sleep(self.window)
+            try:
+                await self._flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Broadcast flush failed: {e}", exc_info=True)
+
+    async def _flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            changes, self._pending = list(self._pending.values()), {}
+        channel_layer = get_channel_layer()
+        async with change_log.lock():
+            prev_seq, seq = await change_log.append(changes)
+            await channel_layer.group_send(GROUP_NAME, {
+                "type": "cards_changed",
+                "text": changes_frame(changes, prev_seq, seq),
+                "seq": seq
+            })
+            await channel_layer.group_send(ROUTER_GROUP, {
+                "type": "route",
+                "changes": dumps(changes).decode(),
+                "epoch": change_log.epoch,
+                "seq": seq
+            })
+
+    async def _route(self):
+        """Sends every batch on to this process's filter groups"""
+        channel_layer = get_channel_layer()
+        channel = await channel_layer.new_channel()
+        renewed_at = None
+        try:
+            while True:
+                if renewed_at is None or time.monotonic() - renewed_at >= ROUTER_RENEW:
+                    await channel_layer.group_add(ROUTER_GROUP, channel)
+                    renewed_at = time.monotonic()
+                try:
+                    message = await asyncio.wait_for(channel_layer.receive(channel), ROUTER_RENEW)
+                except asyncio.TimeoutError:
+                    continue
+                try:
+                    await self._route_batch(channel_layer, message)
+                except Exception as e:
+                    logger.error(f"Broadcast routing failed: {e}", exc_info=True)
+        finally:
+            await channel_layer.group_discard(ROUTER_GROUP, channel)
+
+    @staticmethod
+    async def _route_batch(channel_layer, message):
+        # Filtered subscribers only get the changes their filter selects,
+        # chained on the last frame their group received
+        seq = message["seq"]
+        for group_name, group_prev_seq, selected in subscriptions.route(json.loads(message["changes"]), seq):
+            await channel_layer.group_send(group_name, {
+                "type": "cards_changed",
+                "text": changes_frame(selected, group_prev_seq, seq, message["epoch"]),
+                "seq": seq
+            })
+
+
+broadcast_queue = BroadcastQueue()
+
+
+def broadcast_update(action_type, data):
+    """Queues a change for the next 'cards_changed' frame; never blocks"""
+    broadcast_queue.put(action_type, data)
@@ -0,0 +1,113 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.http import HttpResponse
+
+from App.models import GymCard
+
+VERSION_KEY = 'gym_cards:version'
+
+
+class CardCache:
+    """
+    Response cache for card reads keyed by a global card-set version
+
+    Every GymCard save/delete (and every bulk update) bumps the version, so
+    entries never have to be deleted by hand: a write simply makes all older
+    entries unreachable. Entries hold the encoded JSON body so hits skip both
+    the query and the serialization.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def version(self):
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            version = self._reset_version()
+        return version
+
+    def bump(self):
+        try:
+            return cache.incr(VERSION_KEY)
+        except ValueError:
+            return self._reset_version()
+
+    @staticmethod
+    def _reset_version():
+        # The version key is missing (first use or evicted). Restart from the
+        # clock so the new version cannot collide with entries cached under
+        # an earlier counter.
+        cache.add(VERSION_KEY, time.time_ns() // 1000, None)
+        return cache.get(VERSION_KEY)
+
+    def get_or_build(self, key, build):
+        """
+        Returns the cached body for key or stores the result of build()
+
+        build() returns the encoded body, or None for results that must not
+        be cached (e.g. not found).
+        """
+        cache_key = f'gym_cards:v{self.version()}:{key}'
+        body = cache.get(cache_key)
+        if body is not None:
+            self._count(hit=True)
+            return body
+
+        self._count(hit=False)
+        body = build()
+        if body is not None:
+            cache.set(cache_key, body, getattr(settings, 'GYM_CARD_CACHE_TIMEOUT', None))
+        return body
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            'version': self.version(),
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / total if total else None
+        }
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+
+def request_key(request):
+    """Cache key part identifying a read request by its parameters"""
+    if request.method == 'GET':
+        params = '&'.join(f'{key}={value}' for key, value in sorted(request.GET.items()))
+    else:
+        params = hashlib.sha1(request.body).hexdigest()
+    return f'{request.path}?{params}'
+
+
+def card_list_etag(request, *args, **kwargs):
+    """
+    Strong ETag for card reads, usable with django.views.decorators.http.condition
+
+    Built from MAX(id) (an index-only lookup) and the card-set version, so
+    conditional requests are answered without reading or serializing rows.
+    """
+    max_id = GymCard.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+    params = hashlib.sha1(request_key(request).encode()).hexdigest()[:12]
+    return f'{max_id}-{card_cache.version()}-{params}'
+
+
+def json_bytes_response(body):
+    return HttpResponse(body, content_type='application/json')
+
+
+card_cache = CardCache()
@@ -0,0 +1,224 @@
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, OperationalError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from App.models import GymCard, CheckInEvent, CheckInHourly, CheckInDaily, RollupCursor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_FLUSH_INTERVAL = 2
+ROLLUP_BATCH = 5000
+
+# Cards with this status are inside the gym
+INSIDE = 'in'
+
+
+class CheckInLog:
+    """
+    Buffers check-in events and writes them with one bulk INSERT per batch
+
+    record() only appends to a list, so a tap never waits on an extra
+    INSERT of its own. The buffer is written once it holds
+    GYM_CARD_CHECKIN_BATCH events, when the oldest one is older than
+    GYM_CARD_CHECKIN_FLUSH_INTERVAL seconds (checked on record() and by
+    the scheduler job), and at shutdown. Events still buffered when the
+    process dies are lost.
+
+    A batch the database rejects is written row by row instead, so one bad
+    event cannot hold back the rest; only transient errors (locked or
+    unreachable database) keep the batch for the next flush.
+    """
+
+    def __init__(self, batch_size=None, flush_interval=None):
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = []
+        self._oldest = None
+
+    @property
+    def batch_size(self):
+        return self._batch_size or getattr(settings, 'GYM_CARD_CHECKIN_BATCH', DEFAULT_BATCH_SIZE)
+
+    @property
+    def flush_interval(self):
+        if self._flush_interval is None:
+            return getattr(settings, 'GYM_CARD_CHECKIN_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+        return self._flush_interval
+
+    def record(self, card, previous_status, status, reader_id=None, occurred_at=None):
+        """
+        Buffers the check-in or check-out of a card that went from
+        previous_status to status
+
+        Only moves into or out of 'in' are logged; renewals, suspensions
+        and other status changes are not attendance.
+        """
+        if (previous_status == INSIDE) == (status == INSIDE):
+            return
+        direction = 'in' if status == INSIDE else 'out'
+        event = CheckInEvent(
+            card_id=card.id,
+            rfid_card_id=card.rfid_card_id or '',
+            direction=direction,
+            reader_id=reader_id or '',
+            occurred_at=occurred_at or timezone.now()
+        )
+        now = time.monotonic()
+        with self._lock:
+            self._pending.append(event)
+            if self._oldest is None:
+                self._oldest = now
+            due = len(self._pending) >= self.batch_size or now - self._oldest >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered events, returns how many were written"""
+        with self._flush_lock:
+            with self._lock:
+                events, self._pending, self._oldest = self._pending, [], None
+            if not events:
+                return 0
+            try:
+                with transaction.atomic():
+                    CheckInEvent.objects.bulk_create(events, batch_size=500)
+                return len(events)
+            except (IntegrityError, DataError) as e:
+                logger.warning(f"Writing {len(events)} check-in events failed, retrying one by one: {e}")
+            except OperationalError as e:
+                logger.error(f"Writing {len(events)} check-in events failed: {e}")
+                self._requeue(events)
+                return 0
+            return self._write_each(events)
+
+    def _write_each(self, events):
+        # Cards deleted since their tap: keep the event without its card,
+        # as on_delete=SET_NULL does for events already written
+        card_ids = {event.card_id for event in events}
+        existing = set(GymCard.objects.filter(id__in=card_ids).values_list('id', flat=True))
+        for event in events:
+            if event.card_id not in existing:
+                event.card_id = None
+            # Set by the rolled back bulk_create
+            event.pk = None
+            event._state.adding = True
+
+        written = 0
+        for index, event in enumerate(events):
+            try:
+                with transaction.atomic():
+                    event.save()
+                written += 1
+            except (IntegrityError, DataError) as e:
+                logger.error(f"Dropping check-in event {event}: {e}")
+            except OperationalError as e:
+                logger.error(f"Writing check-in events failed: {e}")
+                self._requeue(events[index:])
+                break
+        return written
+
+    def _requeue(self, events):
+        # Kept ahead of newer events for the next flush
+        with self._lock:
+            self._pending[:0] = events
+            self._oldest = self._oldest or time.monotonic()
+
+    def __len__(self):
+        return len(self._pending)
+
+
+def write_checkouts(cards, occurred_at=None):
+    """
+    Writes check-out events for cards that leave the gym without a tap,
+    e.g. when they are deleted or expire while inside
+
+    Unlike CheckInLog.record(), the events are inserted right away in the
+    caller's transaction, so they are committed or rolled back together
+    with the occupancy change. Call it before deleting the cards.
+
+    Args:
+        cards: (card id, rfid_card_id) pairs
+    """
+    occurred_at = occurred_at or timezone.now()
+    events = [
+        CheckInEvent(card_id=card_id, rfid_card_id=rfid_card_id or '', direction='out', occurred_at=occurred_at)
+        for card_id, rfid_card_id in cards
+    ]
+    if events:
+        CheckInEvent.objects.bulk_create(events, batch_size=500)
+
+
+def _hour(moment):
+    return timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+
+
+def _add(model, field, counts):
+    for key, (check_ins, check_outs) in counts.items():
+        updated = model.objects.filter(**{field: key}).update(
+            check_ins=F('check_ins') + check_ins,
+            check_outs=F('check_outs') + check_outs
+        )
+        if not updated:
+            model.objects.create(**{field: key}, check_ins=check_ins, check_outs=check_outs)
+
+
+def rollup_checkins(batch=ROLLUP_BATCH):
+    """
+    Folds check-in events written since the last run into the hourly and
+    daily tables
+
+    Only events after the stored cursor are read, so each run costs what
+    was written since the previous one. Hours and days are in the current
+    time zone (TIME_ZONE). Event ids are assumed to become visible in
+    order, as with the serialized writes of SQLite.
+
+    Returns:
+        int: Number of events folded in
+    """
+    total = 0
+    while True:
+        with transaction.atomic():
+            cursor, _ = RollupCursor.objects.select_for_update().get_or_create(name='checkins')
+            events = list(
+                CheckInEvent.objects.filter(id__gt=cursor.last_event_id)
+                .order_by('id')
+                .values_list('id', 'occurred_at', 'direction')[:batch]
+            )
+            if not events:
+                break
+
+            hours, days = Counter(), Counter()
+            for _, occurred_at, direction in events:
+                hour = _hour(occurred_at)
+                hours[hour, direction] += 1
+                days[hour.date(), direction] += 1
+            _add(CheckInHourly, 'hour', _pairs(hours))
+            _add(CheckInDaily, 'day', _pairs(days))
+
+            cursor.last_event_id = events[-1][0]
+            cursor.save(update_fields=['last_event_id'])
+        total += len(events)
+        if len(events) < batch:
+            break
+
+    if total:
+        logger.info(f"Rolled up {total} check-in events")
+    return total
+
+
+def _pairs(counts):
+    # {(key, direction): n} -> {key: (check_ins, check_outs)}
+    keys = {key for key, _ in counts}
+    return {key: (counts[key, 'in'], counts[key, 'out']) for key in keys}
+
+
+checkin_log = CheckInLog()
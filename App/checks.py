@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+from App.shared import process_local_settings
+
+
+@register()
+def check_scheduled_jobs(app_configs, **kwargs):
+    """Jobs moved to cron only work when cron's changes reach the server"""
+    if getattr(settings, 'GYM_CARD_RUN_JOBS', True):
+        return []
+    local = process_local_settings()
+    if not local:
+        return []
+    return [Error(
+        f"GYM_CARD_RUN_JOBS is off, but {', '.join(local)} only live in one process: "
+        "cards expired from cron would stay cached and unannounced in the server",
+        hint='Use the shared backends of djangoproj/settings_production.py or turn GYM_CARD_RUN_JOBS back on.',
+        id='App.E001',
+    )]
@@ -1,33 +1,139 @@
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.exceptions import StopConsumer
+from collections import Counter, deque
+from django.conf import settings
+import asyncio
 import json
 import logging
+import time
+
+from App.broadcast import broadcast_queue, change_log, changes_frame, GROUP_NAME
+from App.cache import card_cache
+from App.models import GymCard
+from App.serializers import dumps, serialize_cards
+from App.subscriptions import CardFilter, subscriptions
 
 logger = logging.getLogger(__name__)
 
+# Outbound frames queued per socket before queued changes are coalesced
+DEFAULT_QUEUE_LIMIT = 64
+# Seconds one frame may take to send before the socket is evicted
+DEFAULT_SEND_TIMEOUT = 10
+# Close code sent to evicted sockets
+EVICTED = 4008
+
+# Outbox entry replaced by one replay of change_log when it is sent
+RESYNC = object()
+
+
+class SocketStats:
+    """
+    Process-wide WebSocket counters
+
+    Replaces per-message logging: counts are kept in memory and logged as
+    a single INFO line at most once per LOG_INTERVAL seconds.
+    """
+
+    LOG_INTERVAL = 60
+
+    def __init__(self):
+        self.counts = Counter()
+        self.consumers = set()
+        self._logged_at = time.monotonic()
+
+    def incr(self, name, amount=1):
+        self.counts[name] += amount
+        now = time.monotonic()
+        if now - self._logged_at >= self.LOG_INTERVAL:
+            self._logged_at = now
+            logger.info(f"WebSocket stats: {self.summary()}")
+
+    def queue_depths(self):
+        """Outbound queue length per connected socket"""
+        return {consumer.channel_name: len(consumer.outbox) for consumer in list(self.consumers)}
+
+    def snapshot(self):
+        counts = dict(self.counts)
+        counts['open'] = counts.get('connected', 0) - counts.get('disconnected', 0)
+        counts['max_queue'] = max(self.queue_depths().values(), default=0)
+        return counts
+
+    def summary(self):
+        return ', '.join(f'{name}={value}' for name, value in sorted(self.snapshot().items()))
+
+
+socket_stats = SocketStats()
+
+
+def snapshot_cards(card_filter=None):
+    """Encoded list of the (matching) cards, shared with the card response cache"""
+    queryset = GymCard.objects.order_by('id')
+    key = 'ws:snapshot'
+    if card_filter is not None:
+        queryset = card_filter.queryset(queryset)
+        key = f'{key}:{card_filter.key()}'
+    return card_cache.get_or_build(key, lambda: dumps(serialize_cards(queryset))).decode()
+
+
 class GymCardConsumer(AsyncWebsocketConsumer):
+    """
+    Pushes card changes to the dashboard
+
+    Every group message carries an already encoded frame in 'text', built
+    once per group send; handlers forward it unchanged to their socket.
+
+    Clients keep the epoch and seq of the last frame they applied and send
+    {'type': 'sync_since', 'epoch': ..., 'seq': ...} after (re)connecting.
+    They get the missed changes as one cards_changed frame, or a
+    {'type': 'snapshot', 'epoch', 'seq', 'gym_cards'} frame when they have
+    no state yet or the gap is no longer in App.broadcast.change_log.
+
+    Frames go through a bounded per-socket outbox drained by a writer task,
+    so a stalled client never holds up the channel layer. When the outbox
+    is full, the queued change frames are dropped and replaced by a single
+    replay from change_log. A socket whose replay fell off the ring buffer,
+    or whose send stalls past GYM_CARD_WS_SEND_TIMEOUT, is evicted; it
+    resumes with sync_since when it reconnects.
+
+    {'type': 'subscribe', 'statuses': [...], 'priority': [min, max],
+    'ids': [...]} moves the socket from the gym_cards group to a filter
+    group (App.subscriptions) and answers with a filtered snapshot; a
+    subscribe without filters goes back to receiving everything.
+    """
+
     async def connect(self):
+        self.outbox = deque()  # (text, seq, reply) entries or RESYNC
+        self.outbox_ready = asyncio.Event()
+        self.sent_seq = None  # seq of the last change delivered
+        self.evicted = False
+        self.writer = None
+        self.card_filter = None
         try:
-            self.group_name = "gym_cards"
+            self.group_name = GROUP_NAME
             # Join room group
             await self.channel_layer.group_add(
                 self.group_name,
                 self.channel_name
             )
             await self.accept()
-            logger.info(f"WebSocket connected: {self.channel_name}")
+            # Daphne has no lifespan events; flush broadcasts on this loop
+            await broadcast_queue.start()
+            self.writer = asyncio.create_task(self.write_outbox())
+            socket_stats.consumers.add(self)
+            socket_stats.incr('connected')
         except Exception as e:
             logger.error(f"WebSocket connection error: {str(e)}")
             raise StopConsumer()
 
     async def disconnect(self, close_code):
+        socket_stats.consumers.discard(self)
+        if self.writer is not None:
+            self.writer.cancel()
         try:
             # Leave room group
-            await self.channel_layer.group_discard(
-                self.group_name,
-                self.channel_name
-            )
-            logger.info(f"WebSocket disconnected: {self.channel_name}")
+            await self.leave_group()
+            socket_stats.incr('disconnected')
         except Exception as e:
             logger.error(f"WebSocket disconnection error: {str(e)}")
 
@@ -35,16 +141,24 @@ class GymCardConsumer(AsyncWebsocketConsumer):
         """Handle incoming WebSocket messages"""
         try:
             text_data_json = json.loads(text_data)
-            logger.debug(f"Received WebSocket message: {text_data_json}")
-            
-            # Handle different message types here if needed
+            socket_stats.incr('received')
+
             message_type = text_data_json.get('type')
-            if message_type:
+            if message_type == 'sync_since':
+                await self.sync_since(text_data_json.get('epoch'), text_data_json.get('seq'))
+            elif message_type == 'subscribe':
+                await self.subscribe(text_data_json)
+            elif message_type:
+                # Relay other typed messages to every client in the dashboard
+                # format, encoded once here instead of in every consumer
                 await self.channel_layer.group_send(
-                    "gym_cards",
+                    GROUP_NAME,
                     {
                         "type": "broadcast_update",
-                        "data": text_data
+                        "text": dumps({
+                            'type': message_type,
+                            'data': text_data_json.get('card', text_data_json.get('data'))
+                        }).decode()
                     }
                 )
         except json.JSONDecodeError as e:
@@ -52,53 +166,133 @@ class GymCardConsumer(AsyncWebsocketConsumer):
         except Exception as e:
             logger.error(f"Error processing WebSocket message: {e}")
 
-    async def gym_card_update(self, event):
+    async def subscribe(self, message):
         try:
-            await self.send(text_data=json.dumps(event['data']))
-            logger.info(f"Message sent to {self.channel_name}: {event['data']}")
-        except Exception as e:
-            logger.error(f"WebSocket send error: {str(e)}")
-            
-    async def gym_card_dot_update(self, event):
-        """Handler for gym_card.update messages"""
+            card_filter = CardFilter.from_message(message)
+        except (ValueError, TypeError) as e:
+            self.enqueue(dumps({'type': 'error', 'message': str(e)}).decode(), reply=True)
+            return
+
+        await self.leave_group()
+        if card_filter.empty:
+            self.card_filter = None
+            self.group_name = GROUP_NAME
+        else:
+            _, seq = await change_log.current()
+            subscription = await sync_to_async(subscriptions.join)(card_filter, seq)
+            self.card_filter = card_filter
+            self.group_name = subscription.group_name
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        socket_stats.incr('subscribed')
+        await self.send_snapshot()
+
+    async def leave_group(self):
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        if self.card_filter is not None:
+            subscriptions.leave(self.group_name)
+
+    async def sync_since(self, epoch, seq):
+        changes = None
+        current_epoch, _ = await change_log.current()
+        if epoch == current_epoch and isinstance(seq, int):
+            changes = await change_log.since(seq)
+        if changes is None:
+            await self.send_snapshot()
+            return
+
+        socket_stats.incr('resumed')
+        self.enqueue(self.replay_frame(changes, seq), changes[-1]['seq'] if changes else seq, reply=True)
+
+    async def send_snapshot(self):
+        # Read seq before the cards: every change numbered after it reaches
+        # this socket after the snapshot, since handlers run one at a time
+        epoch, seq = await change_log.current()
+        cards = await sync_to_async(snapshot_cards)(self.card_filter)
+        socket_stats.incr('snapshots')
+        self.enqueue(f'{{"type":"snapshot","epoch":"{epoch}","seq":{seq},"gym_cards":{cards}}}', seq, reply=True)
+
+    def replay_frame(self, changes, prev_seq):
+        """Encodes changes from change_log, narrowed to the socket's filter"""
+        seq = changes[-1]['seq'] if changes else prev_seq
+        if self.card_filter is not None:
+            changes = [routed for change in changes for routed in self.card_filter.route(change)]
+        return changes_frame(changes, prev_seq, seq)
+
+    def enqueue(self, text, seq=None, reply=False):
+        """
+        Queues a frame for the writer task
+
+        Broadcast frames may be dropped on overflow; replies to this
+        client's own sync_since requests are always kept.
+        """
+        if self.evicted:
+            return
+        limit = getattr(settings, 'GYM_CARD_WS_QUEUE_LIMIT', DEFAULT_QUEUE_LIMIT)
+        if len(self.outbox) >= limit:
+            socket_stats.incr('overflows')
+            kept = [entry for entry in self.outbox if entry is RESYNC or entry[2]]
+            # Once synced, the dropped changes are resent as one replay; before
+            # that the pending sync_since reply covers them
+            if self.sent_seq is not None and RESYNC not in kept:
+                kept.append(RESYNC)
+            socket_stats.incr('dropped', len(self.outbox) - len(kept) + (not reply))
+            self.outbox = deque(kept[-limit:])
+            if not reply:
+                self.outbox_ready.set()
+                return
+        self.outbox.append((text, seq, reply))
+        self.outbox_ready.set()
+
+    async def write_outbox(self):
+        while True:
+            if not self.outbox:
+                self.outbox_ready.clear()
+                await self.outbox_ready.wait()
+                continue
+            entry = self.outbox.popleft()
+            if entry is RESYNC:
+                changes = await change_log.since(self.sent_seq)
+                if changes is None:
+                    await self.evict('fell behind the change buffer')
+                    return
+                if not changes:
+                    continue
+                entry = (self.replay_frame(changes, self.sent_seq), changes[-1]['seq'], True)
+            text, seq, reply = entry
+            if not reply and seq is not None and self.sent_seq is not None and seq <= self.sent_seq:
+                continue  # Already covered by a replay
+            timeout = getattr(settings, 'GYM_CARD_WS_SEND_TIMEOUT', DEFAULT_SEND_TIMEOUT)
+            try:
+                await asyncio.wait_for(self.send(text_data=text), timeout)
+            except asyncio.TimeoutError:
+                await self.evict('send timed out')
+                return
+            except Exception as e:
+                socket_stats.incr('send_errors')
+                logger.error(f"WebSocket send error: {str(e)}")
+                continue
+            socket_stats.incr('sent')
+            if seq is not None:
+                self.sent_seq = seq
+
+    async def evict(self, reason):
+        self.evicted = True
+        self.outbox.clear()
+        socket_stats.incr('evicted')
+        logger.warning(f"Evicting slow WebSocket {self.channel_name}: {reason}")
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
         try:
-            # Ensure we're sending the complete data structure
-            message = {
-                'action': event['data']['action'],
-                'data': {
-                    'id': event['data']['data']['id'],
-                    'status': event['data']['data']['status'],
-                    'is_expired': event['data']['data']['is_expired'],
-                    'priority': event['data']['data']['priority']
-                }
-            }
-            await self.send(text_data=json.dumps(message))
-            logger.info(f"Message sent to {self.channel_name}: {message}")
-        except Exception as e:
-            logger.error(f"WebSocket send error: {str(e)}")
+            await asyncio.wait_for(self.close(code=EVICTED), 1)
+        except asyncio.TimeoutError:
+            pass
+
+    async def forward(self, event):
+        self.enqueue(event["text"], event.get("seq"))
+
+    async def cards_changed(self, event):
+        """Handler for batched card change frames from App.broadcast"""
+        await self.forward(event)
 
     async def broadcast_update(self, event):
-        """Handler for broadcast_update messages"""
-        try:
-            logger.info(f"Received broadcast event: {event}")
-            message_data = json.loads(event["data"])
-            
-            # Ensure message format is consistent
-            formatted_message = {
-                'type': message_data['type'],
-                'data': message_data['card']
-            }
-            
-            # Send the update to the WebSocket
-            await self.send(text_data=json.dumps(formatted_message))
-            
-            # Log based on message type
-            if message_data['type'] == 'delete':
-                logger.info(f"Delete notification sent for card ID: {message_data['card']['id']}")
-            elif message_data['type'] == 'rfid_timeout':
-                logger.info(f"RFID timeout notification sent for card {message_data['card']['id']}")
-            else:
-                logger.info(f"Update sent to client {self.channel_name}")
-                
-        except Exception as e:
-            logger.error(f"Error broadcasting message: {e}", exc_info=True)
+        """Handler for single messages relayed by receive()"""
+        await self.forward(event)
@@ -0,0 +1,278 @@
+import asyncio
+import json
+import logging
+import math
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import IntegrityError
+from django.utils.module_loading import import_string
+
+from App.broadcast import broadcast_update
+from App.models import GymCard
+from App.serializers import serialize_card, dumps
+from App.shared import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel driving every enrolment timeout from one periodic tick
+
+    Scheduling and cancelling are O(1); advance() is called once per tick
+    by the MQTT ingestion service's housekeeping task.
+    """
+
+    class Timer:
+        __slots__ = ('rounds', 'callback', 'cancelled')
+
+        def __init__(self, rounds, callback):
+            self.rounds = rounds
+            self.callback = callback
+            self.cancelled = False
+
+        def cancel(self):
+            self.cancelled = True
+
+    def __init__(self, tick=1.0, slots=64):
+        self.tick = tick
+        self._slots = [[] for _ in range(slots)]
+        self._position = 0
+
+    def schedule(self, delay, callback):
+        ticks = max(1, math.ceil(delay / self.tick))
+        timer = self.Timer((ticks - 1) // len(self._slots), callback)
+        self._slots[(self._position + ticks) % len(self._slots)].append(timer)
+        return timer
+
+    def advance(self):
+        self._position = (self._position + 1) % len(self._slots)
+        due, waiting = [], []
+        for timer in self._slots[self._position]:
+            if timer.cancelled:
+                continue
+            if timer.rounds:
+                timer.rounds -= 1
+                waiting.append(timer)
+            else:
+                due.append(timer)
+        self._slots[self._position] = waiting
+        for timer in due:
+            try:
+                timer.callback()
+            except Exception as e:
+                logger.error(f"Timer callback failed: {e}", exc_info=True)
+
+
+class EnrolmentSession:
+    """A new card waiting for its RFID tag: pending -> bound | timed_out"""
+
+    PENDING = 'pending'
+    BOUND = 'bound'
+    TIMED_OUT = 'timed_out'
+
+    def __init__(self, card_id, timeout, loop):
+        self.card_id = card_id
+        self.state = self.PENDING
+        self.deadline = time.monotonic() + timeout
+        self.card = None
+        self.future = loop.create_future()
+        self.timer = None
+
+    def finish(self, state, card=None):
+        if self.state != self.PENDING:
+            return
+        self.state = state
+        self.card = card
+        if self.timer is not None:
+            self.timer.cancel()
+        if not self.future.done():
+            self.future.set_result(self)
+
+    async def wait(self):
+        """Waits until the session is bound or timed out"""
+        return await asyncio.shield(self.future)
+
+
+class EnrolmentRegistry:
+    """
+    Pending enrolment sessions, in the order their cards were created
+
+    The registry is confined to the MQTT ingestion service's event loop, so
+    it needs no locking: callers on other threads or loops go through
+    MqttIngestionService.run(). Every scanned tag is handed to the oldest
+    pending session, so concurrent enrolments are bound first come, first
+    served. A pending session costs one Future and one wheel slot entry.
+    """
+
+    def __init__(self):
+        self._sessions = OrderedDict()  # card id -> EnrolmentSession
+        self.wheel = TimerWheel()
+
+    async def open(self, card_id, timeout):
+        session = EnrolmentSession(card_id, timeout, asyncio.get_running_loop())
+        session.timer = self.wheel.schedule(timeout, lambda: self._time_out(session))
+        self._sessions[card_id] = session
+        return session
+
+    async def cancel(self, card_id):
+        session = self._sessions.pop(card_id, None)
+        if session is not None:
+            session.finish(EnrolmentSession.TIMED_OUT)
+        return session is not None
+
+    async def claim_next(self):
+        """Removes and returns the oldest pending session, or None"""
+        if not self._sessions:
+            return None
+        _, session = self._sessions.popitem(last=False)
+        return session
+
+    async def requeue(self, session):
+        """Puts a claimed session back at the head of the queue, e.g. after a failed bind"""
+        if session.state == EnrolmentSession.PENDING:
+            self._sessions[session.card_id] = session
+            self._sessions.move_to_end(session.card_id, last=False)
+
+    def _time_out(self, session):
+        if session.state != EnrolmentSession.PENDING:
+            return
+        # A session claimed by an in-flight bind is not in the queue; it
+        # still times out here and the bind result is then ignored
+        self._sessions.pop(session.card_id, None)
+        session.finish(EnrolmentSession.TIMED_OUT)
+        logger.info(f"RFID enrolment timed out for card {session.card_id}")
+        asyncio.ensure_future(sync_to_async(timeout_enrolment)(session.card_id))
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class RemoteSession:
+    """A session opened by another worker and claimed by this one"""
+
+    def __init__(self, card_id, reply_channel):
+        self.card_id = card_id
+        self.reply_channel = reply_channel
+        self.state = EnrolmentSession.PENDING
+
+    def finish(self, state, card=None):
+        if self.state != EnrolmentSession.PENDING:
+            return
+        self.state = state
+        asyncio.ensure_future(get_channel_layer().send(self.reply_channel, {
+            'type': 'enrolment.finished',
+            'state': state,
+            'card': dumps(card).decode()
+        }))
+
+
+class RedisEnrolmentRegistry(EnrolmentRegistry):
+    """
+    EnrolmentRegistry whose queue is shared by every worker through Redis
+
+    Each worker still owns the Futures and timers of the sessions it
+    opened. The queue order and a reply channel per session live in Redis,
+    so whichever worker receives a scan (one per scan with an MQTT shared
+    subscription) claims the globally oldest session and reports the
+    result to the opening worker over the channel layer.
+    """
+
+    KEY = 'gym_cards:enrolment'
+
+    async def open(self, card_id, timeout):
+        session = await super().open(card_id, timeout)
+        channel_layer = get_channel_layer()
+        reply_channel = await channel_layer.new_channel()
+        listener = asyncio.ensure_future(self._listen(session, reply_channel))
+        session.future.add_done_callback(lambda future: listener.cancel())
+        async with redis_client().pipeline(transaction=True) as pipe:
+            pipe.set(f'{self.KEY}:{card_id}', reply_channel, ex=math.ceil(timeout + 2 * self.wheel.tick))
+            pipe.rpush(f'{self.KEY}:pending', card_id)
+            await pipe.execute()
+        return session
+
+    async def cancel(self, card_id):
+        cancelled = await super().cancel(card_id)
+        await self._forget(card_id)
+        return cancelled
+
+    async def claim_next(self):
+        client = redis_client()
+        while True:
+            card_id = await client.lpop(f'{self.KEY}:pending')
+            if card_id is None:
+                return None
+            card_id = int(card_id)
+            session = self._sessions.pop(card_id, None)
+            if session is not None:
+                return session
+            reply_channel = await client.get(f'{self.KEY}:{card_id}')
+            if reply_channel is not None:
+                return RemoteSession(card_id, reply_channel.decode())
+            # Timed out or cancelled on its worker, try the next one
+
+    async def requeue(self, session):
+        if session.state != EnrolmentSession.PENDING:
+            return
+        if isinstance(session, EnrolmentSession):
+            await super().requeue(session)
+        await redis_client().lpush(f'{self.KEY}:pending', session.card_id)
+
+    def _time_out(self, session):
+        pending = session.state == EnrolmentSession.PENDING
+        super()._time_out(session)
+        if pending:
+            asyncio.ensure_future(self._forget(session.card_id))
+
+    async def _listen(self, session, reply_channel):
+        message = await get_channel_layer().receive(reply_channel)
+        session.finish(message['state'], json.loads(message['card']))
+        await self._forget(session.card_id)
+
+    async def _forget(self, card_id):
+        async with redis_client().pipeline(transaction=True) as pipe:
+            pipe.lrem(f'{self.KEY}:pending', 0, card_id)
+            pipe.delete(f'{self.KEY}:{card_id}')
+            await pipe.execute()
+
+
+def bind_rfid(card_id, rfid_card_id):
+    """
+    Stores a scanned RFID tag on a pending card and notifies the dashboard
+
+    Returns:
+        dict: Serialized card, or None when the tag could not be bound
+    """
+    try:
+        card = GymCard.objects.get(id=card_id)
+        card.rfid_card_id = rfid_card_id
+        card.save()
+    except GymCard.DoesNotExist:
+        logger.error(f"Gym card {card_id} not found")
+        return None
+    except IntegrityError:
+        logger.error(f"RFID {rfid_card_id} is already bound to another card")
+        broadcast_update('rfid_error', {
+            'id': card_id,
+            'message': 'RFID card already registered'
+        })
+        return None
+
+    logger.info(f"Updated gym card {card.id} with RFID {rfid_card_id}")
+    card_data = serialize_card(card)
+    broadcast_update('card_update', card_data)
+    return card_data
+
+
+def timeout_enrolment(card_id):
+    broadcast_update('rfid_timeout', {'id': card_id})
+
+
+enrolment_registry = import_string(
+    getattr(settings, 'GYM_CARD_ENROLMENT_REGISTRY', 'App.enrolment.EnrolmentRegistry')
+)()
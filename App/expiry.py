@@ -0,0 +1,58 @@
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from App import occupancy
+from App.broadcast import broadcast_update
+from App.cache import card_cache
+from App.checkins import INSIDE, write_checkouts
+from App.models import GymCard
+from App.rfid_index import rfid_index
+
+logger = logging.getLogger(__name__)
+
+
+def expire_cards(now=None):
+    """
+    Flags every card past its expiration date as expired
+
+    Runs one bulk UPDATE instead of saving cards one by one and sends a
+    single 'cards_expired' WebSocket event listing the affected ids. Cards
+    expiring while inside get a check-out event in the same transaction.
+
+    Returns:
+        list: Ids of the cards that were expired
+    """
+    now = now or timezone.now()
+    due = GymCard.objects.filter(is_expired=False, expiration_date__lt=now)
+    if not due.exists():
+        return []
+
+    with transaction.atomic():
+        # Re-read under lock: cards renewed since the check above drop out,
+        # and none of the listed ones can be renewed before the UPDATE
+        expiring = list(due.select_for_update().values_list('id', 'status', 'rfid_card_id'))
+        card_ids = [card_id for card_id, _, _ in expiring]
+        if not card_ids:
+            return []
+        GymCard.objects.filter(id__in=card_ids).update(status='expired', is_expired=True)
+        inside = [(card_id, rfid_card_id) for card_id, status, rfid_card_id in expiring if status == INSIDE]
+        occupancy.adjust(-len(inside))
+        write_checkouts(inside, occurred_at=now)
+
+    # queryset.update() bypasses the model signals
+    for card_id in card_ids:
+        rfid_index.discard(card_id)
+    rfid_index.sync_version(card_cache.bump())
+
+    logger.info(f"Expired {len(card_ids)} gym cards")
+    try:
+        broadcast_update('cards_expired', {
+            'ids': card_ids,
+            'Status': 'expired',
+            'IsExpired': True
+        })
+    except Exception as e:
+        logger.error(f"Broadcast error: {e}")
+    return card_ids
@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.http import HttpResponse
+
+DEFAULT_SIZE = 4096
+DEFAULT_TTL = 3600
+DEFAULT_TAP_WINDOW = 5
+
+
+class ResponseCache:
+    """
+    Bounded in-process LRU of recent responses to write requests
+
+    A request repeated with the same idempotency key (or, for taps, the
+    same card within GYM_CARD_TAP_DEDUPE_WINDOW seconds) gets the stored
+    response back without touching the database, so a member lingering at
+    a reader or a resent MQTT/HTTP spool does not toggle a card twice.
+    Entries expire after their ttl; the least recently used ones are
+    dropped beyond GYM_CARD_IDEMPOTENCY_SIZE entries. Each worker process
+    keeps its own cache.
+    """
+
+    def __init__(self, size=None):
+        self._size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires at, status, body)
+        self.hits = 0
+
+    @property
+    def size(self):
+        return self._size or getattr(settings, 'GYM_CARD_IDEMPOTENCY_SIZE', DEFAULT_SIZE)
+
+    def get(self, keys):
+        """Returns (status, body) stored under the first live key, or None"""
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[0] <= now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2]
+        return None
+
+    def put(self, keys, status, body):
+        """Stores a response under (key, ttl) pairs"""
+        now = time.monotonic()
+        with self._lock:
+            for key, ttl in keys:
+                if ttl <= 0:
+                    continue
+                self._entries[key] = (now + ttl, status, body)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def first_seen(self, key, ttl=None):
+        """Records key, returns False if it was already seen within ttl"""
+        if self.get([key]) is not None:
+            return False
+        self.put([(key, ttl or idempotency_ttl())], 0, b'')
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def idempotency_ttl():
+    return getattr(settings, 'GYM_CARD_IDEMPOTENCY_TTL', DEFAULT_TTL)
+
+
+def tap_window():
+    return getattr(settings, 'GYM_CARD_TAP_DEDUPE_WINDOW', DEFAULT_TAP_WINDOW)
+
+
+def idempotency_keys(request, data, scope):
+    """
+    (key, ttl) pairs a write request identifies itself with
+
+    Taken from the Idempotency-Key header, an 'idempotency_key' or
+    'read_id' field, or the (reader_id, card_id, read_at) of a card read.
+    """
+    ttl = idempotency_ttl()
+    keys = []
+    header = request.headers.get('Idempotency-Key')
+    if header:
+        keys.append((f'{scope}:key:{header}', ttl))
+    for field in ('idempotency_key', 'read_id'):
+        if data.get(field):
+            keys.append((f'{scope}:key:{data[field]}', ttl))
+    read = (data.get('reader_id'), data.get('card_id') or data.get('rfid_card_id'), data.get('read_at'))
+    if all(read):
+        keys.append((f'{scope}:read:{read[0]}:{read[1]}:{read[2]}', ttl))
+    return keys
+
+
+def replayed_response(status, body):
+    response = HttpResponse(body, status=status, content_type='application/json')
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+responses = ResponseCache()
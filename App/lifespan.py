@@ -0,0 +1,67 @@
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from App.broadcast import broadcast_queue
+from App.checkins import checkin_log, rollup_checkins
+from App.expiry import expire_cards
+from App.mqtt_service import mqtt_service
+from App.occupancy import reconcile
+from App.scheduler import scheduler
+
+logger = logging.getLogger(__name__)
+
+
+def register_jobs():
+    scheduler.every(getattr(settings, 'GYM_CARD_EXPIRY_INTERVAL', 60), expire_cards)
+    scheduler.every(checkin_log.flush_interval, checkin_log.flush, name='flush_checkins')
+    scheduler.every(getattr(settings, 'GYM_CARD_ROLLUP_INTERVAL', 60), rollup_checkins)
+    scheduler.every(getattr(settings, 'GYM_CARD_OCCUPANCY_RECONCILE_INTERVAL', 300), reconcile,
+                    name='reconcile_occupancy')
+
+
+def ensure_jobs_running():
+    """
+    Starts the background jobs on first use when no ASGI lifespan did
+
+    Called for every HTTP request by App.middleware.BackgroundJobsMiddleware;
+    a no-op once the scheduler runs or with GYM_CARD_RUN_JOBS off (jobs run
+    from cron through the management commands instead).
+    """
+    if scheduler.running or not getattr(settings, 'GYM_CARD_RUN_JOBS', True):
+        return
+    register_jobs()
+    scheduler.ensure_running()
+
+
+class LifespanApp:
+    """
+    Handles ASGI lifespan events to run background work next to the app
+
+    Servers without lifespan support (e.g. daphne) start the scheduler on
+    the first HTTP request instead (ensure_jobs_running), and the MQTT
+    ingestion service on first use.
+    """
+
+    async def __call__(self, scope, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    register_jobs()
+                    await broadcast_queue.start()
+                    scheduler.start()
+                    await mqtt_service.start()
+                except Exception as e:
+                    logger.error(f"Startup failed: {e}", exc_info=True)
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await mqtt_service.stop()
+                await scheduler.stop()
+                await sync_to_async(checkin_log.flush)()
+                await broadcast_queue.stop()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
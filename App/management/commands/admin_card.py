@@ -0,0 +1,34 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from App.broadcast import broadcast_update
+from App.models import GymCard
+from App.serializers import serialize_card
+from App.shared import require_shared_state
+
+
+class Command(BaseCommand):
+    help = (
+        'Makes a gym card open the admin panel at the door panels (or revokes it); '
+        'with the process-local backends use POST api/set_admin_card/ on the server instead'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('card_id', type=int)
+        parser.add_argument('--revoke', action='store_true', help='Turn the card back into a member card')
+
+    def handle(self, *args, **options):
+        try:
+            require_shared_state('Changing admin cards')
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+        try:
+            card = GymCard.objects.get(id=options['card_id'])
+        except GymCard.DoesNotExist:
+            raise CommandError(f"Gym card {options['card_id']} not found")
+        card.is_admin = not options['revoke']
+        card.save(update_fields=['is_admin'])
+        # The broadcast enters the shared change log; panels fetch the changed
+        # row with their next incremental rfid_snapshot
+        broadcast_update('card_update', serialize_card(card))
+        self.stdout.write(f"{card} is {'now' if card.is_admin else 'no longer'} an admin card")
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import logging
+import time
+
+from asgiref.testing import ApplicationCommunicator
+from channels.layers import get_channel_layer
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from App.broadcast import GROUP_NAME
+from App.consumers import GymCardConsumer, socket_stats
+from App.serializers import dumps
+
+# The consumers' logger, with the handlers of settings.LOGGING
+logger = logging.getLogger('App.consumers')
+
+
+class LegacyConsumer(GymCardConsumer):
+    """
+    The handler GymCardConsumer had before frames were pre-encoded, kept for
+    comparison: it logs the whole event, decodes and rebuilds the message
+    and encodes it again with the stdlib json module, for every socket
+    """
+
+    async def cards_changed(self, event):
+        try:
+            logger.info(f"Received broadcast event: {event}")
+            message_data = json.loads(event["data"])
+
+            formatted_message = {
+                'type': message_data['type'],
+                'data': message_data['card']
+            }
+
+            await self.send(text_data=json.dumps(formatted_message))
+            logger.info(f"Update sent to client {self.channel_name}")
+        except Exception as e:
+            logger.error(f"Error broadcasting message: {e}", exc_info=True)
+
+
+class Command(BaseCommand):
+    help = ('Measures fan-out of one cards_changed frame to many in-process WebSocket consumers; '
+            'the baseline logs through settings.LOGGING, so redirect stderr')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sockets', type=int, default=500)
+        parser.add_argument('--changes', type=int, default=20,
+                            help='Card changes per frame')
+        parser.add_argument('--frames', type=int, default=20,
+                            help='Frames per variant, the best time is reported')
+
+    def handle(self, *args, **options):
+        asyncio.run(self.run(options))
+
+    async def run(self, options):
+        now = timezone.now()
+        changes = [{
+            'type': 'card_update',
+            'data': {
+                'id': i,
+                'Title': f'Member {i}',
+                'Description': 'Monthly pass with sauna access',
+                'DateAdded': now.isoformat(),
+                'ExpirationDate': now.isoformat(),
+                'Status': 'in',
+                'Priority': i % 5,
+                'IsExpired': False,
+                'rfid_card_id': f'{i}-17-42'
+            }
+        } for i in range(options['changes'])]
+        frame = dumps({'type': 'cards_changed', 'changes': changes}).decode()
+        event = {
+            'type': 'cards_changed',
+            'text': frame,
+            # The former message format: the change as JSON, encoded by the view
+            'data': json.dumps({'type': 'cards_changed', 'card': changes})
+        }
+
+        self.stdout.write(f"{options['sockets']} sockets, {options['changes']} changes/frame "
+                          f"({len(frame)} bytes)")
+        for label, consumer in [('baseline: log, json re-encode', LegacyConsumer),
+                                ('forward pre-encoded frame', GymCardConsumer)]:
+            seconds = await self.measure(consumer, event, options)
+            self.stdout.write(f'  {label:<30} {seconds * 1000:9.2f} ms/frame  '
+                              f"{seconds / options['sockets'] * 1e6:7.2f} us/socket")
+        self.stdout.write(f'  stats: {socket_stats.summary()}')
+
+    async def measure(self, consumer, event, options):
+        application = consumer.as_asgi()
+        sockets = []
+        for _ in range(options['sockets']):
+            socket = ApplicationCommunicator(application, {
+                'type': 'websocket', 'path': '/ws/gym_cards/', 'headers': []
+            })
+            await socket.send_input({'type': 'websocket.connect'})
+            await socket.receive_output(timeout=5)  # websocket.accept
+            sockets.append(socket)
+
+        channel_layer = get_channel_layer()
+        timings = []
+        try:
+            for _ in range(options['frames']):
+                start = time.perf_counter()
+                await channel_layer.group_send(GROUP_NAME, event)
+                await asyncio.gather(*(socket.receive_output(timeout=5) for socket in sockets))
+                timings.append(time.perf_counter() - start)
+        finally:
+            for socket in sockets:
+                await socket.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            for socket in sockets:
+                await socket.wait(timeout=5)
+        return min(timings)
@@ -0,0 +1,105 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from App.models import GymCard
+from App.search import OrmSearchBackend, Fts5SearchBackend
+
+WORDS = ['gold', 'silver', 'student', 'morning', 'weekend', 'family', 'senior', 'trial', 'pool', 'sauna']
+STATUSES = ['active', 'inactive', 'in', 'suspended', 'expired']
+
+
+def legacy_search(search_by, search_term):
+    """The pre-query-builder search_gym_card loop, kept for comparison"""
+    gym_cards_data = []
+    for card in GymCard.objects.all():
+        gym_cards_data.append({
+            'id': card.id,
+            'Title': card.title,
+            'rfid_card_id': card.rfid_card_id,
+            'Description': card.description,
+            'DateAdded': card.date_added,
+            'ExpirationDate': card.expiration_date,
+            'Status': card.status,
+            'Priority': card.priority,
+        })
+    return [
+        card for card in gym_cards_data
+        if search_by in card and card[search_by]
+        and str(card[search_by]).lower().find(str(search_term).lower()) != -1
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks search_gym_card backends against the legacy Python loop on a throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000',
+                            help='Comma separated card counts to benchmark')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Runs per query, the best time is reported')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            for size in sizes:
+                self.populate(size)
+                self.stdout.write(f'\n{size} cards')
+                self.run_queries(size, options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def populate(self, size):
+        GymCard.objects.all().delete()
+        rng = random.Random(size)
+        now = timezone.now()
+        cards = [
+            GymCard(
+                title=f'{rng.choice(WORDS).title()} member {i}',
+                description=' '.join(rng.choice(WORDS) for _ in range(8)),
+                rfid_card_id='-'.join(str(rng.randrange(256)) for _ in range(5)) + f'-{i}',
+                expiration_date=now + timedelta(days=rng.randrange(-30, 365)),
+                status=rng.choice(STATUSES),
+                priority=rng.randrange(5),
+            )
+            for i in range(size)
+        ]
+        GymCard.objects.bulk_create(cards, batch_size=2000)
+
+    def run_queries(self, size, repeat):
+        rfid = GymCard.objects.values_list('rfid_card_id', flat=True).order_by('?').first()
+        orm = OrmSearchBackend()
+        fts = Fts5SearchBackend()
+        cases = [
+            ('rfid exact', 'rfid_card_id', rfid, 'exact'),
+            ('title prefix', 'Title', 'Gold member 1', 'prefix'),
+            ('status contains', 'Status', 'suspended', None),
+            ('text common', 'text', 'sauna family', None),
+            ('text rare', 'text', f'member {size // 2}', None),
+        ]
+        for label, search_by, term, match in cases:
+            # The legacy loop has no free-text mode, approximate it with one field
+            legacy_by = 'Title' if search_by == 'text' else search_by
+            timings = [('legacy', self.best(repeat, lambda: legacy_search(legacy_by, term)))]
+            timings.append(('orm', self.best(repeat, lambda: list(
+                orm.search(GymCard.objects.all(), search_by, term, match)))))
+            if search_by == 'text':
+                timings.append(('fts5', self.best(repeat, lambda: list(
+                    fts.search(GymCard.objects.all(), search_by, term, match)))))
+            self.stdout.write('  {:<16} {}'.format(
+                label, '  '.join(f'{name} {seconds * 1000:9.2f} ms' for name, seconds in timings)
+            ))
+
+    @staticmethod
+    def best(repeat, func):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
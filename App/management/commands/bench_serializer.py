@@ -0,0 +1,74 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.http import JsonResponse
+from django.utils import timezone
+
+from App.models import GymCard
+from App.serializers import CardJsonResponse, card_serializer, orjson
+
+
+def legacy_serialize(queryset):
+    """The hand-written per-view card dict loop, kept for comparison"""
+    return [{
+        'id': card.id,
+        'Title': card.title,
+        'Description': card.description,
+        'DateAdded': card.date_added,
+        'ExpirationDate': card.expiration_date,
+        'Status': card.status,
+        'Priority': card.priority,
+        'IsExpired': card.is_expired,
+        'rfid_card_id': card.rfid_card_id
+    } for card in queryset]
+
+
+class Command(BaseCommand):
+    help = 'Measures per-card serialization cost of the card serializer against the legacy view code'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cards', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Runs per variant, the best time is reported')
+
+    def handle(self, *args, **options):
+        cards = options['cards']
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            now = timezone.now()
+            GymCard.objects.bulk_create([
+                GymCard(
+                    title=f'Member {i}',
+                    description='Monthly pass with sauna access',
+                    rfid_card_id=f'{i % 256}-{i // 256}-17-42',
+                    expiration_date=now + timedelta(days=i % 365),
+                    priority=i % 5,
+                )
+                for i in range(cards)
+            ], batch_size=2000)
+
+            serializer = card_serializer()
+            queryset = GymCard.objects.all()
+            variants = [
+                ('legacy dicts + JsonResponse',
+                 lambda: JsonResponse({'gym_cards': legacy_serialize(queryset.all())})),
+                ('serializer + CardJsonResponse',
+                 lambda: CardJsonResponse({'gym_cards': serializer.many(queryset.all())})),
+            ]
+            self.stdout.write(f"{cards} cards, JSON encoder: {'orjson' if orjson else 'stdlib'}")
+            for label, func in variants:
+                seconds = self.best(options['repeat'], func)
+                self.stdout.write(f'  {label:<32} {seconds * 1000:9.2f} ms  {seconds / cards * 1e6:7.2f} us/card')
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    @staticmethod
+    def best(repeat, func):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
@@ -0,0 +1,17 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from App.expiry import expire_cards
+from App.shared import require_shared_state
+
+
+class Command(BaseCommand):
+    help = 'Flags gym cards past their expiration date as expired'
+
+    def handle(self, *args, **options):
+        try:
+            require_shared_state('Expiring cards')
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+        card_ids = expire_cards()
+        self.stdout.write(f'Expired {len(card_ids)} gym cards')
@@ -0,0 +1,17 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from App.occupancy import reconcile
+from App.shared import require_shared_state
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the occupancy counter from the gym card statuses'
+
+    def handle(self, *args, **options):
+        try:
+            require_shared_state('Recounting occupancy')
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+        count = reconcile()
+        self.stdout.write(f'{count} members inside')
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Serves an in-memory Redis stand-in (fakeredis) for trying the production settings locally'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=6379)
+
+    def handle(self, *args, **options):
+        try:
+            from fakeredis import TcpFakeServer
+            import lupa  # noqa: F401 - channels_redis needs EVAL
+        except ImportError:
+            raise CommandError('redis_standin requires the fakeredis and lupa packages')
+
+        server = TcpFakeServer((options['host'], options['port']), server_type='redis')
+        self.stdout.write(f"Redis stand-in listening on {options['host']}:{options['port']}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
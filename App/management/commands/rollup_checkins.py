@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from App.checkins import rollup_checkins
+
+
+class Command(BaseCommand):
+    help = 'Folds new check-in events into the hourly and daily rollup tables'
+
+    def handle(self, *args, **options):
+        count = rollup_checkins()
+        self.stdout.write(f'Rolled up {count} check-in events')
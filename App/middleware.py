@@ -1,5 +1,7 @@
 from django.http import HttpResponse
 
+from App.lifespan import ensure_jobs_running
+
 class MimeTypeMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
@@ -16,3 +18,14 @@ class MimeTypeMiddleware:
             response['Content-Type'] = 'application/json'
         
         return response
+
+
+class BackgroundJobsMiddleware:
+    """Starts the scheduled jobs on the first request under servers without ASGI lifespan"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        ensure_jobs_running()
+        return self.get_response(request)
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:31
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def clear_colliding_rfids(apps, schema_editor):
+    # Unset tags are stored as '' by older code, and the old MQTT script
+    # enrolled every card with the literal 'card_id': neither identifies a
+    # card, so both become NULL before the unique constraint is added
+    GymCard = apps.get_model('App', 'GymCard')
+    duplicates = (
+        GymCard.objects.exclude(rfid_card_id__isnull=True)
+        .values('rfid_card_id')
+        .annotate(cards=Count('id'))
+        .filter(cards__gt=1)
+        .values_list('rfid_card_id', flat=True)
+    )
+    GymCard.objects.filter(rfid_card_id__in=[''] + list(duplicates)).update(rfid_card_id=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0007_gymcard_rfid_card_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_colliding_rfids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='gymcard',
+            name='rfid_card_id',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,66 @@
+from django.db import migrations
+
+FTS_TABLE = 'App_gymcard_fts'
+
+CREATE_STATEMENTS = [
+    f'''CREATE VIRTUAL TABLE "{FTS_TABLE}" USING fts5(
+        title, description, content='App_gymcard', content_rowid='id'
+    )''',
+    f'''CREATE TRIGGER "{FTS_TABLE}_ai" AFTER INSERT ON "App_gymcard" BEGIN
+        INSERT INTO "{FTS_TABLE}"(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END''',
+    f'''CREATE TRIGGER "{FTS_TABLE}_ad" AFTER DELETE ON "App_gymcard" BEGIN
+        INSERT INTO "{FTS_TABLE}"("{FTS_TABLE}", rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END''',
+    f'''CREATE TRIGGER "{FTS_TABLE}_au" AFTER UPDATE OF title, description ON "App_gymcard" BEGIN
+        INSERT INTO "{FTS_TABLE}"("{FTS_TABLE}", rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO "{FTS_TABLE}"(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END''',
+    f'''INSERT INTO "{FTS_TABLE}"("{FTS_TABLE}") VALUES ('rebuild')''',
+]
+
+DROP_STATEMENTS = [
+    f'DROP TRIGGER IF EXISTS "{FTS_TABLE}_ai"',
+    f'DROP TRIGGER IF EXISTS "{FTS_TABLE}_ad"',
+    f'DROP TRIGGER IF EXISTS "{FTS_TABLE}_au"',
+    f'DROP TABLE IF EXISTS "{FTS_TABLE}"',
+]
+
+
+def fts5_supported(schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return False
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return any(option == 'ENABLE_FTS5' for (option,) in cursor.fetchall())
+
+
+def create_fts_index(apps, schema_editor):
+    # The full-text index is optional: other databases and SQLite builds
+    # without FTS5 keep using the ORM search backend
+    if not fts5_supported(schema_editor):
+        return
+    for statement in CREATE_STATEMENTS:
+        schema_editor.execute(statement)
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in DROP_STATEMENTS:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0008_gymcard_rfid_card_id_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0009_gymcard_fts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gymcard',
+            index=models.Index(fields=['date_added'], name='gymcard_date_added_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gymcard',
+            index=models.Index(fields=['status'], name='gymcard_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gymcard',
+            index=models.Index(fields=['priority'], name='gymcard_priority_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gymcard',
+            index=models.Index(fields=['status', 'priority'], name='gymcard_status_priority_idx'),
+        ),
+    ]
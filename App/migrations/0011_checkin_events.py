@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0010_gymcard_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckInDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('check_ins', models.IntegerField(default=0)),
+                ('check_outs', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CheckInHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(unique=True)),
+                ('check_ins', models.IntegerField(default=0)),
+                ('check_outs', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupCursor',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('last_event_id', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CheckInEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rfid_card_id', models.CharField(blank=True, max_length=100)),
+                ('direction', models.CharField(choices=[('in', 'Check-in'), ('out', 'Check-out')], max_length=3)),
+                ('reader_id', models.CharField(blank=True, max_length=100)),
+                ('occurred_at', models.DateTimeField(db_index=True)),
+                ('card', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='checkins', to='App.gymcard')),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:10
+
+from django.db import migrations, models
+
+
+def count_inside(apps, schema_editor):
+    GymCard = apps.get_model('App', 'GymCard')
+    Occupancy = apps.get_model('App', 'Occupancy')
+    Occupancy.objects.create(pk=1, count=GymCard.objects.filter(status='in').count())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0011_checkin_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Occupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(count_inside, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:19
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+fts = import_module('App.migrations.0009_gymcard_fts')
+
+
+def rebuild_fts_index(apps, schema_editor):
+    # SQLite adds the column by rebuilding App_gymcard, which drops the
+    # triggers keeping the 0009 full-text index in step with it
+    fts.drop_fts_index(apps, schema_editor)
+    fts.create_fts_index(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0012_occupancy'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, rebuild_fts_index),
+        migrations.AddField(
+            model_name='gymcard',
+            name='is_admin',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(rebuild_fts_index, migrations.RunPython.noop),
+    ]
@@ -11,13 +11,76 @@ class GymCard(models.Model):
     ]
 
     title = models.CharField(max_length=100)
-    rfid_card_id = models.CharField(max_length=100, null=True, blank=True)
+    rfid_card_id = models.CharField(max_length=100, null=True, blank=True, unique=True)
     description = models.TextField()
     date_added = models.DateTimeField(auto_now_add=True)
     expiration_date = models.DateTimeField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     priority = models.IntegerField(default=0)
     is_expired = models.BooleanField(default=False)
+    # Opens the admin panel at the door panels instead of checking in
+    is_admin = models.BooleanField(default=False)
+
+    class Meta:
+        # Back the ORDER BY clauses of sort_gym_card
+        indexes = [
+            models.Index(fields=['date_added'], name='gymcard_date_added_idx'),
+            models.Index(fields=['status'], name='gymcard_status_idx'),
+            models.Index(fields=['priority'], name='gymcard_priority_idx'),
+            models.Index(fields=['status', 'priority'], name='gymcard_status_priority_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} (RFID: {self.rfid_card_id or 'None'})"
+
+
+class CheckInEvent(models.Model):
+    """
+    One check-in or check-out, never changed once written
+
+    Written in batches by App.checkins; card is kept nullable so the
+    history survives deleting the card.
+    """
+    DIRECTION_CHOICES = [
+        ('in', 'Check-in'),
+        ('out', 'Check-out')
+    ]
+
+    card = models.ForeignKey(GymCard, null=True, on_delete=models.SET_NULL, related_name='checkins')
+    rfid_card_id = models.CharField(max_length=100, blank=True)
+    direction = models.CharField(max_length=3, choices=DIRECTION_CHOICES)
+    reader_id = models.CharField(max_length=100, blank=True)
+    occurred_at = models.DateTimeField(db_index=True)
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError('Check-in events are append-only')
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.direction} {self.rfid_card_id} at {self.occurred_at}"
+
+
+class CheckInHourly(models.Model):
+    """Check-ins and check-outs per hour, maintained by App.checkins.rollup_checkins"""
+    hour = models.DateTimeField(unique=True)
+    check_ins = models.IntegerField(default=0)
+    check_outs = models.IntegerField(default=0)
+
+
+class CheckInDaily(models.Model):
+    """Check-ins and check-outs per day, maintained by App.checkins.rollup_checkins"""
+    day = models.DateField(unique=True)
+    check_ins = models.IntegerField(default=0)
+    check_outs = models.IntegerField(default=0)
+
+
+class RollupCursor(models.Model):
+    """Last CheckInEvent id folded into the rollups"""
+    name = models.CharField(max_length=50, primary_key=True)
+    last_event_id = models.BigIntegerField(default=0)
+
+
+class Occupancy(models.Model):
+    """Single row counting the cards with status 'in', maintained by App.occupancy"""
+    count = models.IntegerField(default=0)
@@ -0,0 +1,215 @@
+import asyncio
+import json
+import logging
+import threading
+import uuid
+
+import paho.mqtt.client as mqtt
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from App.enrolment import enrolment_registry, bind_rfid, EnrolmentSession
+from App.idempotency import responses
+
+logger = logging.getLogger(__name__)
+
+
+def create_client(client_id):
+    kwargs = {'client_id': client_id, 'protocol': mqtt.MQTTv311}
+    # paho-mqtt 2.x requires choosing the callback API explicitly
+    if hasattr(mqtt, 'CallbackAPIVersion'):
+        kwargs['callback_api_version'] = mqtt.CallbackAPIVersion.VERSION1
+    return mqtt.Client(**kwargs)
+
+
+class MqttIngestionService:
+    """
+    Long-lived MQTT subscriber for RFID scans
+
+    One paho client per process, driven by the asyncio event loop (its socket
+    is registered with add_reader/add_writer instead of running paho's own
+    network thread). Messages on the card topic are handed to the oldest
+    pending enrolment session in App.enrolment.enrolment_registry, so
+    enrolment requests never open broker connections themselves. The same
+    loop ticks the enrolment timer wheel. Lost connections are retried with
+    exponential backoff.
+    """
+
+    MIN_BACKOFF = 1
+    MAX_BACKOFF = 60
+
+    def __init__(self):
+        self._loop = None
+        self._client = None
+        self._tasks = []
+        self._start_lock = threading.Lock()
+        self._connected = threading.Event()
+        self._disconnected = None
+
+    @property
+    def connected(self):
+        return self._connected.is_set()
+
+    async def wait_until_connected(self, timeout):
+        if self._connected.is_set():
+            return True
+        return await asyncio.to_thread(self._connected.wait, timeout)
+
+    async def run(self, coro):
+        """
+        Runs a coroutine on the service's event loop and awaits its result
+
+        The enrolment registry is confined to that loop; this lets views
+        running on another loop (or none, under WSGI) reach it safely.
+        """
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._loop))
+
+    async def start(self):
+        """Starts the service on the running event loop (ASGI lifespan startup)"""
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            self._loop = asyncio.get_running_loop()
+        self._disconnected = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._supervise(), name='mqtt_supervise'),
+            asyncio.create_task(self._housekeeping(), name='mqtt_housekeeping'),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._client is not None:
+            self._client.disconnect()
+        self._connected.clear()
+        self._loop = None
+
+    def ensure_running(self):
+        """
+        Starts the service on a private event loop thread if no ASGI lifespan
+        started it (e.g. under runserver or daphne)
+        """
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            self._loop = loop
+
+        def run():
+            asyncio.set_event_loop(loop)
+            self._disconnected = asyncio.Event()
+            self._tasks = [loop.create_task(self._supervise()), loop.create_task(self._housekeeping())]
+            loop.run_forever()
+
+        threading.Thread(target=run, name='mqtt-ingestion', daemon=True).start()
+
+    async def _supervise(self):
+        backoff = self.MIN_BACKOFF
+        while True:
+            try:
+                await self._connect()
+                backoff = self.MIN_BACKOFF
+                await self._disconnected.wait()
+                logger.warning("MQTT connection lost, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"MQTT connection failed: {e}")
+            self._connected.clear()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.MAX_BACKOFF)
+
+    async def _connect(self):
+        loop = asyncio.get_running_loop()
+        client = create_client(f"django_ingest_{uuid.uuid4().hex[:12]}")
+        client.on_connect = self._on_connect
+        client.on_disconnect = self._on_disconnect
+        client.on_message = self._on_message
+
+        # Let the event loop drive the socket instead of a paho thread; the
+        # callbacks may fire from the executor thread during connect()
+        client.on_socket_open = lambda c, userdata, sock: loop.call_soon_threadsafe(
+            loop.add_reader, sock, c.loop_read)
+        client.on_socket_close = lambda c, userdata, sock: loop.call_soon_threadsafe(
+            loop.remove_reader, sock)
+        client.on_socket_register_write = lambda c, userdata, sock: loop.call_soon_threadsafe(
+            loop.add_writer, sock, c.loop_write)
+        client.on_socket_unregister_write = lambda c, userdata, sock: loop.call_soon_threadsafe(
+            loop.remove_writer, sock)
+
+        self._disconnected.clear()
+        self._client = client
+        await loop.run_in_executor(
+            None, client.connect, settings.MQTT_BROKER_HOST, settings.MQTT_BROKER_PORT, 60
+        )
+
+    async def _housekeeping(self):
+        wheel = enrolment_registry.wheel
+        while True:
+            await asyncio.sleep(wheel.tick)
+            if self._client is not None:
+                # Keepalive pings and retries of unacknowledged packets
+                self._client.loop_misc()
+            wheel.advance()
+
+    def _on_connect(self, client, userdata, flags, rc):
+        if rc != 0:
+            logger.error(f"Failed to connect to MQTT broker with code: {rc}")
+            self._disconnected.set()
+            return
+        # With several workers a shared subscription ($share/...) delivers
+        # each scan to only one of them
+        topic = getattr(settings, 'MQTT_CARD_SUBSCRIPTION', settings.MQTT_CARD_TOPIC)
+        client.subscribe(topic, qos=1)
+        self._connected.set()
+        logger.info(f"Subscribed to {topic} topic with QoS 1")
+
+    def _on_disconnect(self, client, userdata, rc):
+        self._connected.clear()
+        self._disconnected.set()
+
+    def _on_message(self, client, userdata, msg):
+        # Either one read {'card_id', 'reader_id', 'read_at', 'read_id'} or
+        # a batch {'reads': [read, ...]} from a reader gateway
+        try:
+            payload = json.loads(msg.payload.decode())
+            reads = payload['reads'] if 'reads' in payload else [payload]
+            # Spooled reads are resent until acknowledged: skip known read_ids
+            card_ids = [read.get('card_id') for read in reads
+                        if not read.get('read_id') or responses.first_seen(f"mqtt:read:{read['read_id']}")]
+        except (ValueError, AttributeError, KeyError, TypeError) as e:
+            logger.error(f"Failed to decode MQTT message: {e}")
+            return
+        loop = asyncio.get_running_loop()
+        for card_id in card_ids:
+            if not card_id:
+                logger.error("No card_id in MQTT message")
+                continue
+            loop.create_task(self._dispatch(str(card_id)))
+
+    async def _dispatch(self, rfid_card_id):
+        session = await enrolment_registry.claim_next()
+        if session is None:
+            logger.debug(f"RFID {rfid_card_id} scanned with no pending enrolment")
+            return
+        card = None
+        try:
+            card = await sync_to_async(bind_rfid)(session.card_id, rfid_card_id)
+        except Exception as e:
+            logger.error(f"Error updating card: {e}", exc_info=True)
+        if card is None:
+            # Keep waiting for another tag until the session times out
+            await enrolment_registry.requeue(session)
+        else:
+            session.finish(EnrolmentSession.BOUND, card)
+
+
+mqtt_service = MqttIngestionService()
@@ -0,0 +1,69 @@
+import logging
+
+from django.db import transaction
+from django.db.models import F
+
+from App.broadcast import broadcast_update
+from App.models import GymCard, Occupancy
+
+logger = logging.getLogger(__name__)
+
+COUNTER_ID = 1
+INSIDE = 'in'
+
+
+def current():
+    """Members currently inside, read from the single counter row"""
+    count = Occupancy.objects.filter(pk=COUNTER_ID).values_list('count', flat=True).first()
+    return reconcile() if count is None else count
+
+
+def adjust(delta):
+    """
+    Adds delta to the occupancy counter
+
+    Call inside the transaction that changes the card statuses, after the
+    write, so the counter commits or rolls back with them. Subscribers of
+    ws/gym_cards get an 'occupancy' change once the transaction commits.
+    """
+    if not delta:
+        return
+    if not Occupancy.objects.filter(pk=COUNTER_ID).update(count=F('count') + delta):
+        # No counter row yet: count the statuses, which already include this change
+        reconcile()
+        return
+    transaction.on_commit(_publish)
+
+
+def transition(previous_status, status):
+    """Adjusts the counter for one card going from previous_status to status"""
+    adjust((status == INSIDE) - (previous_status == INSIDE))
+
+
+def reconcile():
+    """
+    Recomputes the counter from the card statuses
+
+    Run periodically to repair drift from writes that bypass adjust()
+    (admin edits, raw queries).
+
+    Returns:
+        int: Members currently inside
+    """
+    with transaction.atomic():
+        counter, created = Occupancy.objects.select_for_update().get_or_create(pk=COUNTER_ID)
+        count = GymCard.objects.filter(status=INSIDE).count()
+        if created or counter.count != count:
+            if not created:
+                logger.warning(f"Occupancy counter was {counter.count}, recounted {count}")
+            counter.count = count
+            counter.save(update_fields=['count'])
+            transaction.on_commit(_publish)
+    return count
+
+
+def _publish():
+    try:
+        broadcast_update('occupancy', {'count': current()})
+    except Exception as e:
+        logger.error(f"Broadcast error: {e}")
@@ -0,0 +1,167 @@
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+
+from App.models import GymCard
+from App.serializers import CARD_FIELDS, ALL_CARD_KEYS, card_serializer
+
+# sort_by keys accepted by sort_gym_card mapped to indexed GymCard fields
+SORT_FIELDS = {
+    'date': 'date_added',
+    'status': 'status',
+    'priority': 'priority',
+}
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class PaginationError(ValueError):
+    """Raised on malformed limit, cursor or fields parameters"""
+
+
+def parse_fields(value, default_keys):
+    """
+    Parses a fields= projection given as a comma separated string or a list
+
+    Returns:
+        tuple: Requested card keys, 'id' is always included
+    """
+    if not value:
+        return tuple(default_keys)
+    keys = value.split(',') if isinstance(value, str) else list(value)
+    keys = [key.strip() for key in keys if key and key.strip()]
+    unknown = [key for key in keys if key not in CARD_FIELDS]
+    if unknown:
+        raise PaginationError(f"Unknown fields: {', '.join(unknown)}")
+    if 'id' not in keys:
+        keys.insert(0, 'id')
+    return tuple(dict.fromkeys(keys))
+
+
+def parse_ordering(value):
+    """
+    Parses sort keys given as a comma separated string or a list
+
+    A '-' prefix sorts that key in descending order, e.g. 'status,-priority'.
+
+    Returns:
+        list: Ordering in QuerySet.order_by() form
+    """
+    keys = value.split(',') if isinstance(value, str) else list(value or [])
+    ordering = []
+    for key in keys:
+        key = str(key).strip()
+        descending = key.startswith('-')
+        field = SORT_FIELDS.get(key.lstrip('-'))
+        if field is None:
+            raise PaginationError('Invalid sort_by parameter')
+        ordering.append(f'-{field}' if descending else field)
+    if not ordering:
+        raise PaginationError('Invalid sort_by parameter')
+    return ordering
+
+
+def parse_limit(value):
+    if value in (None, ''):
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise PaginationError('limit must be an integer')
+    if limit < 1:
+        raise PaginationError('limit must be positive')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def _cursor_value(value):
+    # Full precision isoformat, DjangoJSONEncoder would drop microseconds
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'Unsupported cursor value: {value!r}')
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, default=_cursor_value, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, ordering):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise PaginationError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise PaginationError('Invalid cursor')
+    try:
+        return [
+            GymCard._meta.get_field(field.lstrip('-')).to_python(value)
+            for field, value in zip(ordering, values)
+        ]
+    except Exception:
+        raise PaginationError('Invalid cursor')
+
+
+def keyset_filter(ordering, values):
+    """
+    Builds the WHERE clause selecting rows strictly after a cursor position
+
+    For ordering (a, -b, id) this is
+    a > x OR (a = x AND b < y) OR (a = x AND b = y AND id > z)
+    """
+    query = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        query |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return query
+
+
+def paginate(queryset, params, ordering=('id',), default_keys=ALL_CARD_KEYS):
+    """
+    Returns one keyset-paginated page of cards as dicts
+
+    Only the columns needed for the requested keys and the ordering are
+    selected, and rows are read as tuples so no model instances are built.
+
+    Args:
+        queryset: GymCard queryset to page through
+        params: Mapping with optional 'limit', 'cursor' and 'fields'
+        ordering: Model field names, '-' prefix for descending; 'id' is
+            appended as a tie-breaker so the order is total
+        default_keys: Card keys returned when params has no 'fields'
+
+    Returns:
+        dict: {'gym_cards': [...], 'next_cursor': str or None}
+    """
+    ordering = list(ordering)
+    if 'id' not in ordering and '-id' not in ordering:
+        ordering.append('id')
+
+    keys = parse_fields(params.get('fields'), default_keys)
+    limit = parse_limit(params.get('limit'))
+
+    if params.get('cursor'):
+        queryset = queryset.filter(keyset_filter(ordering, decode_cursor(params['cursor'], ordering)))
+
+    serializer = card_serializer(keys)
+    order_fields = [field.lstrip('-') for field in ordering]
+    columns = serializer.fields + tuple(field for field in order_fields if field not in serializer.fields)
+    cursor_positions = [columns.index(field) for field in order_fields]
+    rows = list(queryset.order_by(*ordering).values_list(*columns)[:limit + 1])
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1][position] for position in cursor_positions])
+
+    return {
+        # zip() stops at the serializer keys, dropping ordering-only columns
+        'gym_cards': [dict(zip(keys, row)) for row in rows],
+        'next_cursor': next_cursor,
+    }
@@ -0,0 +1,41 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+CONNECT_TIMEOUT = 2  # Seconds to open a connection to the server
+READ_TIMEOUT = 5  # Seconds to wait for a response
+POOL_SIZE = 4  # Kept-alive connections, one per panel thread talking to the API
+
+
+class ApiClient:
+    """
+    Shared HTTP session for the panel scripts
+
+    Connections to the server are pooled and kept alive instead of opened
+    for every call, every request has a timeout, and failed connections are
+    retried with backoff. Only GETs are retried once a request was sent, so
+    a POST such as a card toggle is never applied twice.
+    """
+
+    def __init__(self, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), pool_size=POOL_SIZE):
+        self.timeout = timeout
+        self.session = requests.Session()
+        retries = Retry(
+            total=3,
+            connect=3,
+            read=2,
+            status=2,
+            backoff_factor=0.2,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retries)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, url, params=None):
+        return self.session.get(url, params=params, timeout=self.timeout)
+
+    def post(self, url, payload):
+        return self.session.post(url, json=payload, timeout=self.timeout)
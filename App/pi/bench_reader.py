@@ -0,0 +1,81 @@
+"""
+Benchmarks RFID read strategies on a SimulatedSource, no hardware needed
+
+    python bench_reader.py [--seconds 20] [--taps 40] [--poll-cost 0.001]
+
+Reports the CPU used by the reader thread and the delay between a card
+reaching the reader and read() returning it.
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+
+from rfid_reader import Debouncer, RfidReader, SimulatedSource
+
+STRATEGIES = {
+    # name: (min interval, max interval, use IRQ)
+    "busy loop (old panel)": (0, 0, False),
+    "fixed 100ms (old mqtt)": (0.1, 0.1, False),
+    "adaptive 20-100ms": (0.02, 0.1, False),
+    "irq edge": (0.02, 0.1, True),
+}
+
+
+def make_taps(count, seconds, seed=7):
+    rng = random.Random(seed)
+    offsets = sorted(rng.uniform(0.5, seconds - 2) for _ in range(count))
+    taps, last = [], -1
+    for index, offset in enumerate(offsets):
+        # Keep taps apart by more than a hold plus the release time
+        offset = max(offset, last + 1.5)
+        taps.append((offset, f"{index}-{rng.randrange(256)}", rng.uniform(0.2, 0.4)))
+        last = offset
+    return taps
+
+
+def run(taps, seconds, poll_cost, min_interval, max_interval, use_irq):
+    source = SimulatedSource(taps, poll_cost=poll_cost, irq=use_irq)
+    reader = RfidReader(source, Debouncer(release_after=0.3), min_interval, max_interval, use_irq)
+    latencies = []
+    cpu = {}
+
+    def loop():
+        start_cpu = time.thread_time()
+        end = source.start + seconds
+        while time.monotonic() < end:
+            card_id = reader.read(timeout=end - time.monotonic())
+            if card_id is not None:
+                offset = next(offset for offset, tap_id, _ in taps if tap_id == card_id)
+                latencies.append(time.monotonic() - source.start - offset)
+        cpu["seconds"] = time.thread_time() - start_cpu
+
+    thread = threading.Thread(target=loop)
+    thread.start()
+    thread.join()
+    return cpu["seconds"] / seconds, latencies, source.polls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--taps", type=int, default=40)
+    parser.add_argument("--poll-cost", type=float, default=0.001,
+                        help="CPU seconds one simulated poll spins for")
+    args = parser.parse_args()
+
+    taps = make_taps(args.taps, args.seconds)
+    print(f"{len(taps)} taps over {args.seconds:.0f}s, {args.poll_cost * 1000:.1f}ms per poll")
+    print(f"  {'strategy':<24} {'cpu':>7} {'polls/s':>8} {'read':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, (min_interval, max_interval, use_irq) in STRATEGIES.items():
+        cpu, latencies, polls = run(taps, args.seconds, args.poll_cost, min_interval, max_interval, use_irq)
+        latencies.sort()
+        p50 = statistics.median(latencies) * 1000 if latencies else float("nan")
+        p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else float("nan")
+        print(f"  {name:<24} {cpu:>6.1%} {polls / args.seconds:>8.0f} {len(latencies):>3}/{len(taps):<3} "
+              f"{p50:>8.1f} {p95:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
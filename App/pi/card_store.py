@@ -0,0 +1,193 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+import requests
+
+# Local copy of the server's RFID table, next to the panel scripts
+STORE_PATH = "cards.db"
+REFRESH_INTERVAL = 5  # Seconds between incremental refreshes
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cards (
+    rfid TEXT PRIMARY KEY,
+    id INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    expiration TEXT NOT NULL,
+    expired INTEGER NOT NULL,
+    admin INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS cards_id ON cards (id);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS outbox (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    card_id INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    created REAL NOT NULL
+);
+"""
+
+
+class CardStore:
+    """
+    SQLite snapshot of RFID -> (id, status, priority, expiry, admin) plus an outbox
+
+    Taps are decided from the local table, so the door keeps working while
+    the server is unreachable. Status changes are applied locally at once
+    and queued in the outbox; SyncWorker replays them in order and pulls
+    the server's changes (api/rfid_snapshot) in the background. Both tables
+    survive restarts.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(cards)")]
+        if "admin" not in columns:
+            # Store from before admin flags: add the column and refresh everything
+            self._db.execute("ALTER TABLE cards ADD COLUMN admin INTEGER NOT NULL DEFAULT 0")
+            self._db.execute("DELETE FROM meta")
+
+    def lookup(self, rfid_card_id):
+        """Returns the card bound to a tag as a dict, or None"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, status, priority, expiration, expired, admin FROM cards WHERE rfid = ?",
+                (rfid_card_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        card_id, status, priority, expiration, expired, admin = row
+        return {
+            "id": card_id,
+            "Status": status,
+            "Priority": priority,
+            "ExpirationDate": expiration,
+            "IsExpired": bool(expired),
+            "IsAdmin": bool(admin)
+        }
+
+    def remember(self, rfid_card_id, card):
+        """Stores a card resolved from the server before the next refresh"""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO cards VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (rfid_card_id, card["id"], card.get("Status", ""), card.get("Priority", 1),
+                 card.get("ExpirationDate", ""), int(bool(card.get("IsExpired"))),
+                 int(bool(card.get("IsAdmin"))))
+            )
+
+    def set_status(self, card_id, status):
+        """Applies a status change locally and queues it for the server"""
+        # The key lets the server ignore a replay of an update it already applied
+        payload = json.dumps({"id": card_id, "status": status, "idempotency_key": uuid.uuid4().hex})
+        with self._lock, self._db:
+            self._db.execute("UPDATE cards SET status = ? WHERE id = ?", (status, card_id))
+            self._db.execute(
+                "INSERT INTO outbox (card_id, payload, created) VALUES (?, ?, ?)",
+                (card_id, payload, time.time())
+            )
+
+    def pending(self, limit=50):
+        """Oldest queued updates as (seq, payload dict)"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, payload FROM outbox ORDER BY seq LIMIT ?", (limit,)
+            ).fetchall()
+        return [(seq, json.loads(payload)) for seq, payload in rows]
+
+    def acknowledge(self, seq):
+        with self._lock:
+            self._db.execute("DELETE FROM outbox WHERE seq = ?", (seq,))
+
+    def cursor(self):
+        """(epoch, seq) of the last applied refresh"""
+        with self._lock:
+            meta = dict(self._db.execute("SELECT key, value FROM meta").fetchall())
+        return meta.get("epoch"), meta.get("seq")
+
+    def apply(self, snapshot):
+        """Applies an api/rfid_snapshot response"""
+        with self._lock, self._db:
+            # Local changes not yet on the server win over the server's rows
+            queued = {card_id for (card_id,) in self._db.execute("SELECT DISTINCT card_id FROM outbox")}
+            if snapshot["full"]:
+                self._db.execute("DELETE FROM cards WHERE id NOT IN (SELECT card_id FROM outbox)")
+            else:
+                self._db.executemany(
+                    "DELETE FROM cards WHERE id = ?",
+                    [(card_id,) for card_id in snapshot["ids"] if card_id not in queued]
+                )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO cards VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(rfid, card_id, status, priority, expiration, int(expired), int(admin))
+                 for rfid, card_id, status, priority, expiration, expired, admin in snapshot["cards"]
+                 if card_id not in queued]
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                [("epoch", snapshot["epoch"]), ("seq", str(snapshot["seq"]))]
+            )
+
+
+def is_expired(card):
+    """Checks a card from CardStore.lookup against its expiration date"""
+    if card.get("IsExpired") or card.get("Status", "").lower() == "expired":
+        return True
+    try:
+        expiration = datetime.fromisoformat(card["ExpirationDate"].replace("Z", "+00:00"))
+    except (KeyError, ValueError):
+        return False
+    if expiration.tzinfo is None:
+        expiration = expiration.replace(tzinfo=timezone.utc)
+    return expiration < datetime.now(timezone.utc)
+
+
+class SyncWorker(threading.Thread):
+    """Replays the outbox and refreshes the store while the server is reachable"""
+
+    def __init__(self, store, api, snapshot_url, update_url, interval=REFRESH_INTERVAL):
+        super().__init__(name="card-sync", daemon=True)
+        self.store = store
+        self.api = api
+        self.snapshot_url = snapshot_url
+        self.update_url = update_url
+        self.interval = interval
+        self.wakeup = threading.Event()
+
+    def run(self):
+        while True:
+            try:
+                self.flush_outbox()
+                self.refresh()
+            except (requests.RequestException, ValueError) as e:
+                print(f"Sync error: {e}")
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+
+    def flush_outbox(self):
+        """Sends queued updates in order; stops at the first unreachable one"""
+        while True:
+            pending = self.store.pending()
+            if not pending:
+                return
+            for seq, payload in pending:
+                response = self.api.post(self.update_url, payload)
+                if response.status_code >= 500:
+                    raise requests.RequestException(f"Update failed with HTTP {response.status_code}")
+                # 4xx (e.g. the card was deleted) will never succeed: drop it
+                self.store.acknowledge(seq)
+
+    def refresh(self):
+        epoch, seq = self.store.cursor()
+        params = {"epoch": epoch, "seq": seq} if epoch else {}
+        response = self.api.get(self.snapshot_url, params)
+        response.raise_for_status()
+        self.store.apply(response.json())
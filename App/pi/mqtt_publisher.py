@@ -0,0 +1,157 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+import paho.mqtt.client as mqtt
+
+SPOOL_PATH = "rfid_spool.db"
+BATCH_WINDOW = 0.02  # Seconds reads from several readers are gathered into one message
+MAX_BATCH = 50
+ACK_TIMEOUT = 5  # Seconds to wait for a PUBACK before the batch is retried
+
+
+def create_client(client_id):
+    kwargs = {"client_id": client_id, "protocol": mqtt.MQTTv311}
+    # paho-mqtt 2.x requires choosing the callback API explicitly
+    if hasattr(mqtt, "CallbackAPIVersion"):
+        kwargs["callback_api_version"] = mqtt.CallbackAPIVersion.VERSION1
+    return mqtt.Client(**kwargs)
+
+
+def new_read(reader_id, card_id):
+    """A card read as sent to the server, before the spool adds its read_id"""
+    return {
+        "card_id": card_id,
+        "reader_id": reader_id,
+        "read_at": datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+    }
+
+
+class ReadSpool:
+    """SQLite queue of card reads not yet acknowledged by the broker"""
+
+    def __init__(self, path=SPOOL_PATH):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS reads (id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        self._db.execute("INSERT OR IGNORE INTO meta VALUES ('source', ?)", (uuid.uuid4().hex[:12],))
+        # Stable across restarts, so read ids never repeat
+        self.source = self._db.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()[0]
+
+    def add(self, read):
+        """Stores a read and returns it with its read_id"""
+        with self._lock:
+            cursor = self._db.execute("INSERT INTO reads (payload) VALUES ('')")
+            read = {**read, "read_id": f"{self.source}-{cursor.lastrowid}"}
+            self._db.execute("UPDATE reads SET payload = ? WHERE id = ?", (json.dumps(read), cursor.lastrowid))
+        return read
+
+    def pending(self, limit=MAX_BATCH):
+        with self._lock:
+            rows = self._db.execute("SELECT id, payload FROM reads ORDER BY id LIMIT ?", (limit,)).fetchall()
+        return [(row_id, json.loads(payload)) for row_id, payload in rows]
+
+    def remove(self, row_ids):
+        with self._lock:
+            self._db.executemany("DELETE FROM reads WHERE id = ?", [(row_id,) for row_id in row_ids])
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM reads").fetchone()[0]
+
+
+class ReadPublisher:
+    """
+    Persistent MQTT connection publishing card reads with QoS 1
+
+    Every read is spooled to disk before it is sent, and removed only
+    once the broker acknowledged it, so reads survive broker outages and
+    restarts. Reads arriving within BATCH_WINDOW (e.g. from several
+    readers on one Pi) go out as one {"reads": [...]} message; a single
+    read is sent on its own. Each read carries card_id, reader_id, the
+    read time and a unique read_id the server can dedupe on; resent
+    batches may arrive twice.
+    """
+
+    def __init__(self, host, topic, port=1883, spool=None, batch_window=BATCH_WINDOW):
+        self.host = host
+        self.port = port
+        self.topic = topic
+        self.spool = spool if spool is not None else ReadSpool()
+        self.batch_window = batch_window
+        self.connected = threading.Event()
+        self._wakeup = threading.Event()
+        self.client = create_client(f"rfid-{self.spool.source}")
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.reconnect_delay_set(min_delay=1, max_delay=30)
+
+    def start(self):
+        """Connects in the background and starts sending spooled reads"""
+        self.client.connect_async(self.host, self.port, 60)
+        self.client.loop_start()
+        threading.Thread(target=self._run, name="read-publisher", daemon=True).start()
+
+    def stop(self, timeout=2):
+        """Sends what can be sent within timeout; the rest stays spooled"""
+        deadline = time.monotonic() + timeout
+        while len(self.spool) and self.connected.is_set() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.client.disconnect()
+        self.client.loop_stop()
+
+    def publish_read(self, reader_id, card_id):
+        """Queues a read; never blocks on the network"""
+        read = self.spool.add(new_read(reader_id, card_id))
+        self._wakeup.set()
+        return read
+
+    def _on_connect(self, client, userdata, flags, rc):
+        if rc != 0:
+            print(f"MQTT connection refused with code {rc}")
+            return
+        print("MQTT Connected")
+        self.connected.set()
+        self._wakeup.set()
+
+    def _on_disconnect(self, client, userdata, rc):
+        self.connected.clear()
+        if rc != 0:
+            print("MQTT connection lost, reconnecting")
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            time.sleep(self.batch_window)
+            self._wakeup.clear()
+            try:
+                self._flush()
+            except Exception as e:
+                print(f"MQTT publish error: {e}")
+                time.sleep(1)
+                self._wakeup.set()
+
+    def _flush(self):
+        # One batch in flight at a time: its PUBACK removes it from the spool
+        while self.connected.is_set():
+            batch = self.spool.pending()
+            if not batch:
+                return
+            reads = [read for _, read in batch]
+            payload = reads[0] if len(reads) == 1 else {"reads": reads}
+            info = self.client.publish(self.topic, json.dumps(payload), qos=1)
+            if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                return
+            info.wait_for_publish(ACK_TIMEOUT)
+            if not info.is_published():
+                # Sent again from the spool, paho may also retransmit it
+                self._wakeup.set()
+                return
+            self.spool.remove([row_id for row_id, _ in batch])
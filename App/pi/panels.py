@@ -1,24 +1,45 @@
 import requests
 import json
+import queue
+import threading
 import time
 import RPi.GPIO as GPIO
 from mfrc522 import MFRC522
 import lib.oled.SSD1331 as SSD1331
 from PIL import Image, ImageDraw, ImageFont
 from datetime import datetime, timedelta
+from api_client import ApiClient
+from card_store import CardStore, SyncWorker, is_expired
+from rfid_reader import Debouncer, Mfrc522Source, RfidReader
 
 # GPIO Pins
 LED1, LED2, LED3, LED4 = 13, 12, 19, 26
 buttonRed, buttonGreen = 5, 6
 encoderLeft, encoderRight = 17, 27
 BUZZER_PIN = 23
+RFID_IRQ_PIN = None  # BCM pin wired to the MFRC522 IRQ output, None to poll
 
 # API URLs
 API_BASE_URL = "http://192.168.0.107:8000/api"
-SEARCH_GYM_CARD_URL = f"{API_BASE_URL}/search_gym_card/"
+TAP_RFID_CARD_URL = f"{API_BASE_URL}/tap_rfid_card/"
 UPDATE_GYM_CARD_URL = f"{API_BASE_URL}/update_gym_card/"
 CREATE_GYM_CARD_URL = f"{API_BASE_URL}/create_gym_card/"
 DELETE_GYM_CARD_URL = f"{API_BASE_URL}/delete_gym_card/"
+RFID_SNAPSHOT_URL = f"{API_BASE_URL}/rfid_snapshot/"
+
+# Tap pipeline
+REPEAT_TAP_WINDOW = 2  # Seconds a card must be away before it is read again
+MESSAGE_DURATION = 3  # Seconds a tap result stays on the OLED
+IDLE_MESSAGE = ("Scan Your Card", "")
+
+# Reader thread -> tap worker -> display worker
+taps = queue.Queue(maxsize=32)
+messages = queue.Queue()
+admin_requests = queue.Queue()
+admin_taps = queue.Queue()
+# Set while the admin panel owns the taps and the display
+paused = threading.Event()
+display_lock = threading.Lock()
 
 # GPIO Setup
 GPIO.setmode(GPIO.BCM)
@@ -33,7 +54,14 @@ fontLarge = ImageFont.truetype("./lib/oled/Font.ttf", 20)
 fontSmall = ImageFont.truetype("./lib/oled/Font.ttf", 13)
 
 # RFID Reader
-reader = MFRC522()
+rfid = RfidReader(Mfrc522Source(MFRC522(), RFID_IRQ_PIN), Debouncer(release_after=REPEAT_TAP_WINDOW))
+
+# Pooled keep-alive connections to the server, shared by every thread
+api = ApiClient()
+
+# Local card table and the outbox of status changes for the server
+card_store = CardStore()
+sync_worker = SyncWorker(card_store, api, RFID_SNAPSHOT_URL, UPDATE_GYM_CARD_URL)
 
 
 def beep():
@@ -42,50 +70,49 @@ def beep():
     GPIO.output(BUZZER_PIN, GPIO.HIGH)
 
 
-def display_message(line1, line2="", duration=3):
-    """Display a message on OLED"""
+def beep_async():
+    """Starts a beep without waiting for it to end"""
+    GPIO.output(BUZZER_PIN, GPIO.LOW)
+    threading.Timer(0.1, GPIO.output, (BUZZER_PIN, GPIO.HIGH)).start()
+
+
+def show_message(line1, line2="", unless_paused=False):
+    """Draws a message on OLED and returns immediately"""
     image = Image.new("RGB", (disp.width, disp.height), "BLACK")
     draw = ImageDraw.Draw(image)
     draw.text((8, 0), line1, font=fontLarge, fill="WHITE")
     if line2:
         draw.text((12, 40), line2, font=fontSmall, fill="WHITE")
-    disp.ShowImage(image, 0, 0)
+    with display_lock:
+        if unless_paused and paused.is_set():
+            return False
+        disp.ShowImage(image, 0, 0)
+    return True
+
+
+def display_message(line1, line2="", duration=3):
+    """Display a message on OLED"""
+    show_message(line1, line2)
     time.sleep(duration)
-    disp.clear()
+    with display_lock:
+        disp.clear()
 
 
-def fetch_card_details(card_id):
-    """Fetch gym card details from API"""
-    payload = {"search_by": "rfid_card_id", "search_term": card_id}
+def tap_card(card_id):
+    """Resolves and toggles a card on the server in one request, returns (card, action) or None"""
     try:
-        response = requests.post(SEARCH_GYM_CARD_URL, json=payload, headers={"Content-Type": "application/json"})
+        response = api.post(TAP_RFID_CARD_URL, {"rfid_card_id": card_id})
         if response.status_code == 200:
             data = response.json()
-            return data["gym_cards"][0] if data.get("gym_cards") else None
+            return data.get("card"), data.get("action")
     except requests.RequestException as e:
         print(f"API Error: {e}")
     return None
 
 
-def update_card_status(card_id, new_status):
-    """Update gym card status"""
-    payload = {"id": card_id, "status": new_status}
-    try:
-        response = requests.post(UPDATE_GYM_CARD_URL, json=payload, headers={"Content-Type": "application/json"})
-        return response.json()
-    except requests.RequestException as e:
-        print(f"API Error: {e}")
-    return {"status": "error", "message": "API request failed"}
-
-
 def read_rfid():
-    """Reads an RFID card"""
-    while True:
-        status, _ = reader.MFRC522_Request(reader.PICC_REQIDL)
-        if status == reader.MI_OK:
-            status, uid = reader.MFRC522_Anticoll()
-            if status == reader.MI_OK:
-                return "-".join(str(x) for x in uid)
+    """Reads an RFID card for the admin panel"""
+    return admin_taps.get()
 
 
 def create_gym_card(rfid_card_id):
@@ -97,15 +124,21 @@ def create_gym_card(rfid_card_id):
         "rfid_card_id": rfid_card_id,
         "priority": 1
     }
-    response = requests.post(CREATE_GYM_CARD_URL, json=payload, headers={"Content-Type": "application/json"})
-    return response.json()
+    try:
+        return api.post(CREATE_GYM_CARD_URL, payload).json()
+    except requests.RequestException as e:
+        print(f"API Error: {e}")
+    return {"status": "error", "message": "API request failed"}
 
 
 def delete_gym_card(card_id):
     """Delete a gym card"""
     payload = {"id": card_id}
-    response = requests.post(DELETE_GYM_CARD_URL, json=payload, headers={"Content-Type": "application/json"})
-    return response.json()
+    try:
+        return api.post(DELETE_GYM_CARD_URL, payload).json()
+    except requests.RequestException as e:
+        print(f"API Error: {e}")
+    return {"status": "error", "message": "API request failed"}
 
 
 def admin_panel():
@@ -160,30 +193,105 @@ def admin_panel():
             display_message(message, "", 3)
 
 
-def main():
+def decide_locally(card_info):
+    """Toggles a card of the local store, returns the action taken"""
+    if card_info.get("IsAdmin"):
+        return "admin"
+    if is_expired(card_info):
+        return "expired"
+
+    new_status = "in" if card_info.get("Status", "").lower() == "active" else "active"
+    # Sent to the server by sync_worker, now or once it is reachable again
+    card_store.set_status(card_info.get("id"), new_status)
+    sync_worker.wakeup.set()
+    return new_status
+
+
+def handle_tap(card_id):
+    """Decides a tap, returns the (line1, line2) to show"""
+    card_info = card_store.lookup(card_id)
+    if card_info is not None:
+        action = decide_locally(card_info)
+    else:
+        # Possibly bound since the last refresh: the server decides
+        result = tap_card(card_id)
+        if result is None:
+            return "Card Not Found", "Try Again"
+        card_info, action = result
+        card_store.remember(card_id, card_info)
+
+    if action == "admin":
+        admin_requests.put(card_id)
+        return None
+    if action == "expired":
+        return "Card Expired", "See Reception"
+    return "Welcome" if action == "in" else "Bye Bye", ""
+
+
+def reader_worker():
+    """Reads taps and queues them, never waiting on the network or the display"""
     while True:
-        display_message("Scan Your Card", "")
-        card_id = read_rfid()
-        beep()
-
-        card_info = fetch_card_details(card_id)
-        if not card_info:
-            display_message("Card Not Found", "Try Again", 3)
+        card_id = rfid.read()
+        beep_async()
+        if paused.is_set():
+            admin_taps.put(card_id)
             continue
+        try:
+            taps.put_nowait(card_id)
+        except queue.Full:
+            messages.put(("Busy", "Tap Again"))
 
-        card_status = card_info.get("Status", "").lower()
-        card_db_id = card_info.get("id")
-        card_priority = card_info.get("priority", 1)
 
-        if card_priority == 0:
-            display_message("Redirecting", "To Admin Panel", 3)
-            admin_panel()
+def tap_worker():
+    """Turns queued taps into messages"""
+    while True:
+        card_id = taps.get()
+        try:
+            message = handle_tap(card_id)
+        except Exception as e:
+            print(f"Tap error: {e}")
+            message = "Error", "Try Again"
+        if message is not None:
+            messages.put(message)
+
+
+def display_worker():
+    """Shows each result for MESSAGE_DURATION; a newer result replaces it at once"""
+    shown_until = None
+    show_message(*IDLE_MESSAGE, unless_paused=True)
+    while True:
+        timeout = None if shown_until is None else max(0, shown_until - time.monotonic())
+        try:
+            line1, line2 = messages.get(timeout=timeout)
+        except queue.Empty:
+            shown_until = None
+            show_message(*IDLE_MESSAGE, unless_paused=True)
             continue
+        if show_message(line1, line2, unless_paused=True):
+            shown_until = time.monotonic() + MESSAGE_DURATION
 
-        new_status = "in" if card_status == "active" else "active"
-        response = update_card_status(card_db_id, new_status)
-        message = "Welcome" if new_status == "in" else "Bye Bye"
-        display_message(message if response.get("status") == "success" else "Update Failed", "", 3)
+
+def main():
+    """
+    User panel: the reader thread, tap worker and display worker run
+    concurrently, so the next member can tap while the previous result is
+    still shown. Taps are decided from the local card store, which
+    sync_worker keeps in step with the server. The admin panel pauses the
+    pipeline and takes over.
+    """
+    sync_worker.start()
+    for worker in (reader_worker, tap_worker, display_worker):
+        threading.Thread(target=worker, name=worker.__name__, daemon=True).start()
+
+    while True:
+        admin_requests.get()
+        paused.set()
+        while not admin_taps.empty():
+            admin_taps.get_nowait()
+        display_message("Redirecting", "To Admin Panel", 3)
+        admin_panel()
+        show_message(*IDLE_MESSAGE)
+        paused.clear()
 
 
 if __name__ == "__main__":
@@ -192,5 +300,6 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         print("Shutting down...")
     finally:
+        rfid.close()
         GPIO.cleanup()
         disp.clear()
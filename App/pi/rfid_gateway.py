@@ -0,0 +1,210 @@
+"""
+RFID gateway: drives every reader of one Pi from a single process
+
+    python rfid_gateway.py [--config gateway.json] [--sink mqtt|http] [--simulate]
+
+Each reader (one MFRC522 per SPI chip select) gets its own thread with its
+own debouncer; reads from all of them go into one MQTT or HTTP stream
+tagged with the reader id. --simulate replaces the readers with
+SimulatedSource so the gateway runs on any Linux box.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+
+import requests
+
+from api_client import ApiClient
+from mqtt_publisher import ReadPublisher, ReadSpool, new_read
+from rfid_reader import Debouncer, Mfrc522Source, RfidReader, SimulatedSource
+
+MQTT_BROKER = "127.0.0.1"
+MQTT_TOPIC = "rfid/cards"
+TAP_RFID_CARD_URL = "http://192.168.0.107:8000/api/tap_rfid_card/"
+
+# One entry per reader: SPI bus and chip select, reset and optional IRQ,
+# LED and buzzer pins (BCM)
+READERS = [
+    {"id": "door-1", "bus": 0, "device": 0, "rst": 25, "irq": None, "led": 13, "buzzer": 23},
+    {"id": "door-2", "bus": 0, "device": 1, "rst": 25, "irq": None, "led": 12, "buzzer": None},
+]
+HOLD_READS = 2  # Consecutive reads before a card counts
+RELEASE_AFTER = 1  # Seconds a card must be away before the same reader reports it again
+
+
+class MqttSink:
+    """Sends reads through one persistent, spooled MQTT connection"""
+
+    def __init__(self):
+        self.publisher = ReadPublisher(MQTT_BROKER, MQTT_TOPIC)
+
+    def start(self):
+        self.publisher.start()
+
+    def submit(self, reader_id, card_id):
+        self.publisher.publish_read(reader_id, card_id)
+
+    def stop(self):
+        self.publisher.stop()
+
+
+class HttpSink:
+    """Posts reads to api/tap_rfid_card in order, spooled until the server answered"""
+
+    RETRY_DELAY = 2
+
+    def __init__(self, url=TAP_RFID_CARD_URL, api=None, spool=None):
+        self.url = url
+        self.api = api or ApiClient()
+        self.spool = spool if spool is not None else ReadSpool("rfid_http_spool.db")
+        self._wakeup = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, name="http-sink", daemon=True).start()
+
+    def submit(self, reader_id, card_id):
+        self.spool.add(new_read(reader_id, card_id))
+        self._wakeup.set()
+
+    def stop(self):
+        pass
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            if not self._flush():
+                time.sleep(self.RETRY_DELAY)
+                self._wakeup.set()
+            elif len(self.spool):
+                self._wakeup.set()
+
+    def _flush(self):
+        """Posts spooled reads in order; False when the server must be retried"""
+        for row_id, read in self.spool.pending():
+            try:
+                response = self.api.post(self.url, {"rfid_card_id": read["card_id"], **read})
+            except requests.RequestException as e:
+                print(f"HTTP sink error: {e}")
+                return False
+            if response.status_code >= 500:
+                return False
+            # Answered, even if with a 4xx (unknown card): never sent again
+            self.spool.remove([row_id])
+        return True
+
+
+class ReaderWorker(threading.Thread):
+    """Reads one reader and hands its taps to the sink"""
+
+    def __init__(self, reader_id, reader, sink, stopping, led=None, buzzer=None, gpio=None):
+        super().__init__(name=f"reader-{reader_id}", daemon=True)
+        self.reader_id = reader_id
+        self.reader = reader
+        self.sink = sink
+        self.stopping = stopping
+        self.led = led
+        self.buzzer = buzzer
+        self.gpio = gpio
+        self.reads = 0
+
+    def run(self):
+        while not self.stopping.is_set():
+            card_id = self.reader.read(timeout=0.5)
+            if card_id is None:
+                continue
+            self.reads += 1
+            self.sink.submit(self.reader_id, card_id)
+            self.feedback()
+        self.reader.close()
+
+    def feedback(self):
+        if self.gpio is None:
+            return
+        if self.led is not None:
+            self.gpio.output(self.led, self.gpio.HIGH)
+            threading.Timer(0.1, self.gpio.output, (self.led, self.gpio.LOW)).start()
+        if self.buzzer is not None:
+            self.gpio.output(self.buzzer, self.gpio.LOW)
+            threading.Timer(0.1, self.gpio.output, (self.buzzer, self.gpio.HIGH)).start()
+
+
+def hardware_readers(configs):
+    """Builds (config, card source) pairs for the MFRC522s; one lock per SPI bus"""
+    import RPi.GPIO as GPIO
+    from mfrc522 import MFRC522
+
+    GPIO.setmode(GPIO.BCM)
+    GPIO.setwarnings(False)
+    bus_locks = {}
+    readers = []
+    for config in configs:
+        for pin, initial in ((config.get("led"), GPIO.LOW), (config.get("buzzer"), GPIO.HIGH)):
+            if pin is not None:
+                GPIO.setup(pin, GPIO.OUT, initial=initial)
+        chip = MFRC522(bus=config["bus"], device=config["device"], pin_rst=config["rst"])
+        source = Mfrc522Source(chip, config.get("irq"), lock=bus_locks.setdefault(config["bus"], threading.Lock()))
+        readers.append((config, source))
+    return GPIO, readers
+
+
+def simulated_readers(configs, seconds=3600):
+    rng = random.Random()
+    readers = []
+    for config in configs:
+        taps, offset = [], 1
+        while offset < seconds:
+            taps.append((offset, f"{rng.randrange(1, 50)}-{rng.randrange(256)}", rng.uniform(0.2, 0.6)))
+            offset += rng.uniform(1.5, 5)
+        readers.append((config, SimulatedSource(taps)))
+    return None, readers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", help="JSON file with the reader list, defaults to READERS")
+    parser.add_argument("--sink", choices=("mqtt", "http"), default="mqtt")
+    parser.add_argument("--simulate", action="store_true", help="Use simulated readers")
+    args = parser.parse_args()
+
+    configs = READERS
+    if args.config:
+        with open(args.config) as config_file:
+            configs = json.load(config_file)
+
+    gpio, sources = simulated_readers(configs) if args.simulate else hardware_readers(configs)
+    sink = MqttSink() if args.sink == "mqtt" else HttpSink()
+    sink.start()
+
+    stopping = threading.Event()
+    workers = [
+        ReaderWorker(
+            config["id"],
+            RfidReader(source, Debouncer(hold_reads=HOLD_READS, release_after=RELEASE_AFTER)),
+            sink, stopping, config.get("led"), config.get("buzzer"), gpio
+        )
+        for config, source in sources
+    ]
+    for worker in workers:
+        worker.start()
+    print(f"Gateway running {len(workers)} readers: {', '.join(worker.reader_id for worker in workers)}")
+
+    try:
+        while True:
+            time.sleep(60)
+            print("Reads: " + ", ".join(f"{worker.reader_id}={worker.reads}" for worker in workers))
+    except KeyboardInterrupt:
+        print("\nStopping...")
+    finally:
+        stopping.set()
+        for worker in workers:
+            worker.join(timeout=1)
+        sink.stop()
+        if gpio is not None:
+            gpio.cleanup()
+
+
+if __name__ == "__main__":
+    main()
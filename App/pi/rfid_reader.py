@@ -0,0 +1,217 @@
+import bisect
+import threading
+import time
+
+try:
+    import RPi.GPIO as GPIO
+except ImportError:  # Plain Linux: only SimulatedSource is available
+    GPIO = None
+
+# Adaptive polling: the interval resets to MIN after a read and grows by
+# BACKOFF per empty poll up to MAX
+MIN_POLL_INTERVAL = 0.02
+MAX_POLL_INTERVAL = 0.1
+POLL_BACKOFF = 1.5
+# Seconds one armed IRQ request waits before it is sent again
+IRQ_REARM_INTERVAL = 0.1
+
+
+class Debouncer:
+    """
+    Turns raw reads into taps
+
+    A card becomes a tap once it was read hold_reads times in a row, and
+    is not reported again until no card was read for release_after seconds
+    (a card lying on the reader is only read on every other request).
+    """
+
+    def __init__(self, hold_reads=1, release_after=0.3):
+        self.hold_reads = hold_reads
+        self.release_after = release_after
+        self.current = None  # Card reported and still on the reader
+        self._candidate = None
+        self._count = 0
+        self._last_seen = 0
+
+    @property
+    def busy(self):
+        """True while a card is being confirmed or still on the reader"""
+        return self.current is not None or self._candidate is not None
+
+    def update(self, card_id, now):
+        """Feeds one read (None for no card), returns the card id of a new tap"""
+        if card_id is None:
+            if now - self._last_seen >= self.release_after:
+                self.current = None
+                self._candidate = None
+                self._count = 0
+            return None
+
+        self._last_seen = now
+        if card_id == self.current:
+            return None
+        if card_id == self._candidate:
+            self._count += 1
+        else:
+            self._candidate, self._count = card_id, 1
+        if self._count < self.hold_reads:
+            return None
+
+        self.current, self._candidate, self._count = card_id, None, 0
+        return card_id
+
+
+class Mfrc522Source:
+    """
+    MFRC522 on SPI, optionally with its IRQ pin on a GPIO input
+
+    With the IRQ pin wired, wait_for_card() arms a single REQA on the chip
+    and sleeps on the GPIO edge until a card answers, instead of running
+    MFRC522_Request's busy wait on every poll.
+    """
+
+    # IRQ pin active low, raised by the receiver only (IRqInv | RxIEn)
+    IRQ_ENABLE = 0xA0
+
+    def __init__(self, reader, irq_pin=None, lock=None):
+        self.reader = reader
+        # Shared by the readers of one SPI bus so their exchanges never interleave
+        self.lock = lock or threading.Lock()
+        self.has_irq = False
+        self._irq = threading.Event()
+        if irq_pin is None or GPIO is None:
+            return
+        try:
+            GPIO.setup(irq_pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+            GPIO.add_event_detect(irq_pin, GPIO.FALLING, callback=lambda channel: self._irq.set())
+            self.has_irq = True
+            self.irq_pin = irq_pin
+        except (RuntimeError, AttributeError) as e:
+            print(f"RFID IRQ unavailable, polling instead: {e}")
+
+    def poll(self):
+        """Single read attempt, returns the card id or None"""
+        reader = self.reader
+        with self.lock:
+            status, _ = reader.MFRC522_Request(reader.PICC_REQIDL)
+            if status != reader.MI_OK:
+                return None
+            status, uid = reader.MFRC522_Anticoll()
+            if status != reader.MI_OK:
+                return None
+            return "-".join(str(x) for x in uid)
+
+    def wait_for_card(self, timeout):
+        """Arms one request and waits for a card to answer it"""
+        reader = self.reader
+        with self.lock:
+            # MFRC522_Request (poll) enables every interrupt, TxIRq included,
+            # which would fire as soon as the REQA is sent: restore RxIEn only
+            reader.Write_MFRC522(reader.CommIEnReg, self.IRQ_ENABLE)
+            reader.Write_MFRC522(reader.CommandReg, reader.PCD_IDLE)
+            reader.Write_MFRC522(reader.CommIrqReg, 0x7F)  # Clear pending interrupts
+            reader.Write_MFRC522(reader.FIFOLevelReg, 0x80)  # Flush the FIFO
+            self._irq.clear()
+            reader.Write_MFRC522(reader.FIFODataReg, reader.PICC_REQIDL)
+            reader.Write_MFRC522(reader.CommandReg, reader.PCD_TRANSCEIVE)
+            reader.Write_MFRC522(reader.BitFramingReg, 0x87)  # Start sending, 7 bit frame
+        return self._irq.wait(timeout)
+
+    def close(self):
+        if self.has_irq:
+            GPIO.remove_event_detect(self.irq_pin)
+
+
+class SimulatedSource:
+    """
+    Hardware-free card source replaying a schedule of taps
+
+    taps are (seconds after start, card id, seconds held on the reader).
+    Each poll spins for poll_cost to stand in for the SPI exchange, and
+    wait_for_card() sleeps until the next card like a GPIO edge would.
+    """
+
+    def __init__(self, taps, poll_cost=0.001, irq=True):
+        self.start = time.monotonic()
+        self.taps = sorted(taps)
+        self._arrivals = [self.start + offset for offset, _, _ in self.taps]
+        self.poll_cost = poll_cost
+        self.has_irq = irq
+        self.polls = 0
+
+    def card_at(self, now):
+        index = bisect.bisect_right(self._arrivals, now) - 1
+        if index < 0:
+            return None
+        _, card_id, held = self.taps[index]
+        return card_id if now < self._arrivals[index] + held else None
+
+    def poll(self):
+        self.polls += 1
+        end = time.perf_counter() + self.poll_cost
+        while time.perf_counter() < end:
+            pass
+        return self.card_at(time.monotonic())
+
+    def wait_for_card(self, timeout):
+        now = time.monotonic()
+        if self.card_at(now) is not None:
+            return True
+        index = bisect.bisect_right(self._arrivals, now)
+        if index < len(self._arrivals) and self._arrivals[index] - now <= timeout:
+            time.sleep(self._arrivals[index] - now)
+            return True
+        time.sleep(timeout)
+        return False
+
+    def close(self):
+        pass
+
+
+class RfidReader:
+    """
+    Blocking, debounced tap reader shared by the panel and MQTT scripts
+
+    Waits on the source's IRQ when it has one and no card is on the
+    reader; otherwise polls with an interval that adapts between
+    min_interval right after a read and max_interval when idle.
+    """
+
+    def __init__(self, source, debouncer=None, min_interval=MIN_POLL_INTERVAL,
+                 max_interval=MAX_POLL_INTERVAL, use_irq=True):
+        self.source = source
+        self.debouncer = debouncer or Debouncer()
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.use_irq = use_irq and source.has_irq
+        self.interval = min_interval
+
+    def read(self, timeout=None):
+        """Returns the card id of the next tap, or None after timeout seconds"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+
+            irq = self.use_irq and not self.debouncer.busy
+            if irq:
+                wait = IRQ_REARM_INTERVAL if remaining is None else min(IRQ_REARM_INTERVAL, remaining)
+                if not self.source.wait_for_card(wait):
+                    continue
+
+            card_id = self.source.poll()
+            tap = self.debouncer.update(card_id, time.monotonic())
+            if tap is not None:
+                self.interval = self.min_interval
+                return tap
+            if card_id is not None:
+                self.interval = self.min_interval
+            else:
+                # An empty poll, or an IRQ wake that found no card (noise, a
+                # card leaving the field): back off either way
+                self.interval = min(self.interval * POLL_BACKOFF, self.max_interval)
+            time.sleep(self.interval if remaining is None else min(self.interval, remaining))
+
+    def close(self):
+        self.source.close()
@@ -0,0 +1,55 @@
+"""Run from the repository root: python -m unittest discover -s App/pi"""
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from api_client import ApiClient
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Answers 503 to the first request, then 200"""
+
+    protocol_version = "HTTP/1.1"
+
+    def answer(self):
+        self.server.hits.append(self.command)
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        code = 503 if len(self.server.hits) == 1 else 200
+        self.send_response(code)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    do_GET = do_POST = answer
+
+    def log_message(self, *args):
+        pass
+
+
+class ApiClientTests(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+        self.server.hits = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/api/"
+        self.api = ApiClient()
+        self.addCleanup(self.api.session.close)
+
+    def test_get_is_retried(self):
+        response = self.api.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.hits, ["GET", "GET"])
+
+    def test_post_is_never_sent_twice(self):
+        response = self.api.post(self.url, {"rfid_card_id": "1-1"})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.server.hits, ["POST"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+"""Run from the repository root: python -m unittest discover -s App/pi"""
+import unittest
+from unittest import mock
+
+import requests
+
+from card_store import CardStore, SyncWorker
+
+
+def snapshot(cards, full=True, ids=(), seq=1):
+    return {"epoch": "e1", "seq": seq, "full": full, "ids": list(ids), "cards": cards}
+
+
+def row(rfid, card_id, status="active", admin=False):
+    return [rfid, card_id, status, 1, "2099-01-01T00:00:00+00:00", False, admin]
+
+
+class CardStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.store = CardStore(":memory:")
+
+    def test_full_snapshot_replaces_the_table(self):
+        self.store.apply(snapshot([row("1-1", 1), row("2-2", 2)]))
+        self.store.apply(snapshot([row("2-2", 2, admin=True)], seq=2))
+
+        self.assertIsNone(self.store.lookup("1-1"))
+        self.assertTrue(self.store.lookup("2-2")["IsAdmin"])
+        self.assertEqual(self.store.cursor(), ("e1", "2"))
+
+    def test_incremental_snapshot_replaces_listed_cards(self):
+        self.store.apply(snapshot([row("1-1", 1), row("2-2", 2)]))
+
+        # Card 1 was deleted, card 2 re-tagged
+        self.store.apply(snapshot([row("3-3", 2, "in")], full=False, ids=[1, 2], seq=2))
+
+        self.assertIsNone(self.store.lookup("1-1"))
+        self.assertIsNone(self.store.lookup("2-2"))
+        self.assertEqual(self.store.lookup("3-3")["Status"], "in")
+
+    def test_queued_changes_win_over_the_snapshot(self):
+        self.store.apply(snapshot([row("1-1", 1)]))
+        self.store.set_status(1, "in")
+
+        self.store.apply(snapshot([row("1-1", 1, "active")], full=False, ids=[1], seq=2))
+        self.assertEqual(self.store.lookup("1-1")["Status"], "in")
+        self.store.apply(snapshot([], seq=3))
+        self.assertEqual(self.store.lookup("1-1")["Status"], "in")
+
+        self.store.acknowledge(self.store.pending()[0][0])
+        self.store.apply(snapshot([row("1-1", 1, "in")], full=False, ids=[1], seq=4))
+        self.assertEqual(self.store.lookup("1-1")["Status"], "in")
+
+    def test_outbox_keeps_order_and_idempotency_keys(self):
+        self.store.apply(snapshot([row("1-1", 1)]))
+        self.store.set_status(1, "in")
+        self.store.set_status(1, "active")
+
+        payloads = [payload for _, payload in self.store.pending()]
+
+        self.assertEqual([payload["status"] for payload in payloads], ["in", "active"])
+        self.assertNotEqual(payloads[0]["idempotency_key"], payloads[1]["idempotency_key"])
+
+
+class SyncWorkerTests(unittest.TestCase):
+    def setUp(self):
+        self.store = CardStore(":memory:")
+        self.store.apply(snapshot([row("1-1", 1), row("2-2", 2)]))
+        self.api = mock.Mock()
+        self.worker = SyncWorker(self.store, self.api, "/snapshot/", "/update/")
+
+    def answer(self, *status_codes):
+        self.api.post.side_effect = [mock.Mock(status_code=code) for code in status_codes]
+
+    def test_rejected_updates_are_dropped(self):
+        self.store.set_status(1, "in")
+        self.store.set_status(2, "in")
+        self.answer(404, 200)
+
+        self.worker.flush_outbox()
+
+        self.assertEqual(self.store.pending(), [])
+        self.assertEqual(self.api.post.call_count, 2)
+
+    def test_server_errors_keep_the_update_for_a_retry(self):
+        self.store.set_status(1, "in")
+        self.store.set_status(2, "in")
+        self.answer(503)
+
+        with self.assertRaises(requests.RequestException):
+            self.worker.flush_outbox()
+
+        self.assertEqual([payload["id"] for _, payload in self.store.pending()], [1, 2])
+        self.answer(200, 200)
+        self.worker.flush_outbox()
+        self.assertEqual(self.store.pending(), [])
+
+    def test_refresh_resumes_from_the_cursor(self):
+        self.api.get.return_value.json.return_value = snapshot([], full=False, seq=5)
+
+        self.worker.refresh()
+
+        self.api.get.assert_called_once_with("/snapshot/", {"epoch": "e1", "seq": "1"})
+        self.assertEqual(self.store.cursor(), ("e1", "5"))
+
+
+if __name__ == "__main__":
+    unittest.main()
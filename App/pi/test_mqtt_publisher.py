@@ -0,0 +1,116 @@
+"""Run from the repository root: python -m unittest discover -s App/pi"""
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import paho.mqtt.client as mqtt
+
+from mqtt_publisher import ReadPublisher, ReadSpool, new_read
+
+
+class FakeMessageInfo:
+    def __init__(self, acked):
+        self.rc = mqtt.MQTT_ERR_SUCCESS
+        self.acked = acked
+
+    def wait_for_publish(self, timeout=None):
+        pass
+
+    def is_published(self):
+        return self.acked
+
+
+class FakeClient:
+    """Records publishes; the broker acknowledges while acked is True"""
+
+    def __init__(self):
+        self.published = []
+        self.acked = True
+
+    def publish(self, topic, payload, qos=0):
+        self.published.append((topic, json.loads(payload), qos))
+        return FakeMessageInfo(self.acked)
+
+    def reconnect_delay_set(self, **kwargs):
+        pass
+
+
+class ReadSpoolTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "spool.db")
+
+    def test_reads_survive_a_restart_with_unique_ids(self):
+        spool = ReadSpool(self.path)
+        first = spool.add(new_read("door-1", "1-2-3"))
+
+        reopened = ReadSpool(self.path)
+        second = reopened.add(new_read("door-2", "4-5-6"))
+
+        self.assertEqual(reopened.source, spool.source)
+        self.assertEqual([read["read_id"] for _, read in reopened.pending()],
+                         [first["read_id"], second["read_id"]])
+        self.assertNotEqual(first["read_id"], second["read_id"])
+
+    def test_removed_reads_are_gone(self):
+        spool = ReadSpool(self.path)
+        spool.add(new_read("door-1", "1-2-3"))
+        spool.add(new_read("door-1", "4-5-6"))
+
+        spool.remove([row_id for row_id, _ in spool.pending(limit=1)])
+
+        self.assertEqual([read["card_id"] for _, read in spool.pending()], ["4-5-6"])
+        self.assertEqual(len(spool), 1)
+
+
+class ReadPublisherTests(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeClient()
+        patcher = mock.patch("mqtt_publisher.create_client", return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.publisher = ReadPublisher("broker", "rfid/cards", spool=ReadSpool(":memory:"))
+        self.publisher.connected.set()
+
+    def test_single_read_is_sent_on_its_own(self):
+        read = self.publisher.publish_read("door-1", "1-2-3")
+
+        self.publisher._flush()
+
+        self.assertEqual(self.client.published, [("rfid/cards", read, 1)])
+        self.assertEqual(len(self.publisher.spool), 0)
+
+    def test_reads_waiting_together_go_out_as_one_batch(self):
+        reads = [self.publisher.publish_read(f"door-{n}", f"{n}-{n}") for n in (1, 2)]
+
+        self.publisher._flush()
+
+        self.assertEqual(self.client.published, [("rfid/cards", {"reads": reads}, 1)])
+
+    def test_unacknowledged_batch_stays_spooled(self):
+        self.publisher.publish_read("door-1", "1-2-3")
+        self.client.acked = False
+
+        self.publisher._flush()
+
+        self.assertEqual(len(self.publisher.spool), 1)
+        self.client.acked = True
+        self.publisher._flush()
+        self.assertEqual(len(self.client.published), 2)
+        self.assertEqual(len(self.publisher.spool), 0)
+
+    def test_nothing_is_sent_while_disconnected(self):
+        self.publisher.connected.clear()
+        self.publisher.publish_read("door-1", "1-2-3")
+
+        self.publisher._flush()
+
+        self.assertEqual(self.client.published, [])
+        self.assertEqual(len(self.publisher.spool), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
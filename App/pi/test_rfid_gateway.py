@@ -0,0 +1,61 @@
+"""Run from the repository root: python -m unittest discover -s App/pi"""
+import unittest
+from unittest import mock
+
+import requests
+
+from mqtt_publisher import ReadSpool
+from rfid_gateway import HttpSink
+
+
+class HttpSinkTests(unittest.TestCase):
+    def setUp(self):
+        self.api = mock.Mock()
+        self.sink = HttpSink("/tap/", api=self.api, spool=ReadSpool(":memory:"))
+        self.sink.submit("door-1", "1-1")
+        self.sink.submit("door-2", "2-2")
+
+    def answer(self, *outcomes):
+        self.api.post.side_effect = [
+            outcome if isinstance(outcome, Exception) else mock.Mock(status_code=outcome)
+            for outcome in outcomes
+        ]
+
+    def sent(self):
+        return [call.args[1]["rfid_card_id"] for call in self.api.post.call_args_list]
+
+    def test_reads_are_posted_in_order(self):
+        self.answer(200, 200)
+
+        self.assertTrue(self.sink._flush())
+
+        self.assertEqual(self.sent(), ["1-1", "2-2"])
+        self.assertEqual(self.api.post.call_args_list[0].args[1]["reader_id"], "door-1")
+        self.assertEqual(len(self.sink.spool), 0)
+
+    def test_rejected_read_is_not_retried(self):
+        self.answer(404, 200)
+
+        self.assertTrue(self.sink._flush())
+
+        self.assertEqual(len(self.sink.spool), 0)
+
+    def test_unreachable_server_keeps_the_read_and_those_after_it(self):
+        for failure in (503, requests.ConnectionError("refused")):
+            with self.subTest(failure=failure):
+                self.api.reset_mock()
+                self.answer(failure)
+
+                with mock.patch("builtins.print"):
+                    self.assertFalse(self.sink._flush())
+
+                self.assertEqual(self.sent(), ["1-1"])
+                self.assertEqual(len(self.sink.spool), 2)
+
+        self.answer(200, 200)
+        self.assertTrue(self.sink._flush())
+        self.assertEqual(len(self.sink.spool), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+"""Run from the repository root: python -m unittest discover -s App/pi"""
+import unittest
+
+from rfid_reader import Debouncer, RfidReader, SimulatedSource
+
+
+class DebouncerTests(unittest.TestCase):
+    def feed(self, debouncer, reads):
+        """reads are (seconds, card id or None); returns the taps reported"""
+        return [tap for now, card_id in reads if (tap := debouncer.update(card_id, now)) is not None]
+
+    def test_card_on_the_reader_is_one_tap(self):
+        debouncer = Debouncer(release_after=0.3)
+
+        # Read on every other request while it lies on the reader
+        taps = self.feed(debouncer, [(0, "a"), (0.1, None), (0.2, "a"), (0.3, None), (0.4, "a")])
+
+        self.assertEqual(taps, ["a"])
+        self.assertTrue(debouncer.busy)
+
+    def test_card_taps_again_after_release(self):
+        debouncer = Debouncer(release_after=0.3)
+
+        taps = self.feed(debouncer, [(0, "a"), (0.1, None), (0.5, None), (0.6, "a")])
+
+        self.assertEqual(taps, ["a", "a"])
+
+    def test_other_card_taps_at_once(self):
+        debouncer = Debouncer(release_after=0.3)
+
+        self.assertEqual(self.feed(debouncer, [(0, "a"), (0.1, "b")]), ["a", "b"])
+
+    def test_hold_reads_confirm_a_card(self):
+        debouncer = Debouncer(hold_reads=2)
+
+        self.assertEqual(self.feed(debouncer, [(0, "a"), (0.01, "b"), (0.02, "b")]), ["b"])
+        self.assertEqual(debouncer.current, "b")
+
+
+class RfidReaderTests(unittest.TestCase):
+    def test_each_tap_is_read_once(self):
+        for irq in (True, False):
+            with self.subTest(irq=irq):
+                source = SimulatedSource([(0.02, "a", 0.1), (0.4, "b", 0.05)], poll_cost=0, irq=irq)
+                reader = RfidReader(source, Debouncer(release_after=0.1), min_interval=0.005, max_interval=0.02)
+
+                taps = [reader.read(timeout=1) for _ in range(2)]
+
+                self.assertEqual(taps, ["a", "b"])
+                self.assertIsNone(reader.read(timeout=0.1))
+
+    def test_irq_wait_saves_polls(self):
+        polls = {}
+        for irq in (True, False):
+            source = SimulatedSource([(0.3, "a", 0.05)], poll_cost=0, irq=irq)
+            RfidReader(source, min_interval=0.005, max_interval=0.01).read(timeout=1)
+            polls[irq] = source.polls
+
+        self.assertLess(polls[True], polls[False])
+
+
+if __name__ == "__main__":
+    unittest.main()
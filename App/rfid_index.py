@@ -0,0 +1,98 @@
+import threading
+
+from App.cache import card_cache
+from App.models import GymCard
+from App.serializers import serialize_card
+
+
+class RfidCardIndex:
+    """
+    In-process RFID -> gym card map used to resolve card taps
+
+    Entries are filled lazily from a single indexed lookup on
+    GymCard.rfid_card_id and kept fresh by the model save/delete signals
+    (see App/signals.py), so repeated taps of the same card cost zero queries.
+
+    With several workers the other processes' saves never reach these
+    signals, so the index is also tied to the shared card_cache version and
+    dropped whenever that moved without a matching local write.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_rfid = {}
+        self._rfid_by_id = {}
+        # Bumped on every change so a lookup racing with a save never
+        # stores a stale row
+        self._generation = 0
+        self._version = None  # card_cache version the entries belong to
+
+    def resolve(self, rfid_card_id):
+        """Returns card data for an RFID tag or None if no card is bound to it"""
+        version = card_cache.version()
+        with self._lock:
+            if version != self._version:
+                self._generation += 1
+                self._by_rfid.clear()
+                self._rfid_by_id.clear()
+                self._version = version
+            card_data = self._by_rfid.get(rfid_card_id)
+            generation = self._generation
+        if card_data is not None:
+            return card_data
+
+        gym_card = GymCard.objects.filter(rfid_card_id=rfid_card_id).first()
+        if gym_card is None:
+            return None
+
+        card_data = serialize_card(gym_card)
+        with self._lock:
+            if generation == self._generation:
+                self._store(gym_card.id, rfid_card_id, card_data)
+        return card_data
+
+    def update(self, gym_card):
+        """Refreshes the entry of a saved card"""
+        with self._lock:
+            self._generation += 1
+            self._discard(gym_card.id)
+            if gym_card.rfid_card_id:
+                self._store(gym_card.id, gym_card.rfid_card_id, serialize_card(gym_card))
+
+    def discard(self, card_id):
+        """Drops the entry of a deleted card"""
+        with self._lock:
+            self._generation += 1
+            self._discard(card_id)
+
+    def sync_version(self, version):
+        """
+        Records the card_cache version after a local bump
+
+        The entries stay valid only if that bump was the sole change since
+        the version they were built for.
+        """
+        with self._lock:
+            if self._version is not None and version == self._version + 1:
+                self._version = version
+            else:
+                self._version = None
+
+    def clear(self):
+        """Drops every entry, e.g. after a queryset.update() that skips signals"""
+        with self._lock:
+            self._generation += 1
+            self._by_rfid.clear()
+            self._rfid_by_id.clear()
+
+    def _store(self, card_id, rfid_card_id, card_data):
+        self._by_rfid[rfid_card_id] = card_data
+        self._rfid_by_id[card_id] = rfid_card_id
+
+    def _discard(self, card_id):
+        rfid_card_id = self._rfid_by_id.pop(card_id, None)
+        if rfid_card_id is not None:
+            self._by_rfid.pop(rfid_card_id, None)
+
+
+rfid_index = RfidCardIndex()
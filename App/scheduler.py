@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import threading
+
+from asgiref.sync import sync_to_async
+
+logger = logging.getLogger(__name__)
+
+
+class Scheduler:
+    """
+    Runs periodic jobs as asyncio tasks inside the ASGI process
+
+    Jobs are plain synchronous callables (they usually hit the database) and
+    are executed through sync_to_async so they never block the event loop.
+    The ASGI lifespan starts it on the server's loop; servers without
+    lifespan support start it on a private loop thread through
+    ensure_running().
+    """
+
+    def __init__(self):
+        self._jobs = {}
+        self._tasks = []
+        self._loop = None
+        self._start_lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._loop is not None
+
+    def every(self, seconds, func, name=None):
+        self._jobs[name or func.__name__] = (seconds, func)
+
+    def start(self):
+        """Starts the jobs on the running event loop (ASGI lifespan startup)"""
+        loop = asyncio.get_running_loop()
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            self._loop = loop
+        self._create_tasks(loop)
+
+    def ensure_running(self):
+        """
+        Starts the jobs on a private event loop thread if no ASGI lifespan
+        started them (e.g. under runserver or daphne)
+        """
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            self._loop = loop
+
+        def run():
+            asyncio.set_event_loop(loop)
+            self._create_tasks(loop)
+            loop.run_forever()
+
+        threading.Thread(target=run, name='scheduler', daemon=True).start()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+    def _create_tasks(self, loop):
+        for name, (seconds, func) in self._jobs.items():
+            self._tasks.append(loop.create_task(self._run(name, seconds, func), name=name))
+        logger.info(f"Scheduler started: {', '.join(self._jobs) or 'no jobs'}")
+
+    async def _run(self, name, seconds, func):
+        job = sync_to_async(func)
+        while True:
+            try:
+                await job()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Scheduled job {name} failed: {e}", exc_info=True)
+            await asyncio.sleep(seconds)
+
+
+scheduler = Scheduler()
@@ -0,0 +1,162 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.module_loading import import_string
+
+# search_by values accepted by search_gym_card mapped to GymCard fields
+SEARCH_FIELDS = {
+    'id': 'id',
+    'Title': 'title',
+    'rfid_card_id': 'rfid_card_id',
+    'Description': 'description',
+    'DateAdded': 'date_added',
+    'ExpirationDate': 'expiration_date',
+    'Status': 'status',
+    'Priority': 'priority',
+}
+
+INTEGER_FIELDS = {'id', 'priority'}
+DATE_FIELDS = {'date_added', 'expiration_date'}
+
+# search_by value that runs a free-text search over title and description
+FULL_TEXT = 'text'
+
+TEXT_LOOKUPS = {
+    'contains': 'icontains',
+    'prefix': 'istartswith',
+    'exact': 'exact',
+}
+
+FTS_TABLE = 'App_gymcard_fts'
+
+
+class SearchError(ValueError):
+    """Raised when search parameters cannot be translated into a query"""
+
+
+class OrmSearchBackend:
+    """
+    Translates search_by/search_term into ORM lookups
+
+    Text fields support 'contains' (default), 'prefix' and 'exact' matching,
+    integer fields match exactly and date fields accept either a single day
+    ('2025-01-29'), a timestamp or a {'from': ..., 'to': ...} range.
+    """
+
+    def search(self, queryset, search_by, search_term, match=None):
+        if search_by == FULL_TEXT:
+            return self.full_text(queryset, str(search_term))
+
+        field = SEARCH_FIELDS.get(search_by)
+        if field is None:
+            raise SearchError(f'Invalid search_by parameter: {search_by}')
+
+        if field in INTEGER_FIELDS:
+            try:
+                return queryset.filter(**{field: int(search_term)})
+            except (TypeError, ValueError):
+                raise SearchError(f'{search_by} must be an integer')
+
+        if field in DATE_FIELDS:
+            return queryset.filter(self.date_filter(field, search_term))
+
+        lookup = TEXT_LOOKUPS.get(match or 'contains')
+        if lookup is None:
+            raise SearchError(f'Invalid match parameter: {match}')
+        return queryset.filter(**{f'{field}__{lookup}': str(search_term)})
+
+    def full_text(self, queryset, term):
+        return queryset.filter(Q(title__icontains=term) | Q(description__icontains=term))
+
+    def date_filter(self, field, search_term):
+        if isinstance(search_term, dict):
+            date_from = search_term.get('from')
+            date_to = search_term.get('to')
+            if not date_from and not date_to:
+                raise SearchError('Date range requires "from" and/or "to"')
+            query = Q()
+            if date_from:
+                query &= Q(**{f'{field}__gte': self.parse_bound(date_from)})
+            if date_to:
+                query &= Q(**{f'{field}__lt': self.parse_bound(date_to, end=True)})
+            return query
+
+        if parse_date(str(search_term)) is None:
+            return Q(**{field: self.parse_bound(search_term)})
+
+        day_start = self.parse_bound(search_term)
+        return Q(**{f'{field}__gte': day_start, f'{field}__lt': day_start + timedelta(days=1)})
+
+    def parse_bound(self, value, end=False):
+        """Parses a range bound; a bare date used as an upper bound includes that whole day"""
+        day = parse_date(str(value))
+        if day is not None:
+            if end:
+                day += timedelta(days=1)
+            return self.aware(datetime.combine(day, time.min))
+        parsed = parse_datetime(str(value))
+        if parsed is None:
+            raise SearchError(f'Invalid date: {value}')
+        return self.aware(parsed)
+
+    @staticmethod
+    def aware(value):
+        if settings.USE_TZ and timezone.is_naive(value):
+            return timezone.make_aware(value)
+        return value
+
+
+class Fts5SearchBackend(OrmSearchBackend):
+    """
+    Free-text search through the SQLite FTS5 index created by migration 0009
+
+    Falls back to the ORM backend on other databases or when the SQLite
+    build has no FTS5 support.
+    """
+
+    def full_text(self, queryset, term):
+        query = self.match_query(term)
+        if not query or not fts_available():
+            return super().full_text(queryset, term)
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM "{FTS_TABLE}" WHERE "{FTS_TABLE}" MATCH %s',
+            [query]
+        ))
+
+    @staticmethod
+    def match_query(term):
+        # Quote every token so user input is never parsed as FTS syntax and
+        # let the last one match as a prefix while the user is still typing
+        tokens = ['"{}"'.format(token.replace('"', '""')) for token in term.split()]
+        if tokens:
+            tokens[-1] += '*'
+        return ' '.join(tokens)
+
+
+_fts_available = None
+
+
+def fts_available():
+    global _fts_available
+    if _fts_available is None:
+        _fts_available = (
+            connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_available
+
+
+_backend = None
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        backend_path = getattr(settings, 'GYM_CARD_SEARCH_BACKEND', 'App.search.OrmSearchBackend')
+        _backend = import_string(backend_path)()
+    return _backend
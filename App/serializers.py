@@ -0,0 +1,109 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from operator import attrgetter
+
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the deployment
+    orjson = None
+
+# Card keys exposed by the API mapped to GymCard fields
+CARD_FIELDS = {
+    'id': 'id',
+    'Title': 'title',
+    'Description': 'description',
+    'DateAdded': 'date_added',
+    'ExpirationDate': 'expiration_date',
+    'Status': 'status',
+    'Priority': 'priority',
+    'IsExpired': 'is_expired',
+    'IsAdmin': 'is_admin',
+    'rfid_card_id': 'rfid_card_id',
+}
+
+# Key sets returned by the views when no fields= parameter is given
+ALL_CARD_KEYS = tuple(CARD_FIELDS)
+SUMMARY_CARD_KEYS = ('id', 'Title', 'Description', 'DateAdded', 'ExpirationDate', 'Status', 'Priority')
+
+
+class CardSerializer:
+    """
+    Turns GymCard rows into API dicts for a fixed set of card keys
+
+    The key -> column mapping is resolved once per key set; querysets are
+    read with values_list() so rows arrive as tuples and no model instances
+    are built.
+    """
+
+    def __init__(self, keys=ALL_CARD_KEYS):
+        self.keys = tuple(keys)
+        self.fields = tuple(CARD_FIELDS[key] for key in self.keys)
+        self._getter = attrgetter(*self.fields)
+
+    def rows(self, queryset):
+        """Selects the serializer's columns as tuples in key order"""
+        return queryset.values_list(*self.fields)
+
+    def from_row(self, row):
+        return dict(zip(self.keys, row))
+
+    def many(self, queryset):
+        keys = self.keys
+        return [dict(zip(keys, row)) for row in self.rows(queryset)]
+
+    def one(self, gym_card):
+        """Serializes an already loaded GymCard instance"""
+        values = self._getter(gym_card)
+        if len(self.keys) == 1:
+            values = (values,)
+        return dict(zip(self.keys, values))
+
+
+_serializers = {}
+
+
+def card_serializer(keys=ALL_CARD_KEYS):
+    """Returns the cached serializer for a key set"""
+    keys = tuple(keys)
+    serializer = _serializers.get(keys)
+    if serializer is None:
+        serializer = _serializers[keys] = CardSerializer(keys)
+    return serializer
+
+
+def serialize_card(gym_card, keys=ALL_CARD_KEYS):
+    return card_serializer(keys).one(gym_card)
+
+
+def serialize_cards(queryset, keys=ALL_CARD_KEYS):
+    return card_serializer(keys).many(queryset)
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def dumps(data):
+    """
+    Encodes data to JSON bytes, with orjson when it is installed
+
+    Datetimes are written as full precision ISO 8601 by both encoders.
+    """
+    if orjson is not None:
+        return orjson.dumps(data, default=_default)
+    return json.dumps(data, default=_default, separators=(',', ':')).encode()
+
+
+class CardJsonResponse(HttpResponse):
+    """JsonResponse counterpart that encodes through serializers.dumps"""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
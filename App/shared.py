@@ -0,0 +1,112 @@
+import asyncio
+import uuid
+import weakref
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import redis.asyncio as aioredis
+    from redis.exceptions import WatchError
+except ImportError:  # pragma: no cover - only needed by the shared backends
+    aioredis = None
+
+_clients = weakref.WeakKeyDictionary()  # event loop -> client
+
+# Backends whose state never leaves the process using them
+LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+LOCAL_CHANNEL_LAYERS = {'channels.layers.InMemoryChannelLayer'}
+LOCAL_CHANGE_LOGS = {'App.broadcast.ChangeLog'}
+
+
+def redis_client():
+    """
+    Redis client for the running event loop
+
+    Used by the shared (multi-worker) change log and enrolment registry;
+    connects to settings.GYM_CARD_REDIS_URL.
+    """
+    if aioredis is None:
+        raise ImproperlyConfigured('The shared card state backends require the redis package')
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = aioredis.Redis.from_url(settings.GYM_CARD_REDIS_URL)
+    return client
+
+
+def process_local_settings():
+    """
+    Settings that keep card state inside each process
+
+    A card change made outside the server process, e.g. by a management
+    command run from cron, only reaches the server through shared
+    backends. With these, the command's card version bump, RFID index
+    update and WebSocket broadcast stay in its own memory: the server keeps
+    serving cached cards and no dashboard or panel hears of the change.
+
+    Returns:
+        list: Names of the process-local settings
+    """
+    local = []
+    if settings.CACHES.get('default', {}).get('BACKEND') in LOCAL_CACHES:
+        local.append('CACHES')
+    if getattr(settings, 'CHANNEL_LAYERS', {}).get('default', {}).get('BACKEND') in LOCAL_CHANNEL_LAYERS:
+        local.append('CHANNEL_LAYERS')
+    if getattr(settings, 'GYM_CARD_CHANGE_LOG', 'App.broadcast.ChangeLog') in LOCAL_CHANGE_LOGS:
+        local.append('GYM_CARD_CHANGE_LOG')
+    return local
+
+
+def require_shared_state(action):
+    """
+    Refuses a card change outside the server process under process-local
+    backends (see process_local_settings)
+
+    Raises:
+        ImproperlyConfigured: when any of the backends is process-local
+    """
+    local = process_local_settings()
+    if local:
+        raise ImproperlyConfigured(
+            f"{action} outside the server needs the shared backends of djangoproj/settings_production.py; "
+            f"{', '.join(local)} only live in this process, so the server would never see the change"
+        )
+
+
+class RedisLock:
+    """
+    Cross-worker mutex on a Redis key, usable with async with
+
+    Plain SET NX PX plus a WATCH/MULTI release, so it needs no Lua scripting
+    and also runs against the fakeredis stand-in.
+    """
+
+    def __init__(self, name, timeout=5, poll=0.005):
+        self.name = name
+        self.timeout = timeout
+        self.poll = poll
+        self._token = None
+
+    async def __aenter__(self):
+        client = redis_client()
+        token = uuid.uuid4().hex
+        while not await client.set(self.name, token, nx=True, px=int(self.timeout * 1000)):
+            await asyncio.sleep(self.poll)
+        self._token = token.encode()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        async with redis_client().pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(self.name)
+                if await pipe.get(self.name) == self._token:
+                    pipe.multi()
+                    pipe.delete(self.name)
+                    await pipe.execute()
+            except WatchError:
+                pass  # Expired and taken over in the meantime
+        return False
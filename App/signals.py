@@ -0,0 +1,31 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from App.cache import card_cache
+from App.models import GymCard
+from App.rfid_index import rfid_index
+
+
+# Both handlers wait for the commit: a read running while the write's
+# transaction is open still sees the old rows, and must not cache them
+# under the new version
+
+@receiver(post_save, sender=GymCard)
+def gym_card_saved(sender, instance, **kwargs):
+    def changed():
+        rfid_index.update(instance)
+        rfid_index.sync_version(card_cache.bump())
+
+    transaction.on_commit(changed)
+
+
+@receiver(post_delete, sender=GymCard)
+def gym_card_deleted(sender, instance, **kwargs):
+    card_id = instance.id  # Cleared by Model.delete() once the signals ran
+
+    def deleted():
+        rfid_index.discard(card_id)
+        rfid_index.sync_version(card_cache.bump())
+
+    transaction.on_commit(deleted)
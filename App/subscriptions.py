@@ -0,0 +1,226 @@
+import hashlib
+import json
+import threading
+import uuid
+
+from App.models import GymCard
+
+GROUP_PREFIX = 'gym_cards.f.'
+# Filter groups are per process: each process's router feeds its own groups
+PROCESS_TOKEN = uuid.uuid4().hex[:8]
+
+
+def _list_of(value, item_type):
+    # bool is an int subclass, but never a valid priority or card id
+    return isinstance(value, list) and all(
+        isinstance(item, item_type) and not isinstance(item, bool) for item in value
+    )
+
+
+class CardFilter:
+    """
+    Server-side filter of a WebSocket subscription
+
+    Any combination of a status set, an inclusive priority range and card
+    ids; an empty filter matches every card.
+    """
+
+    def __init__(self, statuses=None, priority=None, ids=None):
+        self.statuses = frozenset(statuses) if statuses else None
+        self.priority = tuple(priority) if priority else None
+        self.ids = frozenset(ids) if ids else None
+
+    @classmethod
+    def from_message(cls, message):
+        """
+        Builds a filter from a subscribe message:
+            {'type': 'subscribe', 'statuses': [str], 'priority': [min, max], 'ids': [int]}
+
+        Raises:
+            ValueError: on malformed filter values
+        """
+        statuses = message.get('statuses')
+        priority = message.get('priority')
+        ids = message.get('ids')
+        if statuses is not None and not _list_of(statuses, str):
+            raise ValueError('statuses must be a list of strings')
+        if priority is not None and not (_list_of(priority, int) and len(priority) == 2):
+            raise ValueError('priority must be [min, max]')
+        if ids is not None and not _list_of(ids, int):
+            raise ValueError('ids must be a list of integers')
+        return cls(statuses, priority, ids)
+
+    @property
+    def empty(self):
+        return self.statuses is None and self.priority is None and self.ids is None
+
+    def key(self):
+        """Canonical form, equal for equal filters"""
+        return json.dumps([
+            sorted(self.statuses) if self.statuses else None,
+            self.priority,
+            sorted(self.ids) if self.ids else None
+        ], separators=(',', ':'))
+
+    def group_name(self):
+        return f'{GROUP_PREFIX}{PROCESS_TOKEN}.{hashlib.sha1(self.key().encode()).hexdigest()[:16]}'
+
+    def queryset(self, queryset):
+        if self.statuses is not None:
+            queryset = queryset.filter(status__in=self.statuses)
+        if self.priority is not None:
+            queryset = queryset.filter(priority__range=self.priority)
+        if self.ids is not None:
+            queryset = queryset.filter(id__in=self.ids)
+        return queryset
+
+    def matches(self, card, default=True):
+        """
+        Checks a (possibly partial) serialized card; fields missing from a
+        partial update are answered with default
+        """
+        if self.ids is not None and card.get('id') not in self.ids:
+            return False
+        partial = False
+        if self.statuses is not None:
+            if 'Status' not in card:
+                partial = True
+            elif card['Status'] not in self.statuses:
+                return False
+        if self.priority is not None:
+            if 'Priority' not in card:
+                partial = True
+            elif not self.priority[0] <= card['Priority'] <= self.priority[1]:
+                return False
+        return default if partial else True
+
+    def route(self, change, visible=None):
+        """
+        Translates one broadcast change for this filter
+
+        visible is the set of card ids the subscribers currently hold and is
+        updated in place. Without it (replays), matching updates are sent
+        and non-matching ones become deletes, which clients ignore for cards
+        they never had.
+
+        Returns:
+            list: Changes to send, usually empty or the change itself
+        """
+        kind, data = change['type'], change['data']
+        if kind == 'occupancy':
+            # Gym-wide, sent to every filter
+            return [change]
+        known = visible is None or data.get('id') in visible
+
+        if kind == 'cards_expired':
+            ids = [card_id for card_id in data['ids']
+                   if (card_id in visible if visible is not None else self.ids is None or card_id in self.ids)]
+            if not ids:
+                return []
+            if self.statuses is None or data['Status'] in self.statuses:
+                return [{**change, 'data': {**data, 'ids': ids}}]
+            if visible is not None:
+                visible.difference_update(ids)
+            return [{'seq': change.get('seq'), 'type': 'delete', 'data': {'id': card_id}} for card_id in ids]
+
+        card_id = data.get('id')
+        if kind == 'card_update':
+            if self.matches(data, default=known):
+                if visible is not None:
+                    visible.add(card_id)
+                return [change]
+            if known:
+                if visible is not None:
+                    visible.discard(card_id)
+                return [{'seq': change.get('seq'), 'type': 'delete', 'data': {'id': card_id}}]
+            return []
+
+        if kind == 'delete':
+            if visible is not None and card_id not in visible:
+                return []
+            if visible is None and self.ids is not None and card_id not in self.ids:
+                return []
+            if visible is not None:
+                visible.discard(card_id)
+            return [change]
+
+        # Per-card notices such as rfid_timeout
+        if visible is not None:
+            return [change] if card_id in visible else []
+        return [change] if self.ids is None or card_id in self.ids else []
+
+
+class Subscription:
+    """Subscribers sharing one filter group"""
+
+    def __init__(self, card_filter, visible, seq):
+        self.filter = card_filter
+        self.group_name = card_filter.group_name()
+        self.visible = visible  # ids of the cards currently matching
+        self.members = 0
+        self.last_seq = seq  # seq of the last frame sent to the group
+
+
+class SubscriptionRegistry:
+    """
+    Filter groups with at least one subscriber in this process
+
+    App.broadcast routes every flushed batch through route() so each group
+    only receives the changes its filter selects.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._groups = {}
+
+    def join(self, card_filter, seq):
+        """
+        Adds a subscriber; the first one loads the matching card ids
+
+        seq is the current change_log seq, where the group's frames start.
+        """
+        group_name = card_filter.group_name()
+        with self._lock:
+            subscription = self._groups.get(group_name)
+        if subscription is None:
+            visible = set(card_filter.queryset(GymCard.objects.all()).values_list('id', flat=True))
+            subscription = Subscription(card_filter, visible, seq)
+        with self._lock:
+            subscription = self._groups.setdefault(group_name, subscription)
+            subscription.members += 1
+        return subscription
+
+    def leave(self, group_name):
+        with self._lock:
+            subscription = self._groups.get(group_name)
+            if subscription is None:
+                return
+            subscription.members -= 1
+            if subscription.members <= 0:
+                del self._groups[group_name]
+
+    def route(self, changes, seq):
+        """
+        Splits a batch of changes per filter group
+
+        Returns:
+            list: (group name, previous seq, changes) for groups with changes
+        """
+        routed = []
+        with self._lock:
+            for subscription in self._groups.values():
+                selected = [
+                    routed_change
+                    for change in changes
+                    for routed_change in subscription.filter.route(change, subscription.visible)
+                ]
+                if selected:
+                    routed.append((subscription.group_name, subscription.last_seq, selected))
+                    subscription.last_seq = seq
+        return routed
+
+    def __len__(self):
+        return len(self._groups)
+
+
+subscriptions = SubscriptionRegistry()
@@ -0,0 +1,98 @@
+import asyncio
+import functools
+import json
+from datetime import timedelta
+
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from App.broadcast import broadcast_queue
+from App.cache import card_cache
+from App.checkins import checkin_log
+from App.consumers import GymCardConsumer
+from App.idempotency import responses
+from App.models import GymCard
+from App.rfid_index import rfid_index
+
+
+def make_card(**fields):
+    fields = {
+        'title': 'Member',
+        'description': 'Monthly pass',
+        'expiration_date': timezone.now() + timedelta(days=30),
+        'status': 'active',
+        'priority': 1,
+        **fields
+    }
+    return GymCard.objects.create(**fields)
+
+
+def discard_checkins():
+    # Events a test did not flush itself must not leak into the next one
+    with checkin_log._lock:
+        checkin_log._pending.clear()
+
+
+@override_settings(GYM_CARD_RUN_JOBS=False)
+class GymCardTestCase(TestCase):
+    """
+    Keeps the request-started background jobs out of the tests and resets
+    the in-process state that outlives each test's transaction
+    """
+
+    def setUp(self):
+        card_cache.bump()
+        rfid_index.clear()
+        responses.clear()
+
+    def tearDown(self):
+        discard_checkins()
+
+
+def post_json(client, url, payload, **headers):
+    return client.post(url, json.dumps(payload), content_type='application/json', **headers)
+
+
+def websocket_test(test):
+    """
+    Runs an async WebSocket test, then closes its sockets and the broadcast
+    flusher, which are bound to the test's own event loop
+    """
+    @functools.wraps(test)
+    async def run(self):
+        # Broadcasts from the views of earlier tests bind the flusher to a
+        # private loop thread; move it to this test's loop
+        loop = broadcast_queue._loop
+        if loop is not None and loop is not asyncio.get_running_loop():
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(broadcast_queue.stop(), loop))
+        try:
+            await test(self)
+        finally:
+            try:
+                for socket in self.sockets:
+                    await socket.disconnect()
+            finally:
+                await broadcast_queue.stop()
+                await get_channel_layer().flush()
+    return run
+
+
+class WebsocketTestCase(GymCardTestCase):
+    """ws/gym_cards consumers on the in-memory channel layer"""
+
+    def setUp(self):
+        super().setUp()
+        self.sockets = []
+
+    async def connect(self, consumer=GymCardConsumer):
+        socket = WebsocketCommunicator(consumer.as_asgi(), '/ws/gym_cards/')
+        connected, _ = await socket.connect()
+        self.assertTrue(connected)
+        self.sockets.append(socket)
+        return socket
+
+    async def flush(self):
+        """Sends the pending broadcasts as one frame without waiting for the window"""
+        await broadcast_queue._flush()
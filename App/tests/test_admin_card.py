@@ -0,0 +1,47 @@
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+
+from App.tests.base import GymCardTestCase, make_card, post_json
+
+
+class SetAdminCardTests(GymCardTestCase):
+    url = '/api/set_admin_card/'
+
+    def test_flag_is_stored_and_broadcast(self):
+        card = make_card(rfid_card_id='1-2-3')
+
+        with mock.patch('App.views.broadcast_update') as broadcast:
+            response = post_json(self.client, self.url, {'id': card.id, 'is_admin': True})
+
+        card.refresh_from_db()
+        self.assertTrue(card.is_admin)
+        self.assertTrue(response.json()['gym_card']['IsAdmin'])
+        action_type, data = broadcast.call_args.args
+        self.assertEqual((action_type, data['id'], data['IsAdmin']), ('card_update', card.id, True))
+
+    def test_revoke(self):
+        card = make_card(is_admin=True)
+
+        post_json(self.client, self.url, {'id': card.id, 'is_admin': False})
+
+        card.refresh_from_db()
+        self.assertFalse(card.is_admin)
+
+    def test_bad_requests(self):
+        card = make_card()
+
+        self.assertEqual(post_json(self.client, self.url, {'id': card.id, 'is_admin': 'yes'}).status_code, 400)
+        self.assertEqual(post_json(self.client, self.url, {'id': card.id + 1, 'is_admin': True}).status_code, 404)
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+
+
+class AdminCardCommandTests(GymCardTestCase):
+    def test_refused_with_process_local_backends(self):
+        card = make_card()
+
+        with self.assertRaisesMessage(CommandError, 'Changing admin cards'):
+            call_command('admin_card', card.id)
+
+        card.refresh_from_db()
+        self.assertFalse(card.is_admin)
@@ -0,0 +1,56 @@
+from App.broadcast import broadcast_update, change_log
+from App.tests.base import WebsocketTestCase, websocket_test
+
+
+class BroadcastQueueTests(WebsocketTestCase):
+    @websocket_test
+    async def test_changes_within_a_window_go_out_as_one_frame(self):
+        socket = await self.connect()
+
+        broadcast_update('card_update', {'id': 1, 'Status': 'in'})
+        broadcast_update('card_update', {'id': 1, 'Priority': 3})
+        broadcast_update('delete', {'id': 2})
+        broadcast_update('cards_expired', {'ids': [3, 4], 'Status': 'expired', 'IsExpired': True})
+        frame = await socket.receive_json_from(timeout=1)
+
+        self.assertEqual(frame['type'], 'cards_changed')
+        self.assertEqual([(change['type'], change['data']) for change in frame['changes']], [
+            ('card_update', {'id': 1, 'Status': 'in', 'Priority': 3}),
+            ('delete', {'id': 2}),
+            ('cards_expired', {'ids': [3, 4], 'Status': 'expired', 'IsExpired': True}),
+        ])
+        self.assertTrue(await socket.receive_nothing(timeout=0.2))
+
+    @websocket_test
+    async def test_delete_replaces_pending_updates_of_the_card(self):
+        socket = await self.connect()
+
+        broadcast_update('card_update', {'id': 1, 'Status': 'in'})
+        broadcast_update('delete', {'id': 1})
+        await self.flush()
+        frame = await socket.receive_json_from(timeout=1)
+
+        self.assertEqual([(change['type'], change['data']) for change in frame['changes']], [('delete', {'id': 1})])
+
+    @websocket_test
+    async def test_only_the_latest_occupancy_is_sent(self):
+        socket = await self.connect()
+
+        broadcast_update('occupancy', {'count': 1})
+        broadcast_update('occupancy', {'count': 2})
+        await self.flush()
+        frame = await socket.receive_json_from(timeout=1)
+
+        self.assertEqual([change['data'] for change in frame['changes']], [{'count': 2}])
+
+    @websocket_test
+    async def test_every_socket_gets_the_same_frame(self):
+        sockets = [await self.connect() for _ in range(3)]
+
+        broadcast_update('card_update', {'id': 1, 'Status': 'in'})
+        await self.flush()
+
+        frames = [await socket.receive_from(timeout=1) for socket in sockets]
+        self.assertEqual(len(set(frames)), 1)
+        _, seq = await change_log.current()
+        self.assertIn(f'"seq":{seq}', frames[0])
@@ -0,0 +1,99 @@
+import json
+
+from django.db import transaction
+
+from App.cache import card_cache
+from App.tests.base import GymCardTestCase, make_card, post_json
+
+
+class CardCacheTests(GymCardTestCase):
+    def test_repeated_reads_skip_the_database(self):
+        make_card()
+        first = self.client.get('/api/get_gym_card/')
+
+        # Only the ETag's MAX(id) lookup is left
+        with self.assertNumQueries(1):
+            second = self.client.get('/api/get_gym_card/')
+
+        self.assertEqual(second.content, first.content)
+
+    def test_committed_write_invalidates(self):
+        card = make_card()
+        self.client.get('/api/get_gym_card/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post_json(self.client, '/api/update_gym_card/', {'id': card.id, 'status': 'in'})
+
+        page = json.loads(self.client.get('/api/get_gym_card/').content)
+        self.assertEqual(page['gym_cards'][0]['Status'], 'in')
+        card_data = json.loads(self.client.get('/api/get_gym_card/', {'id': card.id}).content)
+        self.assertEqual(card_data['Status'], 'in')
+
+
+class CardCacheCommitTests(GymCardTestCase):
+    """The card version only moves once a write commits"""
+
+    list_url = '/api/get_gym_cards/'
+
+    def read_list_concurrently(self, old_body):
+        # Stands in for a GET on another connection while the write's
+        # transaction is open: it still reads, and caches, the old rows
+        card_cache.get_or_build(f'{self.list_url}?', lambda: old_body)
+
+    def assert_fresh_after_commit(self, old, card_id, status):
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=old['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], old['ETag'])
+        cards = {card['id']: card for card in json.loads(response.content)['gym_cards']}
+        self.assertEqual(cards[card_id]['Status'] if status else card_id in cards, status or False)
+
+    def test_update_during_read(self):
+        card = make_card()
+        old = self.client.get(self.list_url)
+        version = card_cache.version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post_json(self.client, '/api/update_gym_card/', {'id': card.id, 'status': 'suspended'})
+            self.assertEqual(card_cache.version(), version)
+            self.read_list_concurrently(old.content)
+
+        self.assert_fresh_after_commit(old, card.id, 'suspended')
+
+    def test_tap_during_read(self):
+        card = make_card(rfid_card_id='5-5-5')
+        old = self.client.get(self.list_url)
+        version = card_cache.version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tap = post_json(self.client, '/api/tap_rfid_card/', {'rfid_card_id': '5-5-5'})
+            self.assertEqual(tap.json()['action'], 'in')
+            self.assertEqual(card_cache.version(), version)
+            self.read_list_concurrently(old.content)
+
+        self.assert_fresh_after_commit(old, card.id, 'in')
+
+    def test_delete_during_read(self):
+        card = make_card()
+        old = self.client.get(self.list_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post_json(self.client, '/api/delete_gym_card/', {'id': card.id})
+            self.read_list_concurrently(old.content)
+
+        self.assert_fresh_after_commit(old, card.id, None)
+
+    def test_rolled_back_write_keeps_version(self):
+        card = make_card()
+        version = card_cache.version()
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    card.status = 'in'
+                    card.save()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(card_cache.version(), version)
@@ -0,0 +1,163 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import OperationalError, connection
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from App.checkins import checkin_log, rollup_checkins
+from App.expiry import expire_cards
+from App.models import CheckInEvent, GymCard
+from App.tests.base import GymCardTestCase, discard_checkins, make_card, post_json
+
+
+class CheckInEventTests(GymCardTestCase):
+    def events(self):
+        checkin_log.flush()
+        return list(CheckInEvent.objects.order_by('id').values_list('direction', flat=True))
+
+    def update(self, card, status):
+        return post_json(self.client, '/api/update_gym_card/', {'id': card.id, 'status': status})
+
+    def test_taps_log_in_then_out(self):
+        make_card(rfid_card_id='7-7')
+
+        with self.settings(GYM_CARD_TAP_DEDUPE_WINDOW=0):
+            for _ in range(3):
+                post_json(self.client, '/api/tap_rfid_card/', {'rfid_card_id': '7-7', 'reader_id': 'door-1'})
+
+        self.assertEqual(self.events(), ['in', 'out', 'in'])
+        self.assertEqual(CheckInEvent.objects.first().reader_id, 'door-1')
+
+    def test_status_changes_outside_the_gym_are_not_attendance(self):
+        card = make_card(status='expired', is_expired=True)
+
+        self.update(card, 'active')  # Renewal
+        self.update(card, 'suspended')
+        self.update(card, 'active')  # Un-suspended
+
+        self.assertEqual(self.events(), [])
+
+    def test_leaving_in_logs_out(self):
+        card = make_card()
+
+        self.update(card, 'in')
+        self.update(card, 'in')
+        self.update(card, 'expired')
+
+        self.assertEqual(self.events(), ['in', 'out'])
+
+
+class CheckOutWithoutTapTests(GymCardTestCase):
+    """Cards leaving the gym through a delete or an expiry still log a check-out"""
+
+    def events(self):
+        return list(CheckInEvent.objects.order_by('id').values_list('card_id', 'rfid_card_id', 'direction'))
+
+    def test_deleting_a_card_inside(self):
+        inside = make_card(status='in', rfid_card_id='7-7')
+        outside = make_card()
+
+        for card in (inside, outside):
+            post_json(self.client, '/api/delete_gym_card/', {'id': card.id})
+
+        # The event outlives its card
+        self.assertEqual(self.events(), [(None, '7-7', 'out')])
+
+    def test_marking_a_card_inside_expired(self):
+        inside = make_card(status='in')
+        outside = make_card()
+
+        for card in (inside, outside):
+            post_json(self.client, '/api/mark_card_expired/', {'id': card.id})
+
+        self.assertEqual(self.events(), [(inside.id, '', 'out')])
+
+    def test_expiring_cards_inside(self):
+        yesterday = timezone.now() - timedelta(days=1)
+        inside = make_card(status='in', rfid_card_id='7-7', expiration_date=yesterday)
+        make_card(expiration_date=yesterday)
+
+        with mock.patch('App.expiry.broadcast_update'):
+            expire_cards()
+
+        self.assertEqual(self.events(), [(inside.id, '7-7', 'out')])
+
+    def test_rolled_back_with_the_card_change(self):
+        card = make_card(status='in')
+
+        with mock.patch('App.views.occupancy.transition', side_effect=OperationalError('locked')):
+            response = post_json(self.client, '/api/delete_gym_card/', {'id': card.id})
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(self.events(), [])
+        self.assertTrue(GymCard.objects.filter(id=card.id).exists())
+
+
+@override_settings(GYM_CARD_RUN_JOBS=False)
+class CheckInFlushTests(TransactionTestCase):
+    """Flushes commit, so foreign keys are checked as in production"""
+
+    def tearDown(self):
+        discard_checkins()
+
+    def test_event_of_deleted_card_does_not_block_the_batch(self):
+        gone, kept = make_card(), make_card()
+        checkin_log.record(gone, 'active', 'in')
+        checkin_log.record(kept, 'active', 'in')
+        # Deleted behind the ORM's back, before the flush
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM "App_gymcard" WHERE id = %s', [gone.id])
+
+        self.assertEqual(checkin_log.flush(), 2)
+
+        self.assertEqual(len(checkin_log), 0)
+        self.assertEqual(
+            sorted(CheckInEvent.objects.values_list('card_id', flat=True), key=str),
+            [kept.id, None]
+        )
+
+    def test_transient_error_keeps_the_batch(self):
+        card = make_card()
+        checkin_log.record(card, 'active', 'in')
+
+        with mock.patch.object(CheckInEvent.objects, 'bulk_create', side_effect=OperationalError('locked')):
+            self.assertEqual(checkin_log.flush(), 0)
+        self.assertEqual(len(checkin_log), 1)
+
+        self.assertEqual(checkin_log.flush(), 1)
+        self.assertEqual(CheckInEvent.objects.count(), 1)
+
+
+class CheckInReportTests(GymCardTestCase):
+    url = '/api/checkin_report/'
+
+    def test_rollups_answer_the_report(self):
+        card = make_card()
+        now = timezone.now()
+        for minutes, direction in ((0, 'in'), (5, 'in'), (10, 'out'), (120, 'in')):
+            CheckInEvent.objects.create(card=card, direction=direction,
+                                        occurred_at=now - timedelta(minutes=minutes))
+
+        self.assertEqual(rollup_checkins(batch=2), 4)
+        self.assertEqual(rollup_checkins(), 0)
+
+        report = self.client.get(self.url, {'by': 'hour', 'from': '2000-01-01'}).json()
+        self.assertEqual((report['check_ins'], report['check_outs']), (3, 1))
+        self.assertEqual(report['peak_hour']['check_ins'], max(row['check_ins'] for row in report['rows']))
+        daily = self.client.get(self.url, {'from': '2000-01-01'}).json()
+        self.assertEqual((daily['check_ins'], daily['check_outs']), (3, 1))
+
+    def test_no_peak_hour_without_check_ins(self):
+        card = make_card()
+        CheckInEvent.objects.create(card=card, direction='out', occurred_at=timezone.now())
+        rollup_checkins()
+
+        report = self.client.get(self.url).json()
+
+        self.assertEqual(report['check_ins'], 0)
+        self.assertIsNone(report['peak_hour'])
+
+    def test_bad_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'by': 'week'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'from': 'yesterday'}).status_code, 400)
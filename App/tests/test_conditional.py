@@ -0,0 +1,26 @@
+from App.tests.base import GymCardTestCase, make_card
+
+
+class ConditionalListTests(GymCardTestCase):
+    url = '/api/get_gym_cards/'
+
+    def test_unchanged_list_answers_304(self):
+        make_card()
+        first = self.client.get(self.url, {'limit': 10})
+
+        again = self.client.get(self.url, {'limit': 10}, HTTP_IF_NONE_MATCH=first['ETag'])
+        other_params = self.client.get(self.url, {'limit': 5}, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(other_params.status_code, 200)
+
+    def test_new_card_changes_the_etag(self):
+        make_card()
+        first = self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_card(title='Newcomer')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Newcomer', [card['Title'] for card in response.json()['gym_cards']])
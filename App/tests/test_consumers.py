@@ -0,0 +1,175 @@
+import asyncio
+import contextlib
+from unittest import mock
+
+from django.test import override_settings
+
+from App.broadcast import ChangeLog, broadcast_update, change_log
+from App.consumers import EVICTED, GymCardConsumer, socket_stats
+from App.tests.base import WebsocketTestCase, make_card, websocket_test
+
+
+@contextlib.contextmanager
+def change_buffer_of_one():
+    """Swaps in a change log that only keeps the last change"""
+    small = ChangeLog(size=1)
+    with mock.patch('App.broadcast.change_log', small), mock.patch('App.consumers.change_log', small):
+        yield small
+
+
+class StalledConsumer(GymCardConsumer):
+    """A client that stops reading until released"""
+
+    released = None
+
+    async def send(self, text_data=None, bytes_data=None, close=False):
+        await self.released.wait()
+        await super().send(text_data, bytes_data, close)
+
+
+class RelayTests(WebsocketTestCase):
+    @websocket_test
+    async def test_typed_client_message_reaches_every_socket(self):
+        sender, other = await self.connect(), await self.connect()
+
+        await sender.send_json_to({'type': 'rfid_scan_started', 'card': {'id': 7}})
+
+        for socket in (sender, other):
+            self.assertEqual(await socket.receive_json_from(timeout=1),
+                             {'type': 'rfid_scan_started', 'data': {'id': 7}})
+
+
+class SyncSinceTests(WebsocketTestCase):
+    def setUp(self):
+        super().setUp()
+        self.card = make_card(title='Anna')
+
+    async def change(self, card_id, status):
+        broadcast_update('card_update', {'id': card_id, 'Status': status})
+        await self.flush()
+
+    @websocket_test
+    async def test_frames_chain_by_seq(self):
+        socket = await self.connect()
+
+        await self.change(1, 'in')
+        await self.change(1, 'active')
+        first = await socket.receive_json_from(timeout=1)
+        second = await socket.receive_json_from(timeout=1)
+
+        self.assertEqual(first['epoch'], change_log.epoch)
+        self.assertEqual(second['prev_seq'], first['seq'])
+        self.assertEqual(second['changes'][0]['seq'], second['seq'])
+
+    @websocket_test
+    async def test_resume_replays_only_missed_changes(self):
+        socket = await self.connect()
+        await self.change(1, 'in')
+        applied = await socket.receive_json_from(timeout=1)
+        await socket.disconnect()
+        self.sockets.remove(socket)
+
+        await self.change(1, 'active')
+        await self.change(2, 'in')
+        resumed = await self.connect()
+        await resumed.send_json_to({'type': 'sync_since', 'epoch': applied['epoch'], 'seq': applied['seq']})
+        replay = await resumed.receive_json_from(timeout=1)
+
+        self.assertEqual(replay['type'], 'cards_changed')
+        self.assertEqual(replay['prev_seq'], applied['seq'])
+        self.assertEqual([change['data'] for change in replay['changes']],
+                         [{'id': 1, 'Status': 'active'}, {'id': 2, 'Status': 'in'}])
+
+    @websocket_test
+    async def test_up_to_date_client_gets_an_empty_replay(self):
+        socket = await self.connect()
+        epoch, seq = await change_log.current()
+
+        await socket.send_json_to({'type': 'sync_since', 'epoch': epoch, 'seq': seq})
+        replay = await socket.receive_json_from(timeout=1)
+
+        self.assertEqual((replay['prev_seq'], replay['seq'], replay['changes']), (seq, seq, []))
+
+    @websocket_test
+    async def test_client_without_state_gets_a_snapshot(self):
+        socket = await self.connect()
+
+        for epoch, seq in ((None, None), ('restarted', 3)):
+            await socket.send_json_to({'type': 'sync_since', 'epoch': epoch, 'seq': seq})
+            snapshot = await socket.receive_json_from(timeout=1)
+            self.assertEqual(snapshot['type'], 'snapshot')
+            self.assertEqual((snapshot['epoch'], snapshot['seq']), await change_log.current())
+            self.assertEqual([card['Title'] for card in snapshot['gym_cards']], ['Anna'])
+
+    @websocket_test
+    async def test_gap_older_than_the_buffer_gets_a_snapshot(self):
+        socket = await self.connect()
+
+        with change_buffer_of_one() as small:
+            epoch, seq = await small.current()
+            await self.change(1, 'in')
+            await self.change(1, 'active')
+            for _ in range(2):
+                await socket.receive_json_from(timeout=1)
+            await socket.send_json_to({'type': 'sync_since', 'epoch': epoch, 'seq': seq})
+            snapshot = await socket.receive_json_from(timeout=1)
+
+        self.assertEqual((snapshot['type'], snapshot['seq']), ('snapshot', 2))
+
+
+@override_settings(GYM_CARD_WS_QUEUE_LIMIT=2)
+class BackpressureTests(WebsocketTestCase):
+    def setUp(self):
+        super().setUp()
+        StalledConsumer.released = asyncio.Event()
+
+    async def stalled_socket(self):
+        """A stalled socket that already applied the current state"""
+        StalledConsumer.released.set()
+        socket = await self.connect(StalledConsumer)
+        await socket.send_json_to({'type': 'sync_since', 'epoch': None})
+        snapshot = await socket.receive_json_from(timeout=1)
+        StalledConsumer.released.clear()
+        return socket, snapshot
+
+    async def send_frames(self, count):
+        for card_id in range(count):
+            broadcast_update('card_update', {'id': card_id, 'Status': 'in'})
+            await self.flush()
+        await asyncio.sleep(0.05)  # Let the consumer queue them
+
+    @websocket_test
+    async def test_overflow_is_replaced_by_one_replay(self):
+        socket, snapshot = await self.stalled_socket()
+        overflows = socket_stats.counts['overflows']
+
+        await self.send_frames(5)
+        StalledConsumer.released.set()
+        # The frame being sent when the client stalled, then one replay
+        in_flight = await socket.receive_json_from(timeout=1)
+        replay = await socket.receive_json_from(timeout=1)
+
+        self.assertGreater(socket_stats.counts['overflows'], overflows)
+        self.assertEqual(in_flight['prev_seq'], snapshot['seq'])
+        self.assertEqual(replay['prev_seq'], in_flight['seq'])
+        self.assertEqual([change['data']['id'] for change in replay['changes']], [1, 2, 3, 4])
+        self.assertTrue(await socket.receive_nothing(timeout=0.1))
+
+    @websocket_test
+    @override_settings(GYM_CARD_WS_SEND_TIMEOUT=0.05)
+    async def test_stalled_send_evicts_the_socket(self):
+        socket, _ = await self.stalled_socket()
+
+        await self.send_frames(1)
+
+        self.assertEqual(await socket.receive_output(timeout=1), {'type': 'websocket.close', 'code': EVICTED})
+
+    @websocket_test
+    async def test_replay_that_fell_off_the_buffer_evicts_the_socket(self):
+        with change_buffer_of_one():
+            socket, _ = await self.stalled_socket()
+            await self.send_frames(5)
+            StalledConsumer.released.set()
+
+            await socket.receive_json_from(timeout=1)
+            self.assertEqual(await socket.receive_output(timeout=1), {'type': 'websocket.close', 'code': EVICTED})
@@ -0,0 +1,122 @@
+import asyncio
+from unittest import mock
+
+from django.db import transaction
+from django.test import SimpleTestCase
+
+from App.enrolment import EnrolmentRegistry, EnrolmentSession, TimerWheel, bind_rfid
+from App.models import GymCard
+from App.tests.base import GymCardTestCase, make_card
+
+
+class TimerWheelTests(SimpleTestCase):
+    def test_timer_fires_after_its_ticks(self):
+        wheel = TimerWheel(tick=1.0, slots=4)
+        fired = []
+        tick = 0
+        wheel.schedule(2.5, lambda: fired.append(('short', tick)))
+        # Longer than one turn of the wheel
+        wheel.schedule(9, lambda: fired.append(('long', tick)))
+
+        for tick in range(1, 12):
+            wheel.advance()
+
+        self.assertEqual(fired, [('short', 3), ('long', 9)])
+
+    def test_cancelled_timer_never_fires(self):
+        wheel = TimerWheel(tick=1.0, slots=4)
+        fired = []
+        wheel.schedule(1, lambda: fired.append('cancelled')).cancel()
+
+        wheel.advance()
+
+        self.assertEqual(fired, [])
+
+    def test_failing_callback_does_not_stop_the_others(self):
+        wheel = TimerWheel(tick=1.0, slots=4)
+        fired = []
+        wheel.schedule(1, lambda: 1 / 0)
+        wheel.schedule(1, lambda: fired.append('second'))
+
+        with self.assertLogs('App.enrolment', 'ERROR'):
+            wheel.advance()
+
+        self.assertEqual(fired, ['second'])
+
+
+class EnrolmentRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.registry = EnrolmentRegistry()
+        patcher = mock.patch('App.enrolment.timeout_enrolment')
+        self.timeout_enrolment = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_sessions_are_claimed_first_come_first_served(self):
+        first = await self.registry.open(1, timeout=30)
+        second = await self.registry.open(2, timeout=30)
+
+        self.assertIs(await self.registry.claim_next(), first)
+        await self.registry.requeue(first)  # e.g. the bind failed
+        self.assertIs(await self.registry.claim_next(), first)
+        self.assertIs(await self.registry.claim_next(), second)
+        self.assertIsNone(await self.registry.claim_next())
+
+    async def test_completion_wakes_the_waiter(self):
+        session = await self.registry.open(1, timeout=30)
+        waiter = asyncio.ensure_future(session.wait())
+
+        claimed = await self.registry.claim_next()
+        claimed.finish(EnrolmentSession.BOUND, {'id': 1, 'rfid_card_id': '1-2-3'})
+
+        finished = await asyncio.wait_for(waiter, 1)
+        self.assertEqual((finished.state, finished.card['rfid_card_id']), ('bound', '1-2-3'))
+        # Its timer is cancelled with it
+        self.assertTrue(session.timer.cancelled)
+
+    async def test_timeout(self):
+        session = await self.registry.open(1, timeout=2)
+
+        for _ in range(2):
+            self.registry.wheel.advance()
+        finished = await asyncio.wait_for(session.wait(), 1)
+        await asyncio.sleep(0.05)  # Let the timeout notification run
+
+        self.assertEqual(finished.state, EnrolmentSession.TIMED_OUT)
+        self.assertEqual(len(self.registry), 0)
+        self.timeout_enrolment.assert_called_once_with(1)
+        # A bind finishing after the timeout is ignored
+        session.finish(EnrolmentSession.BOUND, {'id': 1})
+        self.assertEqual(session.state, EnrolmentSession.TIMED_OUT)
+
+    async def test_cancel(self):
+        session = await self.registry.open(1, timeout=30)
+
+        self.assertTrue(await self.registry.cancel(1))
+        self.assertFalse(await self.registry.cancel(1))
+
+        self.assertEqual(session.state, EnrolmentSession.TIMED_OUT)
+        self.assertIsNone(await self.registry.claim_next())
+
+
+class BindRfidTests(GymCardTestCase):
+    def test_binds_the_scanned_tag(self):
+        card = make_card()
+
+        with mock.patch('App.enrolment.broadcast_update') as broadcast:
+            card_data = bind_rfid(card.id, '1-2-3')
+
+        self.assertEqual(card_data['rfid_card_id'], '1-2-3')
+        self.assertEqual(GymCard.objects.get(id=card.id).rfid_card_id, '1-2-3')
+        broadcast.assert_called_once_with('card_update', card_data)
+
+    def test_tag_of_another_card_is_refused(self):
+        make_card(rfid_card_id='1-2-3')
+        card = make_card()
+
+        with mock.patch('App.enrolment.broadcast_update') as broadcast, self.assertLogs('App.enrolment', 'ERROR'):
+            # Stands in for autocommit: the failed UPDATE only rolls back itself
+            with transaction.atomic():
+                self.assertIsNone(bind_rfid(card.id, '1-2-3'))
+
+        broadcast.assert_called_once_with('rfid_error', {'id': card.id, 'message': 'RFID card already registered'})
+        self.assertIsNone(GymCard.objects.get(id=card.id).rfid_card_id)
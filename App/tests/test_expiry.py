@@ -0,0 +1,119 @@
+import asyncio
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import QuerySet
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from App.checks import check_scheduled_jobs
+from App.expiry import expire_cards
+from App.models import GymCard
+from App.scheduler import scheduler
+from App.tests.base import GymCardTestCase, make_card, post_json
+
+
+@override_settings(GYM_CARD_RUN_JOBS=True, GYM_CARD_EXPIRY_INTERVAL=0.05)
+class LazySchedulerTests(TransactionTestCase):
+    """Without an ASGI lifespan the first request starts the jobs"""
+
+    def tearDown(self):
+        if scheduler.running:
+            asyncio.run_coroutine_threadsafe(scheduler.stop(), scheduler._loop).result(timeout=5)
+
+    def test_first_request_starts_expirer(self):
+        card = make_card(expiration_date=timezone.now() - timedelta(days=1))
+        self.assertFalse(scheduler.running)
+
+        self.client.get('/api/cache_stats/')
+
+        self.assertTrue(scheduler.running)
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            card.refresh_from_db()
+            if card.is_expired:
+                break
+            time.sleep(0.05)
+        self.assertEqual((card.status, card.is_expired), ('expired', True))
+
+
+class ExpireCardsTests(GymCardTestCase):
+    def test_only_cards_the_update_changed_are_reported(self):
+        due = make_card(expiration_date=timezone.now() - timedelta(days=1))
+        renewed = make_card(expiration_date=timezone.now() - timedelta(days=1))
+        exists = QuerySet.exists
+
+        def renew_during_check(queryset):
+            # Renewed between the cheap check and the locked re-read
+            GymCard.objects.filter(id=renewed.id).update(expiration_date=timezone.now() + timedelta(days=30))
+            return exists(queryset)
+
+        with mock.patch.object(QuerySet, 'exists', autospec=True, side_effect=renew_during_check), \
+                mock.patch('App.expiry.broadcast_update') as broadcast:
+            self.assertEqual(expire_cards(), [due.id])
+
+        broadcast.assert_called_once_with('cards_expired', {'ids': [due.id], 'Status': 'expired', 'IsExpired': True})
+        renewed.refresh_from_db()
+        self.assertEqual((renewed.status, renewed.is_expired), ('active', False))
+
+    def test_nothing_due(self):
+        make_card()
+
+        with mock.patch('App.expiry.broadcast_update') as broadcast:
+            self.assertEqual(expire_cards(), [])
+
+        broadcast.assert_not_called()
+
+
+class MarkCardExpiredTests(GymCardTestCase):
+    def test_change_is_broadcast_after_the_commit(self):
+        card = make_card(rfid_card_id='1-2-3')
+
+        with mock.patch('App.views.broadcast_update') as broadcast:
+            with self.captureOnCommitCallbacks() as callbacks:
+                response = post_json(self.client, '/api/mark_card_expired/', {'id': card.id})
+            broadcast.assert_not_called()
+            for callback in callbacks:
+                callback()
+
+        self.assertEqual(response.status_code, 200)
+        action_type, data = broadcast.call_args.args
+        self.assertEqual((action_type, data['id'], data['IsExpired']), ('card_update', card.id, True))
+
+    def test_unknown_card(self):
+        with mock.patch('App.views.broadcast_update') as broadcast:
+            response = post_json(self.client, '/api/mark_card_expired/', {'id': 99})
+
+        self.assertEqual(response.status_code, 404)
+        broadcast.assert_not_called()
+
+
+SHARED_BACKENDS = {
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}},
+    'CHANNEL_LAYERS': {'default': {'BACKEND': 'channels_redis.core.RedisChannelLayer'}},
+    'GYM_CARD_CHANGE_LOG': 'App.broadcast.RedisChangeLog',
+}
+
+
+class CronModeTests(SimpleTestCase):
+    """Jobs run from cron must reach the server through shared backends"""
+
+    def errors(self):
+        return [error.id for error in check_scheduled_jobs(None)]
+
+    @override_settings(GYM_CARD_RUN_JOBS=False)
+    def test_cron_mode_needs_shared_backends(self):
+        self.assertEqual(self.errors(), ['App.E001'])
+        with self.assertRaisesMessage(CommandError, 'CACHES, CHANNEL_LAYERS, GYM_CARD_CHANGE_LOG'):
+            call_command('expire_cards')
+
+    @override_settings(GYM_CARD_RUN_JOBS=False, **SHARED_BACKENDS)
+    def test_shared_backends_pass(self):
+        self.assertEqual(self.errors(), [])
+
+    @override_settings(GYM_CARD_RUN_JOBS=True)
+    def test_jobs_in_the_server(self):
+        self.assertEqual(self.errors(), [])
@@ -0,0 +1,56 @@
+from App.models import GymCard
+from App.tests.base import GymCardTestCase, make_card, post_json
+
+
+class IdempotencyTests(GymCardTestCase):
+    tap_url = '/api/tap_rfid_card/'
+    update_url = '/api/update_gym_card/'
+
+    def test_repeated_tap_within_window_is_replayed(self):
+        card = make_card(rfid_card_id='3-3')
+
+        first = post_json(self.client, self.tap_url, {'rfid_card_id': '3-3'})
+        with self.assertNumQueries(0):
+            second = post_json(self.client, self.tap_url, {'rfid_card_id': '3-3'})
+
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        card.refresh_from_db()
+        self.assertEqual(card.status, 'in')
+
+    def test_resent_read_is_replayed(self):
+        make_card(rfid_card_id='3-3')
+        read = {'rfid_card_id': '3-3', 'read_id': 'gw-1-42'}
+
+        with self.settings(GYM_CARD_TAP_DEDUPE_WINDOW=0):
+            first = post_json(self.client, self.tap_url, read)
+            resent = post_json(self.client, self.tap_url, read)
+            next_read = post_json(self.client, self.tap_url, {**read, 'read_id': 'gw-1-43'})
+
+        self.assertEqual(resent.json()['action'], first.json()['action'])
+        self.assertEqual(resent['Idempotent-Replayed'], 'true')
+        self.assertEqual(next_read.json()['action'], 'active')
+
+    def test_update_replayed_only_with_a_key(self):
+        card = make_card()
+
+        post_json(self.client, self.update_url, {'id': card.id, 'status': 'in'}, HTTP_IDEMPOTENCY_KEY='k1')
+        GymCard.objects.filter(id=card.id).update(status='active')
+        replay = post_json(self.client, self.update_url, {'id': card.id, 'status': 'in'}, HTTP_IDEMPOTENCY_KEY='k1')
+
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        card.refresh_from_db()
+        self.assertEqual(card.status, 'active')
+
+        unkeyed = post_json(self.client, self.update_url, {'id': card.id, 'status': 'in'})
+        self.assertFalse(unkeyed.has_header('Idempotent-Replayed'))
+        card.refresh_from_db()
+        self.assertEqual(card.status, 'in')
+
+    def test_failures_are_not_stored(self):
+        post_json(self.client, self.tap_url, {'rfid_card_id': '8-8'})
+        make_card(rfid_card_id='8-8')
+
+        response = post_json(self.client, self.tap_url, {'rfid_card_id': '8-8'})
+
+        self.assertEqual(response.json()['action'], 'in')
@@ -0,0 +1,99 @@
+import asyncio
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from App.enrolment import EnrolmentRegistry, EnrolmentSession
+from App.idempotency import responses
+from App.mqtt_service import MqttIngestionService
+
+
+class FakeClient:
+    """Records what the service asks of its paho client"""
+
+    def __init__(self):
+        self.subscriptions = []
+
+    def subscribe(self, topic, qos=0):
+        self.subscriptions.append((topic, qos))
+
+
+class FakeMessage:
+    def __init__(self, payload):
+        self.payload = json.dumps(payload).encode()
+
+
+@override_settings(MQTT_CARD_TOPIC='gym/cards')
+class MqttMessageTests(SimpleTestCase):
+    def setUp(self):
+        responses.clear()
+        self.service = MqttIngestionService()
+        self.client = FakeClient()
+        self.registry = EnrolmentRegistry()
+        self.bound = []
+        patchers = [
+            mock.patch('App.mqtt_service.enrolment_registry', self.registry),
+            mock.patch('App.mqtt_service.bind_rfid', side_effect=self.bind_rfid),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def bind_rfid(self, card_id, rfid_card_id):
+        self.bound.append((card_id, rfid_card_id))
+        return {'id': card_id, 'rfid_card_id': rfid_card_id}
+
+    async def receive(self, payload):
+        self.service._on_message(self.client, None, FakeMessage(payload))
+        # Let the dispatch tasks bind the tags
+        for _ in range(5):
+            await asyncio.sleep(0.01)
+
+    async def test_connect_subscribes_with_qos_1(self):
+        self.service._disconnected = asyncio.Event()
+
+        self.service._on_connect(self.client, None, {}, 0)
+
+        self.assertEqual(self.client.subscriptions, [('gym/cards', 1)])
+        self.assertTrue(self.service.connected)
+
+    async def test_scan_binds_the_oldest_pending_card(self):
+        first = await self.registry.open(1, timeout=30)
+        second = await self.registry.open(2, timeout=30)
+
+        await self.receive({'card_id': '1-2-3'})
+
+        self.assertEqual(self.bound, [(1, '1-2-3')])
+        self.assertEqual((first.state, second.state), (EnrolmentSession.BOUND, EnrolmentSession.PENDING))
+
+    async def test_gateway_batch_skips_resent_reads(self):
+        for card_id in (1, 2, 3):
+            await self.registry.open(card_id, timeout=30)
+
+        await self.receive({'reads': [{'card_id': '1-1', 'read_id': 'gw-1'}, {'card_id': '2-2', 'read_id': 'gw-2'}]})
+        # The gateway resends its spool until the broker acknowledges it
+        await self.receive({'reads': [{'card_id': '2-2', 'read_id': 'gw-2'}]})
+
+        self.assertEqual(sorted(self.bound), [(1, '1-1'), (2, '2-2')])
+        self.assertEqual(len(self.registry), 1)
+
+    async def test_failed_bind_keeps_the_session_waiting(self):
+        session = await self.registry.open(1, timeout=30)
+
+        with mock.patch('App.mqtt_service.bind_rfid', return_value=None):
+            await self.receive({'card_id': 'taken'})
+
+        self.assertEqual(session.state, EnrolmentSession.PENDING)
+        self.assertIs(await self.registry.claim_next(), session)
+
+    async def test_malformed_messages_are_dropped(self):
+        await self.registry.open(1, timeout=30)
+
+        with self.assertLogs('App.mqtt_service', 'ERROR'):
+            self.service._on_message(self.client, None, type('Message', (), {'payload': b'not json'})())
+        with self.assertLogs('App.mqtt_service', 'ERROR'):
+            await self.receive({'reader_id': 'door-1'})
+
+        self.assertEqual(self.bound, [])
+        self.assertEqual(len(self.registry), 1)
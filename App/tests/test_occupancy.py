@@ -0,0 +1,64 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.utils import timezone
+
+from App import occupancy
+from App.expiry import expire_cards
+from App.models import GymCard, Occupancy
+from App.tests.base import GymCardTestCase, make_card, post_json
+
+
+class OccupancyTests(GymCardTestCase):
+    url = '/api/occupancy/'
+
+    def count(self):
+        return self.client.get(self.url).json()['count']
+
+    def update(self, card, status):
+        post_json(self.client, '/api/update_gym_card/', {'id': card.id, 'status': status})
+
+    def test_counter_follows_status_transitions(self):
+        first, second, third = make_card(rfid_card_id='1-1'), make_card(), make_card()
+
+        self.update(first, 'in')
+        self.update(second, 'in')
+        self.update(second, 'in')
+        self.assertEqual(self.count(), 2)
+
+        with self.settings(GYM_CARD_TAP_DEDUPE_WINDOW=0):
+            post_json(self.client, '/api/tap_rfid_card/', {'rfid_card_id': '1-1'})
+        self.assertEqual(self.count(), 1)
+
+        post_json(self.client, '/api/delete_gym_card/', {'id': second.id})
+        self.assertEqual(self.count(), 0)
+
+        self.update(third, 'in')
+        GymCard.objects.filter(id=third.id).update(expiration_date=timezone.now() - timedelta(days=1))
+        expire_cards()
+        self.assertEqual(self.count(), 0)
+
+    def test_read_is_one_query(self):
+        occupancy.reconcile()
+
+        with self.assertNumQueries(1):
+            self.count()
+
+    def test_reconcile_repairs_drift(self):
+        card = make_card()
+        self.update(card, 'in')
+        Occupancy.objects.update(count=5)
+
+        self.assertEqual(occupancy.reconcile(), 1)
+        self.assertEqual(self.count(), 1)
+
+    def test_change_is_broadcast_after_commit(self):
+        card = make_card()
+        occupancy.reconcile()
+
+        with mock.patch('App.occupancy.broadcast_update') as broadcast:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.update(card, 'in')
+                broadcast.assert_not_called()
+
+        broadcast.assert_called_once_with('occupancy', {'count': 1})
@@ -0,0 +1,47 @@
+from App.tests.base import GymCardTestCase, make_card, post_json
+
+
+class KeysetPaginationTests(GymCardTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cards = [make_card(title=f'Card {index}', priority=index % 3) for index in range(7)]
+
+    def pages(self, fetch):
+        ids, cursor = [], None
+        while True:
+            page = fetch(cursor)
+            ids.append([card['id'] for card in page['gym_cards']])
+            cursor = page['next_cursor']
+            if cursor is None:
+                return ids
+
+    def test_list_pages_cover_every_card_once(self):
+        def fetch(cursor):
+            params = {'limit': 3, **({'cursor': cursor} if cursor else {})}
+            return self.client.get('/api/get_gym_cards/', params).json()
+
+        pages = self.pages(fetch)
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), [card.id for card in self.cards])
+
+    def test_sorted_pages_follow_the_ordering(self):
+        def fetch(cursor):
+            params = {'sort_by': '-priority', 'limit': 2, 'fields': 'Priority', 'cursor': cursor}
+            return post_json(self.client, '/api/sort_gym_card/', params).json()
+
+        pages = self.pages(fetch)
+
+        expected = sorted(self.cards, key=lambda card: (-card.priority, card.id))
+        self.assertEqual(sum(pages, []), [card.id for card in expected])
+
+    def test_fields_projection(self):
+        page = self.client.get('/api/get_gym_cards/', {'limit': 1, 'fields': 'Title,Status'}).json()
+
+        self.assertEqual(page['gym_cards'], [{'id': self.cards[0].id, 'Title': 'Card 0', 'Status': 'active'}])
+
+    def test_bad_parameters(self):
+        for params in ({'cursor': 'garbage'}, {'fields': 'Password'}, {'limit': 'many'}):
+            self.assertEqual(self.client.get('/api/get_gym_cards/', params).status_code, 400)
+        response = post_json(self.client, '/api/sort_gym_card/', {'sort_by': 'name'})
+        self.assertEqual(response.status_code, 400)
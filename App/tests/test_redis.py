@@ -0,0 +1,133 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from App.broadcast import RedisChangeLog
+from App.enrolment import EnrolmentSession, RedisEnrolmentRegistry, RemoteSession
+from App.shared import RedisLock
+
+try:
+    import fakeredis
+except ImportError:  # pragma: no cover - test dependency
+    fakeredis = None
+
+
+@unittest.skipIf(fakeredis is None, 'the shared backend tests need fakeredis')
+class RedisTestCase(SimpleTestCase):
+    """Runs the shared backends against one in-memory fakeredis server"""
+
+    def setUp(self):
+        server = fakeredis.FakeServer()
+        clients = {}
+
+        def redis_client():
+            loop = asyncio.get_running_loop()
+            if loop not in clients:
+                clients[loop] = fakeredis.FakeAsyncRedis(server=server)
+            return clients[loop]
+
+        for module in ('App.shared', 'App.broadcast', 'App.enrolment'):
+            patcher = mock.patch(f'{module}.redis_client', redis_client)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.redis_client = redis_client
+
+
+class RedisLockTests(RedisTestCase):
+    async def test_holders_run_one_at_a_time(self):
+        events = []
+
+        async def hold(name):
+            async with RedisLock('test:lock', poll=0.001):
+                events.append(f'{name} in')
+                await asyncio.sleep(0.01)
+                events.append(f'{name} out')
+
+        await asyncio.gather(hold('a'), hold('b'))
+
+        self.assertEqual([event.split()[1] for event in events], ['in', 'out', 'in', 'out'])
+        self.assertIsNone(await self.redis_client().get('test:lock'))
+
+    async def test_expired_lock_taken_over_is_not_released(self):
+        async with RedisLock('test:lock', timeout=5):
+            # Expired, then acquired by another worker
+            await self.redis_client().set('test:lock', b'other worker')
+
+        self.assertEqual(await self.redis_client().get('test:lock'), b'other worker')
+
+
+class RedisChangeLogTests(RedisTestCase):
+    async def test_workers_share_one_numbering(self):
+        first, second = RedisChangeLog(size=8), RedisChangeLog(size=8)
+
+        self.assertEqual(await first.append([{'type': 'card_update', 'data': {'id': 1}}]), (0, 1))
+        changes = [{'type': 'delete', 'data': {'id': 2}}, {'type': 'delete', 'data': {'id': 3}}]
+        self.assertEqual(await second.append(changes), (1, 3))
+
+        self.assertEqual(await first.current(), await second.current())
+        self.assertEqual([change['seq'] for change in changes], [2, 3])
+        self.assertEqual([change['data']['id'] for change in await first.since(1)], [2, 3])
+
+    async def test_gap_older_than_the_buffer_needs_a_snapshot(self):
+        change_log = RedisChangeLog(size=2)
+        for card_id in range(1, 4):
+            await change_log.append([{'type': 'delete', 'data': {'id': card_id}}])
+
+        self.assertEqual([change['seq'] for change in await change_log.since(1)], [2, 3])
+        self.assertIsNone(await change_log.since(0))
+        self.assertIsNone(await change_log.since(4))
+        self.assertEqual(await change_log.since(3), [])
+
+    async def test_lost_redis_data_starts_a_new_epoch(self):
+        change_log = RedisChangeLog(size=8)
+        epoch, _ = await change_log.current()
+        await change_log.append([{'type': 'delete', 'data': {'id': 1}}])
+
+        await self.redis_client().flushall()
+
+        self.assertNotEqual(await change_log.current(), (epoch, 1))
+
+
+class RedisEnrolmentRegistryTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('App.enrolment.timeout_enrolment')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_scan_on_another_worker_binds_the_oldest_session(self):
+        opener, receiver = RedisEnrolmentRegistry(), RedisEnrolmentRegistry()
+        session = await opener.open(1, timeout=30)
+        await opener.open(2, timeout=30)
+
+        claimed = await receiver.claim_next()
+        self.assertIsInstance(claimed, RemoteSession)
+        self.assertEqual(claimed.card_id, 1)
+        claimed.finish(EnrolmentSession.BOUND, {'id': 1, 'rfid_card_id': 'ab12'})
+        finished = await asyncio.wait_for(session.wait(), 1)
+
+        self.assertEqual((finished.state, finished.card), (EnrolmentSession.BOUND, {'id': 1, 'rfid_card_id': 'ab12'}))
+        self.assertEqual((await receiver.claim_next()).card_id, 2)
+        await opener.cancel(2)
+
+    async def test_local_session_is_claimed_directly(self):
+        registry = RedisEnrolmentRegistry()
+        session = await registry.open(1, timeout=30)
+
+        self.assertIs(await registry.claim_next(), session)
+        await registry.requeue(session)  # e.g. the bind failed
+        self.assertIs(await registry.claim_next(), session)
+        session.finish(EnrolmentSession.BOUND)
+
+    async def test_cancelled_sessions_are_skipped(self):
+        opener, receiver = RedisEnrolmentRegistry(), RedisEnrolmentRegistry()
+        await opener.open(1, timeout=30)
+        await opener.open(2, timeout=30)
+
+        self.assertTrue(await opener.cancel(1))
+
+        self.assertEqual((await receiver.claim_next()).card_id, 2)
+        self.assertIsNone(await receiver.claim_next())
+        await opener.cancel(2)
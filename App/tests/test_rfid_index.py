@@ -0,0 +1,117 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from App.cache import card_cache
+from App.models import GymCard
+from App.rfid_index import rfid_index
+from App.tests.base import GymCardTestCase, make_card, post_json
+
+
+class RfidUniqueMigrationTests(TransactionTestCase):
+    """0008 clears tags that would break the unique constraint"""
+
+    before = [('App', '0007_gymcard_rfid_card_id')]
+    after = [('App', '0008_gymcard_rfid_card_id_unique')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_empty_and_duplicate_tags_become_null(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        OldGymCard = executor.loader.project_state(self.before).apps.get_model('App', 'GymCard')
+        expires = timezone.now() + timedelta(days=30)
+        for rfid in ('card_id', 'card_id', '', '', '1-2-3', None):
+            OldGymCard.objects.create(title='t', description='d', expiration_date=expires, rfid_card_id=rfid)
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.after)
+
+        NewGymCard = executor.loader.project_state(self.after).apps.get_model('App', 'GymCard')
+        self.assertEqual(
+            sorted(NewGymCard.objects.values_list('rfid_card_id', flat=True), key=str),
+            ['1-2-3', None, None, None, None, None]
+        )
+
+
+class ResolveRfidCardTests(GymCardTestCase):
+    url = '/api/resolve_rfid_card/'
+
+    def resolve(self, rfid_card_id):
+        return self.client.get(self.url, {'rfid_card_id': rfid_card_id})
+
+    def test_get_and_post(self):
+        card = make_card(rfid_card_id='1-2-3')
+
+        by_get = self.resolve('1-2-3')
+        by_post = post_json(self.client, self.url, {'rfid_card_id': '1-2-3'})
+
+        self.assertEqual(by_get.json()['card']['id'], card.id)
+        self.assertEqual(by_post.json(), by_get.json())
+
+    def test_repeated_tap_is_served_from_the_index(self):
+        make_card(rfid_card_id='1-2-3')
+        self.resolve('1-2-3')
+
+        with self.assertNumQueries(0):
+            response = self.resolve('1-2-3')
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_save_refreshes_the_entry(self):
+        card = make_card(rfid_card_id='1-2-3')
+        self.resolve('1-2-3')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            card.status = 'in'
+            card.rfid_card_id = '4-5-6'
+            card.save()
+
+        # The local write kept the index in step with the card version
+        with self.assertNumQueries(0):
+            self.assertEqual(self.resolve('4-5-6').json()['card']['Status'], 'in')
+        self.assertEqual(self.resolve('1-2-3').status_code, 404)
+
+    def test_delete_discards_the_entry(self):
+        card = make_card(rfid_card_id='1-2-3')
+        self.resolve('1-2-3')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            card.delete()
+
+        self.assertEqual(self.resolve('1-2-3').status_code, 404)
+
+    def test_version_moved_by_another_worker_drops_the_entries(self):
+        card = make_card(rfid_card_id='1-2-3')
+        self.resolve('1-2-3')
+
+        # A write in another process: the row and the shared version change,
+        # but this process's signals never run
+        GymCard.objects.filter(id=card.id).update(status='suspended')
+        card_cache.bump()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.resolve('1-2-3').json()['card']['Status'], 'suspended')
+
+    def test_sync_version_accepts_only_the_next_version(self):
+        make_card(rfid_card_id='1-2-3')
+        self.resolve('1-2-3')
+        version = card_cache.version()
+
+        rfid_index.sync_version(version + 1)
+        self.assertEqual(rfid_index._version, version + 1)
+        rfid_index.sync_version(version + 3)
+        self.assertIsNone(rfid_index._version)
+
+    def test_unknown_tag_and_bad_requests(self):
+        self.assertEqual(self.resolve('0-0-0').status_code, 404)
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        self.assertEqual(self.client.post(self.url, 'nope', content_type='application/json').status_code, 400)
+        self.assertEqual(self.client.put(self.url).status_code, 405)
@@ -0,0 +1,54 @@
+from django.utils import timezone
+
+from App.models import GymCard
+from App.search import Fts5SearchBackend, fts_available, get_search_backend
+from App.tests.base import GymCardTestCase, make_card, post_json
+
+
+class SearchTests(GymCardTestCase):
+    url = '/api/search_gym_card/'
+
+    def search(self, search_by, search_term, **params):
+        response = post_json(self.client, self.url, {'search_by': search_by, 'search_term': search_term, **params})
+        return response.status_code, sorted(card['Title'] for card in response.json().get('gym_cards', []))
+
+    def setUp(self):
+        super().setUp()
+        make_card(title='Anna Berg', description='Morning swimmer')
+        make_card(title='Bob Stone', description='Evening weights', priority=3)
+        make_card(title='Annabel Lee', description='Yoga "flow" classes', status='suspended')
+
+    def test_full_text_uses_the_fts_index(self):
+        if not fts_available():
+            self.skipTest('SQLite without FTS5')
+        self.assertIsInstance(get_search_backend(), Fts5SearchBackend)
+        self.assertEqual(self.search('text', 'swim'), (200, ['Anna Berg']))
+        # The last token matches as a prefix
+        self.assertEqual(self.search('text', 'ann'), (200, ['Anna Berg', 'Annabel Lee']))
+        # FTS syntax in user input is matched literally
+        self.assertEqual(self.search('text', '"flow" OR'), (200, []))
+        self.assertEqual(self.search('text', 'flow'), (200, ['Annabel Lee']))
+
+    def test_full_text_follows_edits(self):
+        if not fts_available():
+            self.skipTest('SQLite without FTS5')
+        card = GymCard.objects.get(title='Bob Stone')
+        card.description = 'Evening boxing'
+        card.save()
+
+        self.assertEqual(self.search('text', 'weights'), (200, []))
+        self.assertEqual(self.search('text', 'boxing'), (200, ['Bob Stone']))
+
+    def test_field_filters(self):
+        self.assertEqual(self.search('Title', 'anna', match='prefix'), (200, ['Anna Berg', 'Annabel Lee']))
+        self.assertEqual(self.search('Title', 'Anna Berg', match='exact'), (200, ['Anna Berg']))
+        self.assertEqual(self.search('Priority', '3'), (200, ['Bob Stone']))
+        self.assertEqual(self.search('Status', 'suspended'), (200, ['Annabel Lee']))
+        today = timezone.localdate().isoformat()
+        self.assertEqual(len(self.search('DateAdded', {'from': today, 'to': today})[1]), 3)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.search('Nope', 'x')[0], 400)
+        self.assertEqual(self.search('Priority', 'high')[0], 400)
+        self.assertEqual(self.search('Title', 'x', match='fuzzy')[0], 400)
+        self.assertEqual(self.search('DateAdded', 'not a date')[0], 400)
@@ -0,0 +1,127 @@
+from django.test import SimpleTestCase
+
+from App.broadcast import broadcast_update
+from App.subscriptions import CardFilter, subscriptions
+from App.tests.base import WebsocketTestCase, make_card, websocket_test
+
+
+class CardFilterTests(SimpleTestCase):
+    def test_reads_a_subscribe_message(self):
+        card_filter = CardFilter.from_message({
+            'type': 'subscribe', 'statuses': ['in'], 'priority': [1, 3], 'ids': [4, 5]
+        })
+
+        self.assertEqual(card_filter.statuses, {'in'})
+        self.assertEqual(card_filter.priority, (1, 3))
+        self.assertEqual(card_filter.ids, {4, 5})
+
+    def test_no_filters_is_empty(self):
+        self.assertTrue(CardFilter.from_message({'type': 'subscribe'}).empty)
+
+    def test_rejects_values_that_are_not_lists(self):
+        for message in ({'statuses': 'active'}, {'ids': 7}, {'ids': {'7': 1}}, {'priority': '13'}):
+            with self.subTest(message=message), self.assertRaises(ValueError):
+                CardFilter.from_message(message)
+
+    def test_rejects_wrong_element_types(self):
+        for message in ({'statuses': [1]}, {'ids': ['7']}, {'ids': [True]},
+                        {'priority': [1, 2.5]}, {'priority': [False, 3]}, {'priority': [1]}):
+            with self.subTest(message=message), self.assertRaises(ValueError):
+                CardFilter.from_message(message)
+
+    def test_equal_filters_share_a_group(self):
+        first = CardFilter(statuses=['in', 'active'], ids=[2, 1])
+        second = CardFilter(statuses=['active', 'in'], ids=[1, 2])
+
+        self.assertEqual(first.group_name(), second.group_name())
+
+
+class SubscribeTests(WebsocketTestCase):
+    def setUp(self):
+        super().setUp()
+        self.inside = make_card(title='Anna', status='in')
+        self.outside = make_card(title='Ben', status='active')
+
+    async def subscribe(self, socket, **filters):
+        await socket.send_json_to({'type': 'subscribe', **filters})
+        return await socket.receive_json_from(timeout=1)
+
+    async def change(self, action_type, data):
+        broadcast_update(action_type, data)
+        await self.flush()
+
+    @websocket_test
+    async def test_malformed_filter_is_answered_with_an_error(self):
+        socket = await self.connect()
+
+        reply = await self.subscribe(socket, statuses='active')
+
+        self.assertEqual(reply, {'type': 'error', 'message': 'statuses must be a list of strings'})
+        self.assertEqual(len(subscriptions), 0)
+
+    @websocket_test
+    async def test_snapshot_holds_only_matching_cards(self):
+        socket = await self.connect()
+
+        snapshot = await self.subscribe(socket, statuses=['in'])
+
+        self.assertEqual(snapshot['type'], 'snapshot')
+        self.assertEqual([card['id'] for card in snapshot['gym_cards']], [self.inside.id])
+
+    @websocket_test
+    async def test_changes_are_routed_by_filter(self):
+        everything, filtered = await self.connect(), await self.connect()
+        await self.subscribe(filtered, statuses=['in'])
+
+        await self.change('card_update', {'id': self.outside.id, 'Status': 'in'})
+        entered = await filtered.receive_json_from(timeout=1)
+        await self.change('card_update', {'id': self.inside.id, 'Status': 'active'})
+        left = await filtered.receive_json_from(timeout=1)
+
+        self.assertEqual([(change['type'], change['data']['id']) for change in entered['changes']],
+                         [('card_update', self.outside.id)])
+        self.assertEqual(left['changes'][0]['type'], 'delete')
+        self.assertEqual(left['changes'][0]['data'], {'id': self.inside.id})
+        self.assertEqual(left['prev_seq'], entered['seq'])
+        for _ in range(2):
+            frame = await everything.receive_json_from(timeout=1)
+            self.assertEqual(frame['changes'][0]['type'], 'card_update')
+
+    @websocket_test
+    async def test_deletes_only_reach_filters_holding_the_card(self):
+        filtered = await self.connect()
+        await self.subscribe(filtered, statuses=['in'])
+
+        await self.change('delete', {'id': self.outside.id})
+        await self.change('delete', {'id': self.inside.id})
+        frame = await filtered.receive_json_from(timeout=1)
+
+        self.assertEqual(frame['changes'], [{'seq': frame['seq'], 'type': 'delete', 'data': {'id': self.inside.id}}])
+
+    @websocket_test
+    async def test_delete_follows_a_card_that_left_the_filter(self):
+        # The card moved out before the delete: subscribers already dropped it
+        filtered = await self.connect()
+        await self.subscribe(filtered, statuses=['in'])
+
+        await self.change('card_update', {'id': self.inside.id, 'Status': 'active'})
+        left = await filtered.receive_json_from(timeout=1)
+        await self.change('delete', {'id': self.inside.id})
+        await self.change('card_update', {'id': self.outside.id, 'Status': 'in'})
+        frame = await filtered.receive_json_from(timeout=1)
+
+        self.assertEqual(left['changes'][0]['type'], 'delete')
+        self.assertEqual([change['type'] for change in frame['changes']], ['card_update'])
+
+    @websocket_test
+    async def test_empty_subscribe_returns_to_every_change(self):
+        socket = await self.connect()
+        await self.subscribe(socket, statuses=['in'])
+
+        snapshot = await self.subscribe(socket)
+        await self.change('card_update', {'id': self.outside.id, 'Status': 'active'})
+        frame = await socket.receive_json_from(timeout=1)
+
+        self.assertEqual(len(snapshot['gym_cards']), 2)
+        self.assertEqual(len(subscriptions), 0)
+        self.assertEqual(frame['changes'][0]['data']['id'], self.outside.id)
@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from App.tests.base import GymCardTestCase, make_card, post_json
+
+
+class TapRfidCardTests(GymCardTestCase):
+    url = '/api/tap_rfid_card/'
+
+    def test_default_priority_member_checks_in_and_out(self):
+        card = make_card(rfid_card_id='1-2-3', priority=0)
+
+        with self.settings(GYM_CARD_TAP_DEDUPE_WINDOW=0):
+            first = post_json(self.client, self.url, {'rfid_card_id': '1-2-3'})
+            second = post_json(self.client, self.url, {'rfid_card_id': '1-2-3'})
+
+        self.assertEqual(first.json()['action'], 'in')
+        self.assertEqual(second.json()['action'], 'active')
+        card.refresh_from_db()
+        self.assertEqual(card.status, 'active')
+
+    def test_admin_card_is_not_toggled(self):
+        card = make_card(rfid_card_id='9-9-9', priority=5, is_admin=True)
+
+        response = post_json(self.client, self.url, {'rfid_card_id': '9-9-9'})
+
+        self.assertEqual(response.json()['action'], 'admin')
+        self.assertTrue(response.json()['card']['IsAdmin'])
+        card.refresh_from_db()
+        self.assertEqual(card.status, 'active')
+
+    def test_expired_card_is_not_toggled(self):
+        make_card(rfid_card_id='4-4', expiration_date=timezone.now() - timedelta(days=1))
+
+        response = post_json(self.client, self.url, {'rfid_card_id': '4-4'})
+
+        self.assertEqual(response.json()['action'], 'expired')
+
+    def test_unknown_card(self):
+        response = post_json(self.client, self.url, {'rfid_card_id': 'nope'})
+
+        self.assertEqual(response.status_code, 404)
@@ -9,11 +9,19 @@ urlpatterns = [
     path('api/update_gym_card/', views.update_gym_card, name='update_gym_card'),
     path('api/sort_gym_card/', views.sort_gym_card, name='sort_gym_card'),
     path('api/search_gym_card/', views.search_gym_card, name='search_gym_card'),
+    path('api/resolve_rfid_card/', views.resolve_rfid_card, name='resolve_rfid_card'),
+    path('api/tap_rfid_card/', views.tap_rfid_card, name='tap_rfid_card'),
+    path('api/rfid_snapshot/', views.rfid_snapshot, name='rfid_snapshot'),
     path('api/get_gym_card/', views.get_gym_card, name='get_gym_card'),
+    path('api/cache_stats/', views.cache_stats, name='cache_stats'),
+    path('api/ws_stats/', views.ws_stats, name='ws_stats'),
+    path('api/occupancy/', views.get_occupancy, name='occupancy'),
+    path('api/checkin_report/', views.checkin_report, name='checkin_report'),
     path('api/get_gym_card_by_id/', views.get_gym_card_by_id, name='get_gym_card_by_id'),
     path('api/get_gym_card_by_status/', views.get_gym_card_by_status, name='get_gym_card_by_status'),
     path('api/get_gym_card_by_priority/', views.get_gym_card_by_priority, name='get_gym_card_by_priority'),
     path('api/get_gym_card_by_date/', views.get_gym_card_by_date, name='get_gym_card_by_date'),
     path('api/mark_card_expired/', views.mark_card_expired, name='mark_card_expired'),
+    path('api/set_admin_card/', views.set_admin_card, name='set_admin_card'),
     path('api/create_gym_card_with_page/', views.create_gym_card_with_page, name='create_gym_card_with_page'),
 ]
@@ -1,74 +1,51 @@
 from django.http import JsonResponse, HttpResponseRedirect, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
 from django.shortcuts import render
 import json
 import logging
-from django.db import connection
-from App.models import GymCard
+from django.db import connection, transaction
+from App.models import GymCard, CheckInHourly, CheckInDaily
+from App.rfid_index import rfid_index
+from App.broadcast import broadcast_update, change_log
+from App.search import get_search_backend, SearchError
+from App.pagination import paginate, parse_fields, parse_ordering, PaginationError
+from App.serializers import (
+    serialize_card, serialize_cards, dumps, CardJsonResponse, ALL_CARD_KEYS, SUMMARY_CARD_KEYS
+)
+from App.cache import card_cache, card_list_etag, request_key, json_bytes_response
+from App.enrolment import enrolment_registry
+from App.mqtt_service import mqtt_service
+from App.consumers import socket_stats
+from App.idempotency import responses, idempotency_keys, replayed_response, tap_window
+from App.checkins import INSIDE, checkin_log, write_checkouts
+from App import occupancy
 from django.utils import timezone
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-import paho.mqtt.client as mqtt
-from datetime import datetime
-import threading
-import time
-from django.core.cache import cache
-from django.views.decorators.cache import cache_page
+from datetime import datetime, timedelta
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
-def broadcast_update(action_type, data):
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
-        "gym_cards",
-        {
-            "type": "broadcast_update",
-            "data": json.dumps({
-                'type': action_type,
-                'card': data
-            })
-        }
-    )
+# Seconds an enrolment request waits for the MQTT subscriber to come up
+MQTT_CONNECT_WAIT = 5
 
-def verify_mqtt_connection():
-    """Helper function to verify MQTT broker is running"""
-    try:
-        # Create client with specific protocol version
-        client = mqtt.Client(client_id="test_connection", protocol=mqtt.MQTTv311)
-        client.loop_start()
-        
-        # Connect with timeout
-        result = client.connect("192.168.0.107", 1883, 60)
-        if result != 0:
-            logger.error(f"MQTT Connect failed with result code: {result}")
-            return False
-            
-        # Wait up to 3 seconds for connection
-        for _ in range(30):
-            if client.is_connected():
-                client.loop_stop()
-                client.disconnect()
-                return True
-            time.sleep(0.1)
-            
-        client.loop_stop()
-        client.disconnect()
-        return False
-    except Exception as e:
-        logger.error(f"MQTT Broker connection failed: {str(e)}")
-        return False
+# Row layout of the compact RFID table served to the door panels
+RFID_SNAPSHOT_FIELDS = ('rfid_card_id', 'id', 'status', 'priority', 'expiration_date', 'is_expired', 'is_admin')
 
 @csrf_exempt
+@condition(etag_func=card_list_etag)
 def get_gym_cards(request):
     """
-    Retrieves all gym cards from database
+    Retrieves one page of gym cards from database
     
     Args:
-        request: HTTP request object
+        request: HTTP request object with optional query parameters:
+            limit: page size (default 50, capped at 200)
+            cursor: next_cursor of the previous page
+            fields: comma separated card keys to return
         
     Returns:
-        JsonResponse: List of gym cards with their details
+        JsonResponse: Page of gym cards with their details
         {
             'gym_cards': [
                 {
@@ -83,36 +60,19 @@ def get_gym_cards(request):
                     'rfid_card_id': str
                 },
                 ...
-            ]
+            ],
+            'next_cursor': str or None
         }
+
+        Sends an ETag; requests with a matching If-None-Match get 304 Not Modified.
     """
     try:
-        gym_cards = GymCard.objects.all()
-        gym_cards_data = []
-
-        for card in gym_cards:
-            # Check if card is expired
-            if not card.is_expired:
-                now = timezone.now()
-                expiration = card.expiration_date
-                if now > expiration:
-                    card.status = False
-                    card.is_expired = True
-                    card.save()
-
-            gym_cards_data.append({
-                'id': card.id,
-                'Title': card.title,
-                'Description': card.description,
-                'DateAdded': card.date_added,
-                'ExpirationDate': card.expiration_date,
-                'Status': card.status,
-                'Priority': card.priority,
-                'IsExpired': card.is_expired,
-                'rfid_card_id': card.rfid_card_id
-            })
-
-        return JsonResponse({'gym_cards': gym_cards_data}, safe=False)
+        # Expiry is handled by App.expiry.expire_cards, this view only reads
+        body = card_cache.get_or_build(
+            request_key(request),
+            lambda: dumps(paginate(GymCard.objects.all(), request.GET))
+        )
+        return json_bytes_response(body)
 
     except Exception as e:
         return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
@@ -168,16 +128,7 @@ def create_gym_card(request):
                 )
 
                 # Prepare card data for broadcast
-                card_data = {
-                    'id': gym_card.id,
-                    'Title': gym_card.title,
-                    'Description': gym_card.description,
-                    'Status': gym_card.status,
-                    'DateAdded': gym_card.date_added.isoformat(),
-                    'ExpirationDate': gym_card.expiration_date,
-                    'Priority': gym_card.priority,
-                    'IsExpired': gym_card.is_expired
-                }
+                card_data = serialize_card(gym_card)
 
                 # Broadcast the creation
                 try:
@@ -185,7 +136,7 @@ def create_gym_card(request):
                 except Exception as e:
                     logger.error(f"Broadcast error: {e}")
 
-                return JsonResponse({
+                return CardJsonResponse({
                     'status': 'success',
                     'message': 'Gym card created successfully',
                     'card': card_data
@@ -217,38 +168,46 @@ def create_gym_card(request):
     }, status=405)
 
 @csrf_exempt
-def create_gym_card_with_page(request):
+async def create_gym_card_with_page(request):
     """
-    Creates a new gym card with RFID card association
+    Creates a new gym card and opens an enrolment session for its RFID card
+
+    The scanned tag arrives through the long-lived MQTT subscriber in
+    App.mqtt_service. Binding and timeout are announced over the gym_cards
+    WebSocket group ('card_update' / 'rfid_timeout'). With 'wait': true the
+    request instead stays open until the session ends; waiting costs no
+    thread, only an awaited Future.
+
+    Args:
+        request: HTTP POST request with JSON body containing:
+            {
+                'title': str,
+                'description': str,
+                'expiration_date': str,
+                'priority': int (optional),
+                'wait': bool (optional)
+            }
+
+    Returns:
+        JsonResponse:
+        Without wait: {'status': 'waiting_for_card', 'card_id': int, ...}
+        Bound: {'status': 'success', 'card': dict}
+        Timed out: {'status': 'timeout', 'card_id': int} (408)
     """
     if request.method == 'POST':
         logger.info("Starting gym card creation with RFID...")
         try:
-            # Try MQTT connection with retries
-            logger.info("Verifying MQTT connection...")
-            connected = False
-            for attempt in range(10):
-                logger.info(f"MQTT connection attempt {attempt + 1}/10")
-                if verify_mqtt_connection():
-                    connected = True
-                    logger.info("MQTT connection successful")
-                    break
-                logger.warning(f"MQTT connection attempt {attempt + 1} failed, retrying...")
-                time.sleep(1)
-                
-            if not connected:
-                logger.error("Failed to connect to MQTT broker after 10 attempts")
+            mqtt_service.ensure_running()
+            if not await mqtt_service.wait_until_connected(MQTT_CONNECT_WAIT):
+                logger.error("MQTT broker is not connected")
                 return JsonResponse({
                     'status': 'error',
-                    'message': 'Unable to connect to MQTT broker after 10 attempts. Please check if Mosquitto service is running.'
+                    'message': 'Unable to connect to MQTT broker. Please check if Mosquitto service is running.'
                 }, status=503)
 
-            logger.info("Parsing request data...")
             data = json.loads(request.body)
-            client = None
             
             # Validate required fields
-            logger.info("Validating required fields...")
             if not all([data.get('title'), data.get('description'), data.get('expiration_date')]):
                 logger.error("Missing required fields in request")
                 return JsonResponse({
@@ -256,9 +215,7 @@ def create_gym_card_with_page(request):
                     'message': 'Missing required fields'
                 }, status=400)
 
-            # Create the card first
-            logger.info("Creating gym card in database...")
-            gym_card = GymCard.objects.create(
+            gym_card = await GymCard.objects.acreate(
                 title=data['title'],
                 description=data['description'],
                 expiration_date=data['expiration_date'],
@@ -268,156 +225,40 @@ def create_gym_card_with_page(request):
             )
             logger.info(f"Gym card created with ID: {gym_card.id}")
 
-            def mqtt_handler():
-                nonlocal client
-                retry_count = 0
-                max_retries = 10
-                logger.info("Starting MQTT handler...")
-
-                while retry_count < max_retries:
-                    try:
-                        logger.info(f"Creating MQTT client (attempt {retry_count + 1}/{max_retries})")
-                        client = mqtt.Client(
-                            client_id=f"django_client_{timezone.now().timestamp()}", 
-                            protocol=mqtt.MQTTv311
-                        )
-                        
-                        def on_connect(client, userdata, flags, rc):
-                            logger.info(f"MQTT on_connect callback triggered with result code: {rc}")
-                            if rc != 0:
-                                logger.error(f"Failed to connect to MQTT broker with code: {rc}")
-                                raise Exception(f"MQTT connection failed with code {rc}")
-                            logger.info("Successfully connected to MQTT broker")
-                            client.subscribe("rfid/cards", qos=1)
-                            logger.info("Subscribed to rfid/cards topic with QoS 1")
-
-                        def on_disconnect(client, userdata, rc):
-                            if rc != 0:
-                                logger.error(f"Unexpected MQTT disconnection with code: {rc}")
-                            else:
-                                logger.info("MQTT client disconnected successfully")
-
-                        def on_message(client, userdata, msg):
-                            try:
-                                logger.info(f"Received MQTT message on topic {msg.topic}")
-                                logger.debug(f"Raw message payload: {msg.payload}")
-                                received_data = json.loads(msg.payload.decode())
-                                card_id = received_data.get('card_id')
-                                logger.info(f"Extracted card_id: {card_id}")
-                                
-                                if card_id:
-                                    logger.info(f"Processing RFID card: {card_id}")
-                                    try:
-                                        card = GymCard.objects.get(id=gym_card.id)
-                                        logger.info(f"Found gym card {card.id}")
-                                        card.rfid_card_id = card_id
-                                        card.save()
-                                        logger.info(f"Updated gym card {card.id} with RFID {card_id}")
-                                        
-                                        # Broadcast update
-                                        logger.info("Broadcasting card update...")
-                                        broadcast_update('card_update', {
-                                            'id': card.id,
-                                            'Title': card.title,
-                                            'rfid_card_id': card_id,
-                                            'Status': card.status
-                                        })
-                                        logger.info("Broadcast update sent successfully")
-                                        
-                                    except GymCard.DoesNotExist:
-                                        logger.error(f"Gym card {gym_card.id} not found")
-                                    except Exception as e:
-                                        logger.error(f"Error updating card: {str(e)}")
-                                    finally:
-                                        logger.info("Disconnecting MQTT client")
-                                        client.disconnect()
-                                else:
-                                    logger.error("No card_id in MQTT message")
-                                    
-                            except json.JSONDecodeError as e:
-                                logger.error(f"Failed to decode MQTT message: {str(e)}")
-                            except Exception as e:
-                                logger.error(f"MQTT message processing error: {str(e)}")
-                            finally:
-                                client.disconnect()
-                                # Invalidate cache after update
-                                cache.delete('all_gym_cards')
-                                cache.delete(f'gym_card_{gym_card.id}')
-
-                        # ...rest of mqtt_handler implementation...
-                        
-                        logger.info("Setting up MQTT callbacks...")
-                        client.on_connect = on_connect
-                        client.on_message = on_message
-                        client.on_disconnect = on_disconnect
-
-                        logger.info("Connecting to MQTT broker...")
-                        client.connect("192.168.0.107", 1883, 60)
-                        client.loop_start()
-                        logger.info("MQTT client loop started")
-                        
-                        # Run for maximum 30 seconds
-                        logger.info("Setting up 30-second timeout")
-                        def on_timeout():
-                            logger.info("MQTT timeout reached")
-                            try:
-                                client.disconnect()
-                                # Send timeout message through WebSocket
-                                channel_layer = get_channel_layer()
-                                async_to_sync(channel_layer.group_send)(
-                                    "gym_cards",
-                                    {
-                                        "type": "broadcast_update",
-                                        "data": json.dumps({
-                                            'type': 'rfid_timeout',
-                                            'card': {'id': gym_card.id}
-                                        })
-                                    }
-                                )
-                            except Exception as e:
-                                logger.error(f"Error in timeout handler: {e}")
-
-                        threading.Timer(30.0, on_timeout).start()
-                        
-                        # Keep the thread alive
-                        while client.is_connected():
-                            time.sleep(0.1)
-                        
-                        break
-                        
-                    except Exception as e:
-                        retry_count += 1
-                        logger.error(f"MQTT connection attempt {retry_count} failed: {str(e)}")
-                        if client:
-                            try:
-                                client.disconnect()
-                                logger.info("Disconnected failed MQTT client")
-                            except:
-                                pass
-                        if retry_count >= max_retries:
-                            logger.error("Max MQTT connection retries reached")
-                            gym_card.delete()
-                            logger.info(f"Deleted gym card {gym_card.id} due to MQTT connection failure")
-                            raise Exception("Max MQTT connection retries reached")
-                        time.sleep(1)
-
-            logger.info("Starting MQTT handler thread...")
-            thread = threading.Thread(target=mqtt_handler, daemon=True)
-            thread.start()
-            logger.info("MQTT handler thread started")
-            
+            timeout = settings.RFID_ENROLMENT_TIMEOUT
+            session = await mqtt_service.run(enrolment_registry.open(gym_card.id, timeout))
+
+            if data.get('wait'):
+                await mqtt_service.run(session.wait())
+                if session.state == session.BOUND:
+                    return JsonResponse({
+                        'status': 'success',
+                        'card': session.card
+                    })
+                return JsonResponse({
+                    'status': 'timeout',
+                    'card_id': gym_card.id,
+                    'message': 'No RFID card scanned'
+                }, status=408)
+
             return JsonResponse({
                 'status': 'waiting_for_card',
                 'card_id': gym_card.id,
                 'message': 'Listening for RFID card...',
-                'timeout': 30  # Add timeout value to response
+                'timeout': timeout
             })
             
+        except json.JSONDecodeError:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Invalid JSON'
+            }, status=400)
         except Exception as e:
             logger.error(f"Card creation error: {str(e)}", exc_info=True)
             if 'gym_card' in locals():
                 logger.info(f"Cleaning up gym card {gym_card.id}")
-                gym_card.delete()
+                await mqtt_service.run(enrolment_registry.cancel(gym_card.id))
+                await gym_card.adelete()
             return JsonResponse({
                 'status': 'error',
                 'message': str(e)
@@ -459,13 +300,14 @@ def delete_gym_card(request):
             
             if card_id:
                 try:
-                    gym_card = GymCard.objects.get(id=card_id)
-                    # Store card info before deletion
-                    card_info = {
-                        'id': gym_card.id,
-                        'Title': gym_card.title
-                    }
-                    gym_card.delete()
+                    with transaction.atomic():
+                        gym_card = GymCard.objects.select_for_update().get(id=card_id)
+                        # Store card info before deletion
+                        card_info = serialize_card(gym_card, ('id', 'Title'))
+                        if gym_card.status == INSIDE:
+                            write_checkouts([(gym_card.id, gym_card.rfid_card_id)])
+                        gym_card.delete()
+                        occupancy.transition(gym_card.status, None)
                     logger.info(f"Card {card_id} deleted successfully")
                     
                     # Send delete notification to all clients
@@ -474,20 +316,9 @@ def delete_gym_card(request):
                         'card': {'id': card_id}  # Consistent format with other messages
                     }
                     
-                    channel_layer = get_channel_layer()
-                    async_to_sync(channel_layer.group_send)(
-                        "gym_cards",
-                        {
-                            "type": "broadcast_update",
-                            "data": json.dumps(message)
-                        }
-                    )
+                    broadcast_update(message['type'], message['card'])
                     logger.info(f"Delete broadcast sent: {message}")
                     
-                    # Invalidate cache
-                    cache.delete('all_gym_cards')
-                    cache.delete(f'gym_card_{card_id}')
-                    
                     return JsonResponse({
                         'status': 'success',
                         'message': 'Gym card deleted',
@@ -527,13 +358,21 @@ def delete_gym_card(request):
 def update_gym_card(request):
     """
     Updates gym card status and priority
-    
+
+    Moving a card into or out of 'in' adjusts the occupancy counter in the
+    same transaction.
+
+    A request repeating an idempotency key (Idempotency-Key header or
+    idempotency_key field) gets the first response back without a
+    database access.
+
     Args:
         request: HTTP POST request with JSON body containing:
             {
                 'id': int,
                 'status': str,
-                'priority': int (optional)
+                'priority': int (optional),
+                'idempotency_key': str (optional)
             }
             
     Returns:
@@ -553,54 +392,42 @@ def update_gym_card(request):
             card_id = data.get('id')
             status = data.get('status')
 
+            keys = idempotency_keys(request, data, 'update')
+            cached = responses.get([key for key, _ in keys])
+            if cached is not None:
+                return replayed_response(*cached)
+
             if card_id and status is not None:
                 try:
-                    gym_card = GymCard.objects.get(id=card_id)
-                    # Set status and handle related fields
-                    if status == 'active':
-                        gym_card.status = status
-                        gym_card.is_expired = False  # Reset expired status
-                    elif status in ['expired', 'deactivated']:
-                        gym_card.status = status
-                        gym_card.is_expired = True
-                    else:
-                        gym_card.status = status
+                    with transaction.atomic():
+                        gym_card = GymCard.objects.select_for_update().get(id=card_id)
+                        previous_status = gym_card.status
+                        # Set status and handle related fields
+                        if status == 'active':
+                            gym_card.status = status
+                            gym_card.is_expired = False  # Reset expired status
+                        elif status in ['expired', 'deactivated']:
+                            gym_card.status = status
+                            gym_card.is_expired = True
+                        else:
+                            gym_card.status = status
+
+                        if 'priority' in data:
+                            gym_card.priority = data['priority']
 
-                    if 'priority' in data:
-                        gym_card.priority = data['priority']
-                        
-                    gym_card.save()
+                        gym_card.save()
+                        occupancy.transition(previous_status, status)
+                    checkin_log.record(gym_card, previous_status, status, data.get('reader_id'))
                     
                     # Broadcast the update
-                    channel_layer = get_channel_layer()
-                    async_to_sync(channel_layer.group_send)(
-                        "gym_cards",
-                        {
-                            "type": "broadcast_update",
-                            "data": json.dumps({
-                                'type': 'card_update',
-                                'card': {
-                                    'id': gym_card.id,
-                                    'Title': gym_card.title,
-                                    'Description': gym_card.description,
-                                    'Status': gym_card.status,
-                                    'DateAdded': gym_card.date_added.isoformat(),
-                                    'ExpirationDate': gym_card.expiration_date.isoformat(),
-                                    'Priority': gym_card.priority,
-                                    'IsExpired': gym_card.is_expired
-                                }
-                            })
-                        }
-                    )
-                    
-                    # Invalidate cache after update
-                    cache.delete('all_gym_cards')
-                    cache.delete(f'gym_card_{card_id}')
-                    
-                    return JsonResponse({
+                    broadcast_update('card_update', serialize_card(gym_card))
+
+                    response = JsonResponse({
                         'status': 'success',
                         'message': f'Gym card {status}'
                     })
+                    responses.put(keys, response.status_code, response.content)
+                    return response
                 except GymCard.DoesNotExist:
                     return JsonResponse({
                         'status': 'error',
@@ -623,40 +450,54 @@ def update_gym_card(request):
 
 @csrf_exempt
 def sort_gym_card(request):
+    """
+    Returns a page of gym cards sorted by the database
+
+    Args:
+        request: HTTP POST request with JSON body containing:
+            {
+                'sort_by': str | [str],  # 'date', 'status', 'priority'; '-' prefix
+                                         # for descending, e.g. 'status,-priority'
+                'limit': int (optional),
+                'cursor': str (optional),
+                'fields': str | [str] (optional)
+            }
+    """
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
-            sort_by = data.get('sort_by')
-            gym_cards = GymCard.objects.all()
-            gym_cards_data = []
-
-            for card in gym_cards:
-                gym_cards_data.append({
-                    'id': card.id,
-                    'Title': card.title,
-                    'Description': card.description,
-                    'DateAdded': card.date_added,
-                    'ExpirationDate': card.expiration_date,
-                    'Status': card.status,
-                    'Priority': card.priority,
-                })
-
-            if sort_by == 'date':
-                gym_cards_data = sorted(gym_cards_data, key=lambda x: x['DateAdded'])
-            elif sort_by == 'status':
-                gym_cards_data = sorted(gym_cards_data, key=lambda x: x['Status'])
-            elif sort_by == 'priority':
-                gym_cards_data = sorted(gym_cards_data, key=lambda x: x['Priority'])
-            else:
-                return JsonResponse({'status': 'error', 'message': 'Invalid sort_by parameter'}, status=400)
-
-            return JsonResponse({'gym_cards': gym_cards_data}, safe=False)
+            ordering = parse_ordering(data.get('sort_by'))
+            body = card_cache.get_or_build(
+                request_key(request),
+                lambda: dumps(paginate(GymCard.objects.all(), data, ordering, SUMMARY_CARD_KEYS))
+            )
+            return json_bytes_response(body)
+        except PaginationError as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
         except json.JSONDecodeError:
             return JsonResponse({'status': 'error', 'message': 'Invalid JSON'}, status=400)
     return JsonResponse({'status': 'error', 'message': 'Invalid request method'}, status=400)
 
 @csrf_exempt
 def search_gym_card(request):
+    """
+    Searches gym cards with filters evaluated by the database
+
+    Args:
+        request: HTTP POST request with JSON body containing:
+            {
+                'search_by': str,  # card key (e.g. 'Title', 'Status') or 'text'
+                'search_term': str | {'from': str, 'to': str},
+                'match': str (optional),  # 'contains', 'prefix' or 'exact'
+                'fields': str | [str] (optional)
+            }
+
+    Returns:
+        JsonResponse: Matching gym cards
+        {
+            'gym_cards': [{card_details}, ...]
+        }
+    """
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
@@ -669,29 +510,18 @@ def search_gym_card(request):
                     'message': 'search_by and search_term are required'
                 }, status=400)
 
-            gym_cards = GymCard.objects.all()
-            gym_cards_data = []
-
-            for card in gym_cards:
-                card_data = {
-                    'id': card.id,
-                    'Title': card.title,
-                    'rfid_card_id': card.rfid_card_id,
-                    'Description': card.description,
-                    'DateAdded': card.date_added,
-                    'ExpirationDate': card.expiration_date,
-                    'Status': card.status,
-                    'Priority': card.priority,
-                }
-                gym_cards_data.append(card_data)
-
-            search_results = []
-            for card in gym_cards_data:
-                if search_by in card and card[search_by]:  # Check if field exists and has value
-                    if str(card[search_by]).lower().find(str(search_term).lower()) != -1:
-                        search_results.append(card)
-
-            return JsonResponse({'gym_cards': search_results}, safe=False)
+            try:
+                keys = parse_fields(data.get('fields'), ALL_CARD_KEYS)
+                gym_cards = get_search_backend().search(
+                    GymCard.objects.all(), search_by, search_term, data.get('match')
+                )
+            except (SearchError, PaginationError) as e:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': str(e)
+                }, status=400)
+
+            return CardJsonResponse({'gym_cards': serialize_cards(gym_cards, keys)})
             
         except json.JSONDecodeError:
             return JsonResponse({
@@ -705,84 +535,385 @@ def search_gym_card(request):
     }, status=400)
 
 @csrf_exempt
-@cache_page(5)  # Cache for 5 seconds
+def resolve_rfid_card(request):
+    """
+    Resolves an RFID tag to its gym card with an exact, indexed match
+
+    Args:
+        request: HTTP GET with ?rfid_card_id=... or POST with JSON body containing:
+            {
+                'rfid_card_id': str
+            }
+
+    Returns:
+        JsonResponse: Card bound to the tag or error message
+        Success: {
+            'status': 'success',
+            'card': {card_details}
+        }
+        Error: {
+            'status': 'error',
+            'message': str
+        }
+    """
+    if request.method in ('GET', 'POST'):
+        try:
+            if request.method == 'POST':
+                rfid_card_id = json.loads(request.body).get('rfid_card_id')
+            else:
+                rfid_card_id = request.GET.get('rfid_card_id')
+
+            if not rfid_card_id:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'rfid_card_id is required'
+                }, status=400)
+
+            card_data = rfid_index.resolve(str(rfid_card_id))
+            if card_data is None:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Gym card not found'
+                }, status=404)
+
+            return CardJsonResponse({
+                'status': 'success',
+                'card': card_data
+            })
+        except json.JSONDecodeError:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Invalid JSON'
+            }, status=400)
+
+    return JsonResponse({
+        'status': 'error',
+        'message': 'Invalid request method'
+    }, status=405)
+
+@csrf_exempt
+def tap_rfid_card(request):
+    """
+    Check-in/check-out of a tapped RFID card in one request
+
+    Resolves the tag and toggles the card between 'active' and 'in' in a
+    single transaction, so a door panel needs one round-trip per tap and
+    concurrent taps of the same card cannot both read the old status.
+    Admin cards (is_admin) and expired cards are returned unchanged.
+
+    Repeats get the first response back without a database access: taps
+    with the same idempotency key (Idempotency-Key header, idempotency_key,
+    read_id or reader_id + read_at), and taps of the same card within
+    GYM_CARD_TAP_DEDUPE_WINDOW seconds.
+
+    Args:
+        request: HTTP POST request with JSON body containing:
+            {
+                'rfid_card_id': str,
+                'reader_id': str (optional),
+                'read_at': str (optional),
+                'read_id': str (optional),
+                'idempotency_key': str (optional)
+            }
+
+    Returns:
+        JsonResponse: Outcome of the tap and the card after it
+        Success: {
+            'status': 'success',
+            'action': str,  # 'in', 'active', 'admin' or 'expired'
+            'card': {card_details}
+        }
+        Error: {
+            'status': 'error',
+            'message': str
+        }
+    """
+    if request.method != 'POST':
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Invalid request method'
+        }, status=405)
+
+    try:
+        data = json.loads(request.body)
+        rfid_card_id = data.get('rfid_card_id')
+    except (json.JSONDecodeError, AttributeError):
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Invalid JSON'
+        }, status=400)
+
+    if not rfid_card_id:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'rfid_card_id is required'
+        }, status=400)
+
+    keys = idempotency_keys(request, data, 'tap') + [(f'tap:card:{rfid_card_id}', tap_window())]
+    cached = responses.get([key for key, _ in keys])
+    if cached is not None:
+        return replayed_response(*cached)
+
+    with transaction.atomic():
+        gym_card = GymCard.objects.select_for_update().filter(rfid_card_id=str(rfid_card_id)).first()
+        if gym_card is None:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Gym card not found'
+            }, status=404)
+        previous_status = gym_card.status
+
+        if gym_card.is_admin:
+            action = 'admin'
+        elif gym_card.is_expired or gym_card.status == 'expired' or gym_card.expiration_date < timezone.now():
+            action = 'expired'
+        else:
+            action = 'in' if gym_card.status == 'active' else 'active'
+            gym_card.status = action
+            gym_card.save(update_fields=['status'])
+            occupancy.transition(previous_status, action)
+
+    card_data = serialize_card(gym_card)
+    if action in ('in', 'active'):
+        checkin_log.record(gym_card, previous_status, action, data.get('reader_id'))
+        broadcast_update('card_update', card_data)
+    response = CardJsonResponse({
+        'status': 'success',
+        'action': action,
+        'card': card_data
+    })
+    responses.put(keys, response.status_code, response.content)
+    return response
+
+async def rfid_snapshot(request):
+    """
+    Compact RFID table for the door panels' local card store, refreshed
+    incrementally from the WebSocket change log
+
+    Args:
+        request: HTTP GET request with optional query parameters:
+            epoch: str  # from the previous response
+            seq: int  # from the previous response
+
+    Returns:
+        JsonResponse: Cards changed since seq, or every card when the panel
+        has no state or its seq is no longer in the change log
+        Success: {
+            'status': 'success',
+            'epoch': str,
+            'seq': int,
+            'full': bool,  # replace the whole table
+            'ids': [int],  # cards whose rows are replaced (incremental only)
+            'cards': [[rfid_card_id, id, status, priority, expiration_date, is_expired, is_admin]]
+        }
+        Error: {
+            'status': 'error',
+            'message': str
+        }
+    """
+    if request.method != 'GET':
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Invalid request method'
+        }, status=405)
+
+    try:
+        since = int(request.GET['seq']) if 'seq' in request.GET else None
+    except ValueError:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'seq must be an integer'
+        }, status=400)
+
+    # Read seq before the rows, so changes racing with the query are sent again
+    epoch, seq = await change_log.current()
+    changes = None
+    if since is not None and request.GET.get('epoch') == epoch:
+        changes = await change_log.since(since)
+
+    queryset = GymCard.objects.filter(rfid_card_id__isnull=False)
+    ids = []
+    if changes is not None:
+        for change in changes:
+            data = change['data']
+            ids.extend(data['ids'] if change['type'] == 'cards_expired' else [data.get('id')])
+        ids = sorted({card_id for card_id in ids if card_id is not None})
+        queryset = queryset.filter(id__in=ids)
+
+    cards = [row async for row in queryset.values_list(*RFID_SNAPSHOT_FIELDS)] if changes != [] else []
+    return CardJsonResponse({
+        'status': 'success',
+        'epoch': epoch,
+        'seq': seq,
+        'full': changes is None,
+        'ids': ids,
+        'cards': cards
+    })
+
+@csrf_exempt
+@condition(etag_func=card_list_etag)
 def get_gym_card(request):
     """
     Get gym card(s) from database with caching
     
     Methods:
-        GET: Returns all cards or specific card if ID provided in query params
-        POST: Returns specific card by ID in request body
+        GET: Returns a page of cards or specific card if ID provided in query params;
+             accepts limit, cursor and fields query params
+
+    Responses are cached until the next card write, see App.cache.CardCache,
+    and carry an ETag so unchanged lists are answered with 304 Not Modified.
     """
     if request.method == 'GET':
         try:
             card_id = request.GET.get('id')
-            cache_key = f'gym_card_{card_id}' if card_id else 'all_gym_cards'
-            
-            # Try to get data from cache first
-            cached_data = cache.get(cache_key)
-            if cached_data:
-                logger.debug(f"Returning cached data for key: {cache_key}")
-                return JsonResponse(cached_data, safe=False)
-            
             if card_id:
-                try:
-                    gym_card = GymCard.objects.get(id=card_id)
-                    data = {
-                        'id': gym_card.id,
-                        'Title': gym_card.title,
-                        'Description': gym_card.description,
-                        'DateAdded': gym_card.date_added,
-                        'ExpirationDate': gym_card.expiration_date,
-                        'Status': gym_card.status,
-                        'Priority': gym_card.priority,
-                        'rfid_card_id': gym_card.rfid_card_id,
-                        'IsExpired': gym_card.is_expired
-                    }
-                    # Cache for 5 seconds
-                    cache.set(cache_key, data, 5)
-                    return JsonResponse(data)
-                except GymCard.DoesNotExist:
+                keys = parse_fields(request.GET.get('fields'), ALL_CARD_KEYS)
+
+                def build_card():
+                    cards = serialize_cards(GymCard.objects.filter(id=card_id), keys)
+                    return dumps(cards[0]) if cards else None
+
+                body = card_cache.get_or_build(request_key(request), build_card)
+                if body is None:
                     return JsonResponse({
                         'status': 'error',
                         'message': 'Gym card not found'
                     }, status=404)
             else:
-                gym_cards = GymCard.objects.all()
-                data = {
-                    'gym_cards': [{
-                        'id': card.id,
-                        'Title': card.title,
-                        'Description': card.description,
-                        'DateAdded': card.date_added,
-                        'ExpirationDate': card.expiration_date,
-                        'Status': card.status,
-                        'Priority': card.priority,
-                        'rfid_card_id': card.rfid_card_id,
-                        'IsExpired': card.is_expired
-                    } for card in gym_cards]
-                }
-                # Cache for 5 seconds
-                cache.set(cache_key, data, 5)
-                return JsonResponse(data, safe=False)
+                body = card_cache.get_or_build(
+                    request_key(request),
+                    lambda: dumps(paginate(GymCard.objects.all(), request.GET))
+                )
+            return json_bytes_response(body)
                 
+        except PaginationError as e:
+            return JsonResponse({
+                'status': 'error',
+                'message': str(e)
+            }, status=400)
         except Exception as e:
             logger.error(f"Error in get_gym_card GET: {str(e)}")
             return JsonResponse({
                 'status': 'error',
                 'message': str(e)
             }, status=500)
-        except json.JSONDecodeError:
-            return JsonResponse({
-                'status': 'error',
-                'message': 'Invalid JSON'
-            }, status=400)
     
     return JsonResponse({
         'status': 'error',
         'message': 'Method not allowed'
     }, status=405)
 
+@csrf_exempt
+def cache_stats(request):
+    """
+    Reports card cache counters for monitoring
+
+    Returns:
+        JsonResponse: {
+            'version': int,  # current card-set version
+            'hits': int,
+            'misses': int,
+            'hit_ratio': float or None
+        }
+    """
+    return JsonResponse(card_cache.stats())
+
+def ws_stats(request):
+    """
+    Reports WebSocket counters and outbound queue depth per socket
+
+    Returns:
+        JsonResponse: {
+            'counters': dict,  # connected, sent, overflows, evicted, ...
+            'queues': {channel_name: int}
+        }
+    """
+    return JsonResponse({
+        'counters': socket_stats.snapshot(),
+        'queues': socket_stats.queue_depths()
+    })
+
+def get_occupancy(request):
+    """
+    Number of members currently inside (cards with status 'in')
+
+    Reads one counter row kept up to date by every status change, instead
+    of listing the cards.
+
+    Returns:
+        JsonResponse: {
+            'status': 'success',
+            'count': int
+        }
+    """
+    return JsonResponse({
+        'status': 'success',
+        'count': occupancy.current()
+    })
+
+def checkin_report(request):
+    """
+    Attendance per hour or per day, read from the check-in rollups
+
+    Covers events folded in by the last rollup_checkins run.
+
+    Args:
+        request: HTTP GET request with query parameters:
+            from: str, first day (YYYY-MM-DD, default: 7 days ago)
+            to: str, last day (YYYY-MM-DD, default: today)
+            by: str, 'day' (default) or 'hour'
+
+    Returns:
+        JsonResponse: {
+            'status': 'success',
+            'rows': [{'hour' or 'day': str, 'check_ins': int, 'check_outs': int}],
+            'check_ins': int,
+            'check_outs': int,
+            'peak_hour': {'hour': str, 'check_ins': int} or None  # None without check-ins
+        }
+    """
+    if request.method != 'GET':
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Method not allowed'
+        }, status=405)
+
+    today = timezone.localdate()
+    try:
+        first = datetime.strptime(request.GET['from'], '%Y-%m-%d').date() if 'from' in request.GET \
+            else today - timedelta(days=7)
+        last = datetime.strptime(request.GET['to'], '%Y-%m-%d').date() if 'to' in request.GET else today
+    except ValueError:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'from and to must be YYYY-MM-DD'
+        }, status=400)
+    by = request.GET.get('by', 'day')
+    if by not in ('day', 'hour'):
+        return JsonResponse({
+            'status': 'error',
+            'message': "by must be 'day' or 'hour'"
+        }, status=400)
+
+    start = timezone.make_aware(datetime.combine(first, datetime.min.time()))
+    end = timezone.make_aware(datetime.combine(last + timedelta(days=1), datetime.min.time()))
+    hours = CheckInHourly.objects.filter(hour__gte=start, hour__lt=end)
+    if by == 'hour':
+        rows = hours.order_by('hour').values('hour', 'check_ins', 'check_outs')
+    else:
+        rows = CheckInDaily.objects.filter(day__gte=first, day__lte=last).order_by('day') \
+            .values('day', 'check_ins', 'check_outs')
+    rows = [{**row, by: row[by].isoformat()} for row in rows]
+    peak = hours.filter(check_ins__gt=0).order_by('-check_ins', 'hour').values('hour', 'check_ins').first()
+
+    return JsonResponse({
+        'status': 'success',
+        'rows': rows,
+        'check_ins': sum(row['check_ins'] for row in rows),
+        'check_outs': sum(row['check_outs'] for row in rows),
+        'peak_hour': {'hour': peak['hour'].isoformat(), 'check_ins': peak['check_ins']} if peak else None
+    })
+
 @csrf_exempt
 def get_gym_card_by_id(request):
     if request.method == 'POST':
@@ -790,21 +921,14 @@ def get_gym_card_by_id(request):
             data = json.loads(request.body)
             card_id = data.get('id')
             if card_id:
-                gym_card = GymCard.objects.get(id=card_id)
-                return JsonResponse({
-                    'id': gym_card.id,
-                    'Title': gym_card.title,
-                    'Description': gym_card.description,
-                    'DateAdded': gym_card.date_added,
-                    'ExpirationDate': gym_card.expiration_date,
-                    'Status': gym_card.status,
-                    'Priority': gym_card.priority,
-                })
-            return JsonResponse({'status': 'error', 'message': 'Gym card not found'}, status=404)
-        except GymCard.DoesNotExist:
+                cards = serialize_cards(GymCard.objects.filter(id=card_id), SUMMARY_CARD_KEYS)
+                if cards:
+                    return CardJsonResponse(cards[0])
             return JsonResponse({'status': 'error', 'message': 'Gym card not found'}, status=404)
         except json.JSONDecodeError:
             return JsonResponse({'status': 'error', 'message': 'Invalid JSON'}, status=400)
+        except (ValueError, TypeError):
+            return JsonResponse({'status': 'error', 'message': 'Gym card not found'}, status=404)
     return JsonResponse({'status': 'error', 'message': 'Invalid request method'}, status=400)
 
 @csrf_exempt
@@ -814,20 +938,13 @@ def get_gym_card_by_status(request):
             data = json.loads(request.body)
             status = data.get('status')
             gym_cards = GymCard.objects.filter(status=status)
-            gym_cards_data = []
-
-            for card in gym_cards:
-                gym_cards_data.append({
-                    'id': card.id,
-                    'Title': card.title,
-                    'Description': card.description,
-                    'DateAdded': card.date_added,
-                    'ExpirationDate': card.expiration_date,
-                    'Status': card.status,
-                    'Priority': card.priority,
-                })
-
-            return JsonResponse({'gym_cards': gym_cards_data}, safe=False)
+            body = card_cache.get_or_build(
+                request_key(request),
+                lambda: dumps(paginate(gym_cards, data, default_keys=SUMMARY_CARD_KEYS))
+            )
+            return json_bytes_response(body)
+        except PaginationError as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
         except json.JSONDecodeError:
             return JsonResponse({'status': 'error', 'message': 'Invalid JSON'}, status=400)
     return JsonResponse({'status': 'error', 'message': 'Invalid request method'}, status=400)
@@ -839,20 +956,13 @@ def get_gym_card_by_priority(request):
             data = json.loads(request.body)
             priority = data.get('priority')
             gym_cards = GymCard.objects.filter(priority=priority)
-            gym_cards_data = []
-
-            for card in gym_cards:
-                gym_cards_data.append({
-                    'id': card.id,
-                    'Title': card.title,
-                    'Description': card.description,
-                    'DateAdded': card.date_added,
-                    'ExpirationDate': card.expiration_date,
-                    'Status': card.status,
-                    'Priority': card.priority,
-                })
-
-            return JsonResponse({'gym_cards': gym_cards_data}, safe=False)
+            body = card_cache.get_or_build(
+                request_key(request),
+                lambda: dumps(paginate(gym_cards, data, default_keys=SUMMARY_CARD_KEYS))
+            )
+            return json_bytes_response(body)
+        except PaginationError as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
         except json.JSONDecodeError:
             return JsonResponse({'status': 'error', 'message': 'Invalid JSON'}, status=400)
     return JsonResponse({'status': 'error', 'message': 'Invalid request method'}, status=400)
@@ -864,20 +974,13 @@ def get_gym_card_by_date(request):
             data = json.loads(request.body)
             date = data.get('date')
             gym_cards = GymCard.objects.filter(date_added=date)
-            gym_cards_data = []
-
-            for card in gym_cards:
-                gym_cards_data.append({
-                    'id': card.id,
-                    'Title': card.title,
-                    'Description': card.description,
-                    'DateAdded': card.date_added,
-                    'ExpirationDate': card.expiration_date,
-                    'Status': card.status,
-                    'Priority': card.priority,
-                })
-
-            return JsonResponse({'gym_cards': gym_cards_data}, safe=False)
+            body = card_cache.get_or_build(
+                request_key(request),
+                lambda: dumps(paginate(gym_cards, data, default_keys=SUMMARY_CARD_KEYS))
+            )
+            return json_bytes_response(body)
+        except PaginationError as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
         except json.JSONDecodeError:
             return JsonResponse({'status': 'error', 'message': 'Invalid JSON'}, status=400)
     return JsonResponse({'status': 'error', 'message': 'Invalid request method'}, status=400)
@@ -886,7 +989,10 @@ def get_gym_card_by_date(request):
 def mark_card_expired(request):
     """
     Marks a gym card as expired
-    
+
+    The card is broadcast once the transaction commits, which also records
+    it in the change log the door panels sync from.
+
     Args:
         request: HTTP POST request with JSON body containing:
             {
@@ -911,10 +1017,17 @@ def mark_card_expired(request):
             
             if card_id:
                 try:
-                    gym_card = GymCard.objects.get(id=card_id)
-                    gym_card.status = False
-                    gym_card.is_expired = True
-                    gym_card.save()
+                    with transaction.atomic():
+                        gym_card = GymCard.objects.select_for_update().get(id=card_id)
+                        previous_status = gym_card.status
+                        gym_card.status = False
+                        gym_card.is_expired = True
+                        gym_card.save()
+                        occupancy.transition(previous_status, gym_card.status)
+                        if previous_status == INSIDE:
+                            write_checkouts([(gym_card.id, gym_card.rfid_card_id)])
+                        card_data = serialize_card(gym_card)
+                        transaction.on_commit(lambda: broadcast_update('card_update', card_data))
                     return JsonResponse({
                         'status': 'success',
                         'message': 'Card marked as expired'
@@ -939,5 +1052,69 @@ def mark_card_expired(request):
         'message': 'Invalid request method'
     }, status=405)
 
+@csrf_exempt
+def set_admin_card(request):
+    """
+    Makes a gym card open the admin panel at the door panels, or revokes it
+
+    The card_update broadcast enters the change log, so door panels fetch
+    the changed row with their next incremental rfid_snapshot.
+
+    Args:
+        request: HTTP POST request with JSON body containing:
+            {
+                'id': int,
+                'is_admin': bool
+            }
+
+    Returns:
+        JsonResponse: Updated card or error message
+        Success: {
+            'status': 'success',
+            'gym_card': dict
+        }
+        Error: {
+            'status': 'error',
+            'message': str
+        }
+    """
+    if request.method != 'POST':
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Invalid request method'
+        }, status=405)
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Invalid JSON'
+        }, status=400)
+
+    card_id = data.get('id')
+    is_admin = data.get('is_admin')
+    if not card_id or not isinstance(is_admin, bool):
+        return JsonResponse({
+            'status': 'error',
+            'message': 'id and a boolean is_admin are required'
+        }, status=400)
+    try:
+        with transaction.atomic():
+            gym_card = GymCard.objects.select_for_update().get(id=card_id)
+            gym_card.is_admin = is_admin
+            gym_card.save(update_fields=['is_admin'])
+    except GymCard.DoesNotExist:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Card not found'
+        }, status=404)
+
+    card_data = serialize_card(gym_card)
+    broadcast_update('card_update', card_data)
+    return CardJsonResponse({
+        'status': 'success',
+        'gym_card': card_data
+    })
+
 def index(request):
     return render(request, 'index.html')
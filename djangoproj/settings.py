@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -59,6 +60,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'App.middleware.BackgroundJobsMiddleware',
 ]
 
 ROOT_URLCONF = 'djangoproj.urls'
@@ -189,6 +191,10 @@ LOGGING = {
     },
 }
 
+# Test runs (manage.py test) keep their log lines out of django.log
+if sys.argv[1:2] == ['test']:
+    LOGGING['handlers']['file'] = {'class': 'logging.NullHandler'}
+
 # Update CORS settings
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
@@ -215,8 +221,11 @@ CORS_ALLOW_HEADERS = [
     'content-type',
     'x-requested-with',
     'Authorization',
-    'Set-Cookie'
+    'Set-Cookie',
+    'If-None-Match'
 ]
+# Let the dashboard read ETags for conditional card list requests
+CORS_EXPOSE_HEADERS = ['ETag']
 CSRF_USE_SESSIONS = False
 
 CSRF_COOKIE_AGE = 8 * 3600
@@ -237,4 +246,66 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'unique-gym-cards',
     }
-}
\ No newline at end of file
+}
+
+# Backend used by search_gym_card; App.search.OrmSearchBackend skips the
+# SQLite FTS5 full-text index
+GYM_CARD_SEARCH_BACKEND = 'App.search.Fts5SearchBackend'
+
+# Seconds between runs of the background card expirer (App.expiry)
+GYM_CARD_EXPIRY_INTERVAL = 60
+
+# Run the scheduled jobs (card expiry, check-in rollups, occupancy recount)
+# inside the server process. They start with the ASGI lifespan, or on the
+# first request under servers without one (runserver, daphne). Set to
+# False to run them from cron with the management commands instead
+# (expire_cards, rollup_checkins, reconcile_occupancy); that needs the
+# shared Redis backends of settings_production.py, since changes made by
+# another process never reach this one's local memory cache and in-memory
+# channel layer. Check App.E001 refuses to start otherwise.
+GYM_CARD_RUN_JOBS = True
+
+# Lifetime of cached card responses; entries are invalidated by version
+# bumps on every card write, the timeout only reclaims superseded versions
+GYM_CARD_CACHE_TIMEOUT = 24 * 3600
+
+# Seconds card changes are coalesced before one 'cards_changed' WebSocket
+# frame is sent (App.broadcast)
+GYM_CARD_BROADCAST_WINDOW = 0.05
+
+# Card changes kept for WebSocket clients resuming with sync_since
+GYM_CARD_SYNC_BUFFER = 1024
+
+# Per-socket outbound frame limit and send timeout before a slow WebSocket
+# client is coalesced and evicted (App.consumers)
+GYM_CARD_WS_QUEUE_LIMIT = 64
+GYM_CARD_WS_SEND_TIMEOUT = 10
+
+# Replayed write requests (App.idempotency): lifetime of idempotency keys,
+# seconds repeated taps of one card are answered from the first response
+# (0 disables), and the bound of the in-process response LRU
+GYM_CARD_IDEMPOTENCY_TTL = 3600
+GYM_CARD_TAP_DEDUPE_WINDOW = 5
+GYM_CARD_IDEMPOTENCY_SIZE = 4096
+
+# Check-in events (App.checkins): events buffered before one bulk INSERT,
+# seconds an event may wait in the buffer, and seconds between runs of the
+# hourly/daily rollup job
+GYM_CARD_CHECKIN_BATCH = 50
+GYM_CARD_CHECKIN_FLUSH_INTERVAL = 2
+GYM_CARD_ROLLUP_INTERVAL = 60
+
+# Seconds between recounts of the occupancy counter (App.occupancy)
+GYM_CARD_OCCUPANCY_RECONCILE_INTERVAL = 300
+
+# Redis used by the shared (multi-worker) backends of
+# djangoproj/settings_production.py
+GYM_CARD_REDIS_URL = os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/0')
+
+# MQTT broker the RFID readers publish scanned cards to
+MQTT_BROKER_HOST = '192.168.0.107'
+MQTT_BROKER_PORT = 1883
+MQTT_CARD_TOPIC = 'rfid/cards'
+
+# Seconds a new card waits for its RFID card to be scanned
+RFID_ENROLMENT_TIMEOUT = 30
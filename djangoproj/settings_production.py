@@ -0,0 +1,38 @@
+"""
+Settings for running several ASGI workers behind one load balancer
+
+Every piece of state the workers must agree on lives in Redis: the channel
+layer, the card response cache (and its version), the WebSocket change log
+and the RFID enrolment queue. Run with
+DJANGO_SETTINGS_MODULE=djangoproj.settings_production and REDIS_URL set;
+`manage.py redis_standin` serves a local stand-in for trying it out.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+DEBUG = False
+
+CHANNEL_LAYERS = {
+    "default": {
+        "BACKEND": "channels_redis.core.RedisChannelLayer",
+        "CONFIG": {
+            "hosts": [GYM_CARD_REDIS_URL],
+        },
+    }
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': GYM_CARD_REDIS_URL,
+    }
+}
+
+# Sequence numbers and resume history shared by every worker
+GYM_CARD_CHANGE_LOG = 'App.broadcast.RedisChangeLog'
+
+# Cards waiting for their RFID scan, claimable by any worker
+GYM_CARD_ENROLMENT_REGISTRY = 'App.enrolment.RedisEnrolmentRegistry'
+
+# MQTT 5 / 3.1.1 shared subscription: each scan reaches one worker only
+MQTT_CARD_SUBSCRIPTION = f'$share/gym_cards/{MQTT_CARD_TOPIC}'
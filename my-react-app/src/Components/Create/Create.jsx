@@ -21,14 +21,19 @@ export default function Create() {
         
         ws.onmessage = (event) => {
             const data = JSON.parse(event.data);
-            if (data.type === 'rfid_timeout') {
-                setIsLoading(false);
-                setMessage('RFID card timeout');
-                navigate('/'); // Immediate navigation
-            } else if (data.type === 'card_update' && data.card.rfid_card_id) {
-                setIsLoading(false);
-                setMessage('Card created successfully!');
-                navigate('/'); // Immediate navigation
+            const changes = data.type === 'cards_changed' ? data.changes : [data];
+            for (const change of changes) {
+                if (change.type === 'rfid_timeout') {
+                    setIsLoading(false);
+                    setMessage('RFID card timeout');
+                    navigate('/'); // Immediate navigation
+                    return;
+                } else if (change.type === 'card_update' && change.data.rfid_card_id) {
+                    setIsLoading(false);
+                    setMessage('Card created successfully!');
+                    navigate('/'); // Immediate navigation
+                    return;
+                }
             }
         };
 
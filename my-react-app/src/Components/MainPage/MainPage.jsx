@@ -1,5 +1,4 @@
 import React, { useState, useEffect, useRef } from 'react';
-import Axios from 'axios';
 import CurrentTime from '../CurrentTime/CurrentTime';
 import Check from '../Check/Check';
 import Toggle from '../Toggle/Toggle';
@@ -15,72 +14,109 @@ const MainPage = () => {
   });
   const [isLoading, setIsLoading] = useState(true);
 
-  const fetchGymCards = async () => {
-    try {
-      const response = await Axios.get('http://127.0.0.1:8000/api/get_gym_cards/');
-      if (response.data && Array.isArray(response.data.gym_cards)) {
-        setGymCards(response.data.gym_cards);
-      }
-    } catch (error) {
-      console.error('Error fetching gym cards:', error);
-    } finally {
-      setIsLoading(false);
-    }
-  };
-
   useEffect(() => {
-    fetchGymCards();
+    // epoch/seq of the last change applied, sent back on every (re)connect
+    // so the server replays only what was missed
+    const sync = { epoch: null, seq: null };
+    let reconnectTimer = null;
+    let closed = false;
 
-    wsRef.current = new WebSocket('ws://127.0.0.1:8000/ws/gym_cards/');
-    
-    wsRef.current.onopen = () => {
-      console.log('WebSocket Connected');
-    };
+    const applyChange = (change) => {
+      if (change.type === 'delete') {
+        setGymCards(prevCards =>
+          prevCards.filter(card => card.id !== change.data.id)
+        );
+      } else if (change.type === 'cards_expired') {
+        const expiredIds = new Set(change.data.ids);
+        setGymCards(prevCards =>
+          prevCards.map(card => expiredIds.has(card.id)
+            ? { ...card, Status: change.data.Status, IsExpired: change.data.IsExpired }
+            : card)
+        );
+      } else if (change.type === 'card_update') {
+        setGymCards(prevCards => {
+          const newCards = [...prevCards];
+          const index = newCards.findIndex(card => card.id === change.data.id);
 
-    wsRef.current.onmessage = (event) => {
-      try {
-        const data = JSON.parse(event.data);
-        console.log('WebSocket message received:', data);
-
-        if (data.type === 'delete') {
-          // Remove card using the ID from data.data
-          setGymCards(prevCards => 
-            prevCards.filter(card => card.id !== data.data.id)
-          );
-        } else if (data.type === 'card_update') {
-          setGymCards(prevCards => {
-            const newCards = [...prevCards];
-            const index = newCards.findIndex(card => card.id === data.data.id);
-            
-            if (index !== -1) {
-              newCards[index] = { ...newCards[index], ...data.data };
-            } else {
-              newCards.push(data.data);
-            }
-            
-            return newCards;
-          });
-        }
-      } catch (error) {
-        console.error('Error processing WebSocket message:', error);
+          if (index !== -1) {
+            newCards[index] = { ...newCards[index], ...change.data };
+          } else {
+            newCards.push(change.data);
+          }
+
+          return newCards;
+        });
       }
     };
 
-    wsRef.current.onerror = (error) => {
-      console.error('WebSocket error:', error);
+    const requestSync = (ws) => {
+      ws.send(JSON.stringify({ type: 'sync_since', epoch: sync.epoch, seq: sync.seq }));
     };
 
-    // Reconnection logic
-    wsRef.current.onclose = () => {
-      console.log('WebSocket disconnected. Reconnecting...');
-      setTimeout(() => {
-        if (!wsRef.current || wsRef.current.readyState === WebSocket.CLOSED) {
-          window.location.reload();
+    const connect = () => {
+      const ws = new WebSocket('ws://127.0.0.1:8000/ws/gym_cards/');
+      wsRef.current = ws;
+
+      ws.onopen = () => {
+        console.log('WebSocket Connected');
+        requestSync(ws);
+      };
+
+      ws.onmessage = (event) => {
+        try {
+          const data = JSON.parse(event.data);
+
+          if (data.type === 'snapshot') {
+            setGymCards(data.gym_cards);
+            sync.epoch = data.epoch;
+            sync.seq = data.seq;
+            setIsLoading(false);
+          } else if (data.type === 'cards_changed') {
+            if (sync.epoch === null) {
+              return; // Snapshot still on its way
+            }
+            if (data.epoch !== sync.epoch) {
+              // Server restarted, its sequence numbers start over
+              sync.epoch = null;
+              requestSync(ws);
+              return;
+            }
+            // prev_seq is the frame this one follows; a higher value than
+            // ours means frames were missed
+            if (data.prev_seq > sync.seq) {
+              requestSync(ws);
+              return;
+            }
+            // Changes arrive batched, at most one per card per frame
+            data.changes.filter(change => change.seq > sync.seq).forEach(applyChange);
+            sync.seq = Math.max(sync.seq, data.seq);
+          } else {
+            applyChange(data);
+          }
+        } catch (error) {
+          console.error('Error processing WebSocket message:', error);
         }
-      }, 1000);
+      };
+
+      ws.onerror = (error) => {
+        console.error('WebSocket error:', error);
+      };
+
+      // Reconnect and resume from the last applied change
+      ws.onclose = () => {
+        if (closed) {
+          return;
+        }
+        console.log('WebSocket disconnected. Reconnecting...');
+        reconnectTimer = setTimeout(connect, 1000);
+      };
     };
 
+    connect();
+
     return () => {
+      closed = true;
+      clearTimeout(reconnectTimer);
       if (wsRef.current) {
         wsRef.current.close();
       }